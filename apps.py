@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+class MoviesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'movies'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_search_indexes
+        from .indexes import install_postgres_indexes
+
+        post_migrate.connect(install_search_indexes, sender=self)
+        post_migrate.connect(install_postgres_indexes, sender=self)
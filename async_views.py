@@ -0,0 +1,222 @@
+"""
+Variantes assíncronas das leituras mais frequentes, para a implantação ASGI.
+
+Com ``ASYNC_READ_VIEWS`` (ligado por asgi.py) estas views atendem as mesmas
+URLs das views do DRF: listagem e detalhe de títulos, trilhas da página
+inicial, início de reprodução e "continuar assistindo". O banco é acessado
+pela API assíncrona do ORM e os acertos de cache não ocupam thread, de modo
+que uma requisição esperando E/S não segura um worker. As consultas são
+montadas pelos próprios viewsets e as respostas (corpo, ETag, erros) são as
+mesmas das views síncronas. Estas views só renderizam o JSON compacto: quando
+a negociação do DRF escolhe outro renderer (API navegável, ``?format=api``,
+JSON indentado) ou nenhum, a requisição passa à view síncrona equivalente.
+"""
+import asyncio
+import functools
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+from .conditional import add_validators, detail_validators, evaluate_conditional, page_validators
+from .continue_watching import CONTINUE_WATCHING_LIMIT
+from .fastpath import ContentListFastSerializer
+from .manifests import aget_manifest, playback_response
+from .models import Content, ContinueWatching, StreamingSession
+from .rails import RAILS, aget_rail
+from .replicas import reads_from_replica, use_replica
+from .renderers import FastJSONRenderer
+from .response_cache import cache_anonymous
+from .search import RankedSearchFilter
+from .serializers import ManifestRequestSerializer
+from .views import ContentViewSet, StreamingManifestViewSet, WatchHistoryViewSet
+
+# Cabeçalhos que o exception_handler do DRF pode definir
+ERROR_HEADERS = ('WWW-Authenticate', 'Retry-After')
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def render_exception(exc, request):
+    """Mesma resposta de erro que ``APIView.handle_exception`` daria."""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if header:
+            exc.auth_header = header
+        else:
+            exc.status_code = 403
+    response = exception_handler(exc, {'request': request})
+    if response is None:
+        raise exc
+    rendered = json_response(response.data, status=response.status_code)
+    for name in ERROR_HEADERS:
+        if name in response:
+            rendered[name] = response[name]
+    return rendered
+
+
+def negotiates_json(request):
+    """Se a negociação do DRF escolhe o JSON compacto que estas views produzem."""
+    negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+        renderer, media_type = negotiator.select_renderer(request, renderers)
+    except exceptions.NotAcceptable:
+        return False
+    return renderer.format == FastJSONRenderer.format and not renderer.get_indent(media_type, {})
+
+
+def authenticate(request, replica):
+    """Autentica e diz se as leituras podem ir para uma réplica (síncrono)."""
+    request.user
+    return replica and reads_from_replica(request)
+
+
+def api_view(require_methods, sync_view, replica=False):
+    """
+    Envolve a requisição em um ``Request`` do DRF (parsers e autenticação
+    das configurações) e converte exceções da API em respostas JSON. Com
+    ``replica`` as leituras vão para uma réplica, como no ``ReplicaReadMixin``.
+    Fora do JSON compacto a requisição vai para ``sync_view``.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            if not negotiates_json(request):
+                return await sync_to_async(sync_view)(request._request, *args, **kwargs)
+            try:
+                # Autenticadores do DRF são síncronos (sessão, token em cache);
+                # credenciais inválidas dão 401 também nas leituras públicas
+                if not await sync_to_async(authenticate)(request, replica):
+                    return await view_func(request, *args, **kwargs)
+                with use_replica():
+                    return await view_func(request, *args, **kwargs)
+            except Exception as exc:
+                return render_exception(exc, request)
+        # Como nas APIViews, o CSRF fica a cargo da SessionAuthentication
+        return csrf_exempt(require_methods(wrapper))
+    return decorator
+
+
+def authenticated_user(request):
+    user = request.user
+    if not user or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return user
+
+
+async def filtered_queryset(request, build, *args):
+    if request.query_params.get(RankedSearchFilter.search_param):
+        # Sem PostgreSQL a busca consulta o índice em memória, síncrono
+        return await sync_to_async(build)(*args)
+    return build(*args)
+
+
+def make_view(viewset, request, action, **kwargs):
+    """Instância do viewset para montar consultas e contexto, como o DRF faria."""
+    view = viewset(request=request, args=(), kwargs=kwargs, action=action, format_kwarg=None)
+    view.headers = {}
+    return view
+
+
+async def conditional(request, validators, render):
+    """``ConditionalGetMixin.conditional`` com ``render`` assíncrono."""
+    if validators is None:
+        return await render()
+    etag, timestamp, response = evaluate_conditional(request, validators, FastJSONRenderer.format)
+    if response is None:
+        response = await render()
+    return add_validators(response, etag, timestamp)
+
+
+@cache_anonymous(ContentViewSet.anonymous_cache_tags)
+@api_view(require_safe, ContentViewSet.as_view({'get': 'list'}), replica=True)
+async def content_list(request):
+    view = make_view(ContentViewSet, request, 'list')
+    queryset = await filtered_queryset(request, view.fast_queryset, 'updated_at', 'view_count')
+
+    paginator = view.paginator
+    rows = await paginator.apaginate_queryset(queryset, request, view)
+    page = [(row['id'], row['updated_at'], row['view_count']) for row in rows]
+
+    async def render():
+        serializer = ContentListFastSerializer(rows, context=view.get_serializer_context())
+        return json_response({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': await serializer.adata(),
+        })
+    return await conditional(request, page_validators(request, page, paginator), render)
+
+
+@cache_anonymous(ContentViewSet.anonymous_cache_tags)
+@api_view(require_safe, ContentViewSet.as_view({'get': 'retrieve'}), replica=True)
+async def content_detail(request, pk):
+    row = await aget_object_or_404(Content.objects.values_list('updated_at', 'view_count'), pk=pk)
+    view = make_view(ContentViewSet, request, 'retrieve', pk=pk)
+
+    async def render():
+        queryset = await filtered_queryset(request, view.filter_queryset, view.get_queryset())
+        content = await aget_object_or_404(queryset.prefetch_related(None), pk=pk)
+        # Relações independentes entre si: disparadas juntas
+        _, prefetch = view.get_query_plan()
+        await asyncio.gather(*(
+            sync_to_async(prefetch_related_objects)([content], lookup) for lookup in prefetch
+        ))
+        return json_response(view.get_serializer(content).data)
+    return await conditional(request, detail_validators(request, row), render)
+
+
+RAIL_VIEWS = {name: ContentViewSet.as_view({'get': name}) for name in RAILS}
+
+
+def sync_rail(request, name):
+    return RAIL_VIEWS[name](request)
+
+
+@cache_anonymous(ContentViewSet.anonymous_cache_tags)
+@api_view(require_safe, sync_rail, replica=True)
+async def content_rail(request, name):
+    return HttpResponse(await aget_rail(name), content_type='application/json')
+
+
+@api_view(require_POST, StreamingManifestViewSet.as_view({'post': 'create'}))
+async def start_playback(request):
+    user = authenticated_user(request)
+    serializer = ManifestRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    episode_id = serializer.validated_data.get('episode_id')
+    if episode_id:
+        manifest = await aget_manifest('episode', episode_id)
+    else:
+        manifest = await aget_manifest('content', serializer.validated_data['content_id'])
+    if manifest is None:
+        return json_response({"detail": "Conteúdo não encontrado"}, status=404)
+
+    session = await StreamingSession.objects.acreate(
+        user=user,
+        content_id=manifest['content_id'],
+        episode_id=manifest['episode_id'],
+    )
+    return json_response(playback_response(session.id, manifest))
+
+
+@api_view(require_safe, WatchHistoryViewSet.as_view({'get': 'continue_watching'}))
+async def continue_watching(request):
+    user = authenticated_user(request)
+    view = make_view(WatchHistoryViewSet, request, 'continue_watching')
+    queryset = view.apply_query_plan(ContinueWatching.objects.filter(user=user))[:CONTINUE_WATCHING_LIMIT]
+    entries = [entry async for entry in queryset]
+    return json_response(view.get_serializer(entries, many=True).data)
@@ -0,0 +1,148 @@
+"""
+Autenticação por token com cache.
+
+``TokenAuthentication`` faz um JOIN de ``Token`` com ``User`` a cada
+requisição, inclusive em cada heartbeat do player. Aqui o resultado fica em
+um LRU por processo (validade curta, ``AUTH_TOKEN_LOCAL_TIMEOUT``) e,
+opcionalmente, no cache compartilhado ``AUTH_TOKEN_SHARED_CACHE``
+(``AUTH_TOKEN_CACHE_TIMEOUT``), como um retrato dos campos do usuário sem o
+hash da senha. Cada requisição recebe instâncias novas reconstruídas do
+retrato.
+
+Remover o token ou salvar o usuário (troca de senha, desativação) invalida o
+token no processo atual e no cache compartilhado após o commit (ver
+signals.py); nos demais processos o LRU local expira em no máximo
+``AUTH_TOKEN_LOCAL_TIMEOUT`` segundos. Escritas que não disparam signals
+(``QuerySet.update``) só são vistas após a expiração.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+AUTH_TOKEN_CACHE_SIZE = getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+AUTH_TOKEN_LOCAL_TIMEOUT = getattr(settings, 'AUTH_TOKEN_LOCAL_TIMEOUT', 30)
+AUTH_TOKEN_CACHE_TIMEOUT = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60 * 5)
+AUTH_TOKEN_SHARED_CACHE = getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', '')
+
+# Nunca vai para o cache: fica adiado no usuário reconstruído, de modo que
+# um save() não o sobrescreve
+EXCLUDED_USER_FIELDS = {'password'}
+
+TOKEN_FIELDS = ['key', 'user_id', 'created']
+
+
+def shared_cache_key(key):
+    # O token não é gravado em claro no cache compartilhado
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def snapshot(token):
+    user = token.user
+    return {
+        'token': [getattr(token, name) for name in TOKEN_FIELDS],
+        'user': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname not in EXCLUDED_USER_FIELDS
+        },
+    }
+
+
+def restore(data):
+    """``(user, token)`` novos a partir de um retrato."""
+    fields = data['user']
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+    token = Token.from_db(DEFAULT_DB_ALIAS, TOKEN_FIELDS, list(data['token']))
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    def __init__(self, max_size=AUTH_TOKEN_CACHE_SIZE, local_timeout=AUTH_TOKEN_LOCAL_TIMEOUT,
+                 timeout=AUTH_TOKEN_CACHE_TIMEOUT, shared_alias=AUTH_TOKEN_SHARED_CACHE):
+        self.max_size = max_size
+        self.local_timeout = local_timeout
+        self.timeout = timeout
+        self.shared_alias = shared_alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def store_local(self, key, data):
+        with self.lock:
+            self.entries[key] = (data, time.monotonic() + self.local_timeout)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                data, deadline = entry
+                if deadline > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return data
+                del self.entries[key]
+
+        shared = self.shared
+        if shared is None:
+            return None
+        data = shared.get(shared_cache_key(key))
+        if data is not None:
+            self.store_local(key, data)
+        return data
+
+    def set(self, key, data):
+        self.store_local(key, data)
+        shared = self.shared
+        if shared is not None:
+            shared.set(shared_cache_key(key), data, self.timeout)
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        shared = self.shared
+        if shared is not None and keys:
+            shared.delete_many([shared_cache_key(key) for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` sem consulta ao banco enquanto o token está no cache."""
+
+    def authenticate_credentials(self, key):
+        data = token_cache.get(key)
+        if data is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, snapshot(token))
+            return user, token
+
+        user, token = restore(data)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, token
+
+
+def invalidate_user_tokens(user_id):
+    token_cache.invalidate(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
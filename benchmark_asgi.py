@@ -0,0 +1,220 @@
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from .models import Content
+
+MODES = ('wsgi', 'asgi')
+
+
+def read_paths():
+    """Leituras anônimas servidas pelas views assíncronas (ver async_views.py)."""
+    content_id = Content.objects.order_by('pk').values_list('pk', flat=True).first()
+    if content_id is None:
+        raise CommandError('The catalog is empty; load some content before benchmarking')
+    return [
+        reverse('content-list'),
+        reverse('content-list') + '?sort_by=popularity',
+        reverse('content-detail', args=[content_id]),
+        reverse('content-featured'),
+        reverse('content-trending'),
+    ]
+
+
+def add_latency(seconds):
+    """Atraso fixo por consulta em todas as conexões, como um banco remoto."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    # connection_created dispara a cada reconexão do mesmo wrapper
+    def install(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+
+
+class WSGIClient:
+    """Um worker WSGI com ``threads`` threads (como o gthread do gunicorn)."""
+
+    def __init__(self, host, threads):
+        self.application = get_wsgi_application()
+        self.host = host
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def call(self, path):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'HTTP_HOST': self.host,
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+        result = self.application(environ, lambda code, headers, exc_info=None: status.append(code))
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()
+        return int(status[0].split()[0])
+
+    async def request(self, path):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self.call, path)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class ASGIClient:
+    """Um worker ASGI: todas as requisições no mesmo event loop."""
+
+    def __init__(self, host):
+        self.application = get_asgi_application()
+        self.host = host
+
+    async def request(self, path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': [(b'host', self.host.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        disconnected = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.application(scope, receive, send)
+        disconnected.set()
+        return status[0]
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    """Django command to load-test the hot read endpoints under one WSGI or ASGI worker"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES + ('compare',), default='compare',
+                            help='Handler to drive; compare runs both in separate processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads of the WSGI worker')
+        parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight')
+        parser.add_argument('--requests', type=int, default=2000, help='Total requests')
+        parser.add_argument('--latency', type=float, default=5.0, help='Injected latency per query in ms')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+
+    async def run_load(self, client, paths, concurrency, total):
+        latencies = []
+        statuses = {}
+        issued = iter(range(total))
+
+        async def worker():
+            for number in issued:
+                path = paths[number % len(paths)]
+                start = time.perf_counter()
+                status = await client.request(path)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, statuses
+
+    def benchmark(self, mode, options):
+        if mode == 'asgi' and not settings.ASYNC_READ_VIEWS:
+            self.stderr.write('ASYNC_READ_VIEWS is off: the ASGI worker will run the sync views in threads')
+        paths = read_paths()
+        if options['latency']:
+            add_latency(options['latency'] / 1000)
+
+        if mode == 'wsgi':
+            client = WSGIClient(options['host'], options['threads'])
+        else:
+            client = ASGIClient(options['host'])
+        try:
+            # Aquece caches (trilhas, manifestos, índice de busca) fora da medição
+            asyncio.run(self.run_load(client, paths, 1, len(paths)))
+            elapsed, latencies, statuses = asyncio.run(
+                self.run_load(client, paths, options['concurrency'], options['requests'])
+            )
+        finally:
+            client.close()
+
+        if set(statuses) != {200}:
+            raise CommandError(f'Unexpected responses: {statuses}')
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        self.stdout.write(
+            f'{mode}: {len(latencies) / elapsed:.0f} req/s, p50 {p50:.1f} ms, p99 {p99:.1f} ms '
+            f'({len(latencies)} requests, concurrency {options["concurrency"]})'
+        )
+        return len(latencies) / elapsed
+
+    def compare(self, options):
+        """Cada modo em um processo: as URLs assíncronas dependem de ASYNC_READ_VIEWS."""
+        arguments = [
+            f'--{name}={options[name]}' for name in ('threads', 'concurrency', 'requests', 'latency', 'host')
+        ]
+        # As verificações já rodaram neste processo
+        arguments.append('--skip-checks')
+        for mode in MODES:
+            env = dict(os.environ, ASYNC_READ_VIEWS=str(mode == 'asgi'))
+            result = subprocess.run(
+                [sys.executable, '-m', 'django', 'benchmark_asgi', f'--mode={mode}'] + arguments,
+                env=env, capture_output=True, text=True,
+            )
+            if result.returncode:
+                raise CommandError(result.stderr.strip())
+            self.stdout.write(result.stdout.strip())
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'compare':
+            self.compare(options)
+        else:
+            self.benchmark(options['mode'], options)
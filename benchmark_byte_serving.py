@@ -0,0 +1,98 @@
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from .byteserving import serve_media
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def drain(sock, received):
+    buffer = bytearray(CHUNK_SIZE)
+    while True:
+        count = sock.recv_into(buffer)
+        if not count:
+            return
+        received[0] += count
+
+
+class Command(BaseCommand):
+    """Django command to compare copy-through-Python and sendfile throughput for media ranges"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=float, default=2.0, help='Test file size in GB')
+        parser.add_argument('--ranges', type=int, default=200, help='Random range requests')
+        parser.add_argument('--range-size', type=int, default=4, help='Bytes per range request in MB')
+
+    def transfer(self, label, send, total):
+        """Envia ``total`` bytes por um socketpair e mede a vazão."""
+        sender, receiver = socket.socketpair()
+        received = [0]
+        reader = threading.Thread(target=drain, args=(receiver, received))
+        reader.start()
+        start = time.perf_counter()
+        try:
+            send(sender)
+        finally:
+            sender.close()
+            reader.join()
+            receiver.close()
+        elapsed = time.perf_counter() - start
+        if received[0] != total:
+            raise CommandError(f'{label}: sent {received[0]} of {total} bytes')
+        self.stdout.write(f'{label}: {total / elapsed / 2 ** 20:.0f} MB/s')
+        return elapsed
+
+    def handle(self, *args, **options):
+        size = int(options['size'] * 2 ** 30)
+        range_size = options['range_size'] * 2 ** 20
+        factory = RequestFactory()
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            path = os.path.join(media_root, 'benchmark.mp4')
+            with open(path, 'wb') as file:
+                # Arquivo esparso: criado instantaneamente, lido como zeros
+                file.truncate(size)
+
+            requests = []
+            for _ in range(options['ranges']):
+                start = random.randrange(0, size - range_size)
+                requests.append((start, start + range_size))
+            total = range_size * len(requests)
+
+            def copy(sock):
+                # Caminho sem file_wrapper: o servidor itera o corpo em Python
+                for start, end in requests:
+                    request = factory.get('/media/benchmark.mp4', HTTP_RANGE=f'bytes={start}-{end - 1}')
+                    response = serve_media(request, 'benchmark.mp4')
+                    for chunk in response.streaming_content:
+                        sock.sendall(chunk)
+                    response.close()
+
+            def zero_copy(sock):
+                # O que um file_wrapper com sendfile faz com o RangeFile
+                for start, end in requests:
+                    request = factory.get('/media/benchmark.mp4', HTTP_RANGE=f'bytes={start}-{end - 1}')
+                    response = serve_media(request, 'benchmark.mp4')
+                    if response.status_code != 206:
+                        raise CommandError(f'Range request returned {response.status_code}')
+                    filelike = response.file_to_stream
+                    offset = os.lseek(filelike.fileno(), 0, os.SEEK_CUR)
+                    remaining = int(response['Content-Length'])
+                    while remaining:
+                        sent = os.sendfile(sock.fileno(), filelike.fileno(), offset, remaining)
+                        offset += sent
+                        remaining -= sent
+                    response.close()
+
+            self.stdout.write(
+                f'{len(requests)} random {options["range_size"]} MB ranges '
+                f'of a {options["size"]:g} GB file'
+            )
+            copied = self.transfer('python copy', copy, total)
+            sent = self.transfer('sendfile', zero_copy, total)
+            self.stdout.write(self.style.SUCCESS(f'sendfile speedup {copied / sent:.1f}x'))
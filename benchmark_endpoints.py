@@ -0,0 +1,270 @@
+import json
+import platform
+import statistics
+import time
+import django
+import rest_framework
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from . import streaming_urls, urls
+from .authentication import token_cache
+from .counters import view_counters
+from .heartbeats import progress_buffer
+from .models import Content, Episode, Favorite, Rating, Season, StreamingSession, WatchHistory
+from .synthetic_data import SYNTHETIC_PREFIX
+
+# Query strings measured in addition to the plain route. ``{season}`` and
+# ``{content}`` are replaced by ids taken from the benchmark user's data.
+VARIANTS = {
+    'content-list': ['?sort_by=popularity', '?sort_by=release_date', '?search=noite', '?fields=id,title'],
+    'content-detail': ['?seasons=summary', '?expand=cast'],
+    'episode-list': ['?season={season}'],
+}
+
+# Bodies of the POST routes that are measured. Generic create/update/delete
+# routes change the user's data between iterations and are left out.
+PAYLOADS = {
+    'content-view': lambda ids: {},
+    'episode-view': lambda ids: {},
+    'history-heartbeat': lambda ids: {'events': [{'content': ids['content'], 'progress': 120}]},
+    'streaming-manifest-list': lambda ids: {'content_id': ids['content']},
+    'streaming-sessions-end-session': lambda ids: {},
+}
+
+# Detail routes whose pk is not taken from the list response: the profile
+# view ignores the pk and always returns the authenticated user's profile
+DETAIL_IDS = {
+    'profile': 'me',
+}
+
+# Rows counted into the report, so that runs on different datasets are not
+# compared by accident
+DATASET_MODELS = (Content, Season, Episode, User, WatchHistory, Rating, Favorite)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(int(round(len(ordered) * fraction)) - 1, 0)]
+
+
+def routes():
+    """Todas as rotas dos dois routers: ``(basename, nome, método, detalhe)``."""
+    for router in (urls.router, streaming_urls.router):
+        for prefix, viewset, basename in router.registry:
+            for route in router.get_routes(viewset):
+                name = route.name.format(basename=basename)
+                for method, action in route.mapping.items():
+                    if hasattr(viewset, action):
+                        yield basename, name, method, route.detail
+
+
+def first_id(response):
+    data = response.json()
+    rows = data.get('results', []) if isinstance(data, dict) else data
+    return rows[0].get('id') if rows else None
+
+
+def benchmark_user(username=None):
+    """O usuário sintético mais ativo: as leituras pessoais pegam o pior caso."""
+    if username:
+        return User.objects.get(username=username)
+    busiest = (
+        WatchHistory.objects.filter(user__username__startswith=SYNTHETIC_PREFIX)
+        .values('user').annotate(rows=Count('id')).order_by('-rows').first()
+    )
+    if busiest is None:
+        raise CommandError('No synthetic users found; run generate_synthetic_data first or pass --user')
+    return User.objects.get(pk=busiest['user'])
+
+
+def discard_buffers():
+    """Descarta incrementos e heartbeats acumulados pelos POSTs medidos."""
+    view_counters.drain()
+    with progress_buffer.lock:
+        progress_buffer.pending.clear()
+
+
+def compare(baseline, current, tolerance):
+    """
+    Diferenças por rota. O p50 regride acima de ``tolerance`` (relativa, com
+    0,5 ms de folga para rotas muito rápidas) e o p99, mais ruidoso, acima do
+    dobro; consultas regridem a qualquer aumento e o payload acima de 5%.
+    """
+    lines, regressions = [], []
+    for key, result in current.items():
+        previous = baseline.get(key)
+        if previous is None:
+            lines.append(f'{key}: new endpoint')
+            continue
+        problems = []
+        if result['p50_ms'] > previous['p50_ms'] * (1 + tolerance) + 0.5:
+            problems.append('p50')
+        if result['p99_ms'] > previous['p99_ms'] * (1 + 2 * tolerance) + 0.5:
+            problems.append('p99')
+        if result['queries'] > previous['queries']:
+            problems.append('queries')
+        if result['bytes'] > previous['bytes'] * 1.05:
+            problems.append('bytes')
+        line = (
+            f'{key}: p50 {previous["p50_ms"]:.2f} -> {result["p50_ms"]:.2f} ms, '
+            f'p99 {previous["p99_ms"]:.2f} -> {result["p99_ms"]:.2f} ms, '
+            f'queries {previous["queries"]} -> {result["queries"]}, '
+            f'bytes {previous["bytes"]} -> {result["bytes"]}'
+        )
+        if problems:
+            line += f' [REGRESSION: {", ".join(problems)}]'
+            regressions.append(key)
+        lines.append(line)
+    for key in baseline.keys() - current.keys():
+        lines.append(f'{key}: missing from this run')
+    return lines, regressions
+
+
+class Command(BaseCommand):
+    """Django command to benchmark every API route and diff the results against a saved baseline"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint')
+        parser.add_argument('--user', help='Username to authenticate as (default: busiest synthetic user)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON file of a previous run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative latency increase reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any endpoint regressed')
+
+    def request(self, client, method, path, body):
+        if method == 'get':
+            return client.get(path)
+        # Cada POST em um savepoint desfeito: as iterações medem sempre o mesmo estado
+        with transaction.atomic():
+            response = client.post(path, body, format='json')
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, client, method, path, body, options):
+        for _ in range(options['warmup']):
+            self.request(client, method, path, body)
+        # Com DEBUG o log de consultas pode estar cheio e a contagem daria zero
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(client, method, path, body)
+        timings = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            self.request(client, method, path, body)
+            timings.append((time.perf_counter() - start) * 1000)
+        if method != 'get':
+            discard_buffers()
+        if response.status_code >= 400:
+            raise CommandError(f'{method.upper()} {path} returned {response.status_code}')
+        return response, {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': len(queries),
+            'bytes': len(response.content),
+        }
+
+    def run(self, client, user, options):
+        ids = {
+            'content': WatchHistory.objects.filter(user=user, content__isnull=False)
+            .values_list('content', flat=True).first()
+            or Content.objects.values_list('pk', flat=True).first(),
+            'season': Season.objects.values_list('pk', flat=True).first(),
+        }
+        # Sessão própria para medir as rotas de detalhe de sessões
+        StreamingSession.objects.create(user=user, content_id=ids['content'])
+
+        results, skipped, detail_ids = {}, [], dict(DETAIL_IDS)
+        all_routes = sorted(routes(), key=lambda route: route[3])
+        # Listas primeiro: o primeiro id de cada lista alimenta as rotas de detalhe
+        for basename, name, method, detail in all_routes:
+            if method != 'get' and name not in PAYLOADS:
+                skipped.append(f'{method.upper()} {name}')
+                continue
+            if detail:
+                pk = detail_ids.get(basename)
+                if pk is None:
+                    skipped.append(f'{method.upper()} {name} (empty list)')
+                    continue
+                path = reverse(name, kwargs={'pk': pk})
+            else:
+                path = reverse(name)
+            body = PAYLOADS[name](ids) if method != 'get' else None
+
+            for variant in [''] + (VARIANTS.get(name, []) if method == 'get' else []):
+                variant = variant.format(**ids)
+                response, result = self.measure(client, method, path + variant, body, options)
+                key = f'{method.upper()} {name}{variant}'
+                results[key] = result
+                self.stdout.write(
+                    f'{key}: p50 {result["p50_ms"]:.2f} ms, p99 {result["p99_ms"]:.2f} ms, '
+                    f'{result["queries"]} queries, {result["bytes"]} bytes'
+                )
+                if name.endswith('-list') and method == 'get' and not variant:
+                    detail_ids.setdefault(basename, first_id(response))
+        return results, skipped
+
+    def handle(self, *args, **options):
+        user = benchmark_user(options['user'])
+        report = {
+            'meta': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'rest_framework': rest_framework.VERSION,
+                'user': user.username,
+                'iterations': options['iterations'],
+                'rows': {model._meta.model_name: model.objects.count() for model in DATASET_MODELS},
+            },
+        }
+        token = Token.objects.filter(user=user).first()
+        try:
+            with transaction.atomic():
+                if token is None:
+                    token = Token.objects.create(user=user)
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+                report['endpoints'], report['skipped'] = self.run(client, user, options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # O token pode ter sido criado dentro da transação desfeita
+            token_cache.invalidate([token.key])
+
+        self.stdout.write(f'Skipped: {", ".join(report["skipped"])}')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)
+            if baseline['meta']['rows'] != report['meta']['rows']:
+                self.stderr.write('The baseline was recorded on a different dataset; timings are not comparable')
+            lines, regressions = compare(baseline['endpoints'], report['endpoints'], options['tolerance'])
+            for line in lines:
+                style = self.style.ERROR if 'REGRESSION' in line else (lambda text: text)
+                self.stdout.write(style(line))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} endpoint(s) regressed against the baseline')
+            if regressions:
+                self.stdout.write(self.style.WARNING(f'{len(regressions)} endpoint(s) regressed'))
+                return
+        self.stdout.write(self.style.SUCCESS(f'Benchmarked {len(report["endpoints"])} endpoints'))
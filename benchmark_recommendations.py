@@ -0,0 +1,44 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from .recommender import recommended_content_ids, genre_recommendations
+
+
+class Command(BaseCommand):
+    """Django command to compare genre-join and neighbour-merge recommendation latency"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Users sampled')
+
+    def timings(self, users, resolve):
+        samples = []
+        for user in users:
+            start = time.perf_counter()
+            resolve(user)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def report(self, label, samples):
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+        self.stdout.write(
+            f'{label}: mean {statistics.mean(samples):.2f}ms '
+            f'p50 {statistics.median(samples):.2f}ms p95 {p95:.2f}ms'
+        )
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(watchhistory__isnull=False).distinct()[:options['users']])
+        if not users:
+            self.stdout.write('No users with watch history')
+            return
+
+        genre_join = self.timings(users, lambda user: list(
+            genre_recommendations(user).values_list('pk', flat=True)[:20]
+        ))
+        neighbours = self.timings(users, recommended_content_ids)
+
+        self.report('genre join', genre_join)
+        self.report('neighbour merge', neighbours)
+        speedup = statistics.mean(genre_join) / max(statistics.mean(neighbours), 1e-9)
+        self.stdout.write(self.style.SUCCESS(f'{len(users)} users, speedup {speedup:.1f}x'))
@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from .fastpath import ContentListFastSerializer
+from .models import Content
+from .rails import RAILS
+from .renderers import FastJSONRenderer
+from .serializers import ContentListSerializer
+
+
+class Command(BaseCommand):
+    """Django command to compare the ModelSerializer and values() list pipelines"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20, help='Rows per rendered page')
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per pipeline')
+
+    def model_pipeline(self, queryset, context):
+        rows = queryset.prefetch_related('genres')
+        return JSONRenderer().render(ContentListSerializer(rows, many=True, context=context).data)
+
+    def fast_pipeline(self, queryset, context):
+        rows = list(queryset.values(*ContentListFastSerializer.value_fields()))
+        return FastJSONRenderer().render(ContentListFastSerializer(rows, context=context).data)
+
+    def throughput(self, render, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        return iterations / (time.perf_counter() - start)
+
+    def compare(self, label, queryset, context, iterations):
+        expected = self.model_pipeline(queryset, context)
+        actual = self.fast_pipeline(queryset, context)
+        if expected != actual:
+            raise CommandError(f'{label}: fast path output differs from ContentListSerializer')
+
+        before = self.throughput(lambda: self.model_pipeline(queryset, context), iterations)
+        after = self.throughput(lambda: self.fast_pipeline(queryset, context), iterations)
+        self.stdout.write(
+            f'{label}: {len(expected)} bytes identical, '
+            f'{before:.0f} -> {after:.0f} renders/s ({after / before:.1f}x)'
+        )
+
+    def handle(self, *args, **options):
+        if not Content.objects.exists():
+            raise CommandError('No content to render')
+
+        # Com requisição as URLs de mídia saem absolutas, como na API
+        context = {'request': RequestFactory().get('/')}
+        pages = {'list page': Content.objects.all()[:options['rows']]}
+        for name, filters in RAILS.items():
+            pages[f'{name} rail'] = Content.objects.filter(**filters)
+
+        for label, queryset in pages.items():
+            self.compare(label, queryset, context, options['iterations'])
+        self.stdout.write(self.style.SUCCESS('All pipelines produce identical output'))
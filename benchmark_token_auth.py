@@ -0,0 +1,52 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from .authentication import CachedTokenAuthentication, token_cache
+from .check_query_budgets import Rollback
+
+
+class Command(BaseCommand):
+    """Django command to compare the per-request cost of token and cached token authentication"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000, help='Authenticated requests per class')
+
+    def measure(self, authenticator, request, user, iterations):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                authenticated, _ = authenticator.authenticate(request)
+            elapsed = time.perf_counter() - start
+        if authenticated.pk != user.pk:
+            raise AssertionError(f'{type(authenticator).__name__} authenticated the wrong user')
+        return elapsed / iterations * 1e6, len(queries) / iterations
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username='token-benchmark-user')
+                token = Token.objects.create(user=user)
+                request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+                token_cache.invalidate([token.key])
+                results = {}
+                for authenticator in (TokenAuthentication(), CachedTokenAuthentication()):
+                    label = type(authenticator).__name__
+                    results[label] = self.measure(authenticator, request, user, iterations)
+                    micros, queries = results[label]
+                    self.stdout.write(f'{label}: {micros:.1f} us/request, {queries:.3f} queries/request')
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            token_cache.clear()
+
+        before = results['TokenAuthentication'][0]
+        after = results['CachedTokenAuthentication'][0]
+        self.stdout.write(self.style.SUCCESS(f'Auth overhead {before:.1f} -> {after:.1f} us/request ({before / after:.1f}x)'))
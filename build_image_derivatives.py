@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from django.core.management.base import BaseCommand
+from .derivatives import IMAGE_FIELDS, DerivativePipeline, stale_fields
+
+
+class Command(BaseCommand):
+    """Django command to backfill responsive image derivatives for the whole library"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Resize processes')
+        parser.add_argument('--force', action='store_true', help='Regenerate up-to-date derivatives too')
+
+    def handle(self, *args, **options):
+        pipeline = DerivativePipeline(workers=options['workers'], use_processes=True)
+        max_pending = options['workers'] * 4
+        pending = set()
+        submitted = failed = 0
+        start = time.perf_counter()
+
+        def collect(futures):
+            nonlocal failed
+            for future in futures:
+                if future.exception() is not None:
+                    failed += 1
+                    self.stderr.write(f'Failed: {future.exception()}')
+
+        for model, fields in IMAGE_FIELDS.items():
+            queryset = model.objects.only('pk', 'images', *fields).order_by('pk')
+            for instance in queryset.iterator():
+                todo = stale_fields(instance)
+                if options['force']:
+                    todo = [field for field in fields if getattr(instance, field).name or field in todo]
+                for field in todo:
+                    # Limita as tarefas em voo para não carregar a biblioteca inteira
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    pending.add(pipeline.submit(model, instance.pk, field))
+                    submitted += 1
+
+        done, _ = wait(pending)
+        collect(done)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{submitted - failed} of {submitted} images processed in {elapsed:.1f}s'
+        ))
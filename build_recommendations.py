@@ -0,0 +1,40 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import WatchHistory, Rating
+from .recommender import TOP_K, rebuild_neighbors
+from .replicas import use_replica
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the item-item recommendation neighbours"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Neighbours kept per title')
+        parser.add_argument(
+            '--changed-since', type=int, metavar='MINUTES',
+            help='Only rebuild titles with completions or ratings in the last MINUTES',
+        )
+
+    def changed_content_ids(self, minutes):
+        since = timezone.now() - timedelta(minutes=minutes)
+        # Numa janela de minutos, segundos de atraso da réplica são toleráveis
+        with use_replica(user_data=True):
+            watched = WatchHistory.objects.filter(completed=True, watched_at__gte=since).annotate(
+                title_id=Coalesce('content_id', 'episode__season__content_id')
+            ).values_list('title_id', flat=True)
+            rated = Rating.objects.filter(created_at__gte=since).values_list('content_id', flat=True)
+            return {content_id for content_id in watched if content_id is not None} | set(rated)
+
+    def handle(self, *args, **options):
+        content_ids = None
+        if options['changed_since'] is not None:
+            content_ids = self.changed_content_ids(options['changed_since'])
+            self.stdout.write(f'{len(content_ids)} titles changed')
+
+        start = timezone.now()
+        total = rebuild_neighbors(content_ids, top_k=options['top_k'])
+        elapsed = (timezone.now() - start).total_seconds()
+        self.stdout.write(self.style.SUCCESS(f'Neighbours rebuilt for {total} titles in {elapsed:.1f}s'))
@@ -0,0 +1,199 @@
+"""
+Entrega de arquivos de mídia locais com suporte a ``Range``.
+
+Usado quando o S3 não está configurado e os vídeos ficam em ``MEDIA_ROOT``.
+Pedidos de um único intervalo devolvem um ``FileResponse`` limitado ao
+intervalo: como o arquivo expõe ``fileno()`` e o ``Content-Length`` é exato,
+servidores com ``wsgi.file_wrapper`` (ex.: gunicorn) transferem os bytes com
+``sendfile`` sem copiá-los para o Python. Vários intervalos são servidos como
+``multipart/byteranges``.
+"""
+import mimetypes
+import os
+import re
+import secrets
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+# Mais intervalos que isso é tratado como abuso e recebe o arquivo inteiro
+MAX_RANGES = 16
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeFile:
+    """
+    Arquivo aberto restrito a ``[start, end)``. ``tell``/``seek`` são
+    relativos ao início do intervalo para que o ``FileResponse`` calcule o
+    ``Content-Length`` do intervalo, e o descritor real fica posicionado em
+    ``start`` para o ``sendfile`` do servidor.
+    """
+
+    def __init__(self, path, start, end):
+        self.name = path
+        self.file = open(path, 'rb')
+        self.start = start
+        self.end = end
+        self.file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell() - self.start
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = self.start + offset
+        elif whence == os.SEEK_CUR:
+            position = self.file.tell() + offset
+        else:
+            position = self.end + offset
+        self.file.seek(min(max(position, self.start), self.end))
+        return self.tell()
+
+    def read(self, size=-1):
+        remaining = self.end - self.file.tell()
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+
+
+def parse_ranges(header, size):
+    """
+    Intervalos ``[(início, fim_exclusivo)]`` do cabeçalho ``Range``,
+    ordenados e mesclados. Retorna ``None`` quando o cabeçalho deve ser
+    ignorado (sintaxe inválida, unidade desconhecida, excesso de intervalos)
+    e ``[]`` quando nenhum intervalo é satisfatível.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+    for part in parts:
+        match = RANGE_RE.match(part)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Sufixo: os últimos N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size))
+            continue
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request, etag, mtime):
+    """``If-Range`` com ETag forte ou data exata de modificação."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    return parse_http_date_safe(value) == int(mtime)
+
+
+def multipart_body(path, ranges, boundary, content_type, size):
+    with open(path, 'rb') as file:
+        for start, end in ranges:
+            yield (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n'
+            ).encode('ascii')
+            remaining = end - start
+            while remaining:
+                chunk = os.pread(file.fileno(), min(CHUNK_SIZE, remaining), start)
+                if not chunk:
+                    return
+                start += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+
+def multipart_length(ranges, boundary, content_type, size):
+    length = len(f'\r\n--{boundary}--\r\n')
+    for start, end in ranges:
+        length += len(
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n'
+        ) + end - start
+    return length
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(fullpath)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        return response
+
+    ranges = None
+    if 'HTTP_RANGE' in request.META and if_range_matches(request, etag, stat.st_mtime):
+        ranges = parse_ranges(request.META['HTTP_RANGE'], size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif ranges is None or ranges == [(0, size)]:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = FileResponse(RangeFile(fullpath, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    else:
+        boundary = secrets.token_hex(16)
+        response = StreamingHttpResponse(
+            multipart_body(fullpath, ranges, boundary, content_type, size),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}',
+        )
+        response['Content-Length'] = multipart_length(ranges, boundary, content_type, size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
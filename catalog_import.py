@@ -0,0 +1,404 @@
+"""
+Importação em lote do catálogo de um parceiro.
+
+O arquivo é lido em fluxo (JSON Lines ou CSV) e gravado em blocos de
+títulos, cada bloco em uma transação, com ``bulk_create(update_conflicts=True)``
+pelas chaves naturais: ``Content.external_id``, (título, temporada),
+(temporada, episódio) e (título, pessoa) no elenco. Reimportar o mesmo
+arquivo apenas atualiza as linhas. Gêneros e pessoas são resolvidos pelo
+nome em mapas em memória carregados uma vez; só os nomes novos são criados.
+
+JSON Lines, um título por linha::
+
+    {"external_id": "acme-1", "title": "...", "description": "...",
+     "content_type": "series", "release_date": "2024-01-31", "duration": 45,
+     "rating": "PG-13", "genres": ["Drama"], "directors": ["..."],
+     "cast": [{"name": "...", "character_name": "...", "order": 0}],
+     "seasons": [{"season_number": 1, "title": "...", "release_date": "...",
+                  "episodes": [{"episode_number": 1, "title": "...", ...}]}]}
+
+No CSV cada linha traz as colunas do título; ``genres``, ``directors`` e
+``cast`` são listas separadas por ``|`` (``cast`` como ``nome:personagem``).
+Linhas consecutivas com o mesmo ``external_id`` formam um título, uma por
+episódio, com as colunas ``season_number``, ``season_title``,
+``episode_number``, ``episode_title``, ``episode_description``,
+``episode_duration`` e ``episode_release_date``.
+
+Gêneros, diretores e elenco presentes no registro substituem os atuais;
+ausentes, não são alterados. Temporadas e episódios que não vêm no arquivo
+são mantidos. Os destaques editoriais (``is_featured``, ``is_trending``) não
+são importados. Como ``bulk_create`` não dispara signals, cada bloco
+recalcula os resumos das temporadas e os vetores de busca e invalida os
+manifestos e as respostas anônimas em cache; as trilhas são reconstruídas ao
+final.
+"""
+import csv
+import itertools
+import json
+from collections import Counter
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import BooleanField
+from .models import Genre, Person, Content, Cast, Season, Episode
+from .season_summaries import refresh_season_summaries
+from . import manifests, rails, response_cache, search
+
+CONTENT_FIELDS = [
+    'title', 'original_title', 'description', 'content_type', 'release_date',
+    'duration', 'rating', 'imdb_rating', 'trailer_url',
+]
+SEASON_FIELDS = ['title', 'description', 'release_date']
+EPISODE_FIELDS = ['title', 'description', 'duration', 'release_date']
+
+# Colunas de episódio do CSV -> campos do registro
+CSV_EPISODE_COLUMNS = {
+    'episode_number': 'episode_number',
+    'episode_title': 'title',
+    'episode_description': 'description',
+    'episode_duration': 'duration',
+    'episode_release_date': 'release_date',
+}
+LIST_SEPARATOR = '|'
+
+
+def clean_value(model, name, value):
+    field = model._meta.get_field(name)
+    if value in (None, ''):
+        # Default do campo, '' em textos opcionais ou None
+        value = field.get_default()
+    elif isinstance(field, BooleanField) and isinstance(value, str):
+        value = {'true': True, 'false': False}.get(value.strip().lower(), value)
+    try:
+        return field.clean(value, None)
+    except ValidationError as exc:
+        raise ValidationError(f'{name}: {"; ".join(exc.messages)}')
+
+
+def clean_fields(model, data, names):
+    return {name: clean_value(model, name, data.get(name)) for name in names}
+
+
+def ensure_object(value, name):
+    if not isinstance(value, dict):
+        raise ValidationError(f'{name}: esperado um objeto')
+    return value
+
+
+def ensure_list(value, name):
+    if not isinstance(value, list):
+        raise ValidationError(f'{name}: esperada uma lista')
+    return value
+
+
+def clean_names(values, name):
+    if isinstance(values, str):
+        values = values.split(LIST_SEPARATOR)
+    names = []
+    for value in ensure_list(values, name):
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise ValidationError(f'{name}: esperada uma lista de nomes')
+        names.append(value.strip())
+    return list(dict.fromkeys(value for value in names if value))
+
+
+def parse_cast(values):
+    cast = {}
+    for order, item in enumerate(ensure_list(values, 'cast')):
+        if isinstance(item, str):
+            item = dict(zip(('name', 'character_name'), item.split(':', 1)))
+        ensure_object(item, 'cast')
+        name = str(item.get('name') or '').strip()
+        if not name:
+            raise ValidationError('cast: nome ausente')
+        cast[name] = (
+            clean_value(Cast, 'character_name', str(item.get('character_name') or '').strip()),
+            clean_value(Cast, 'order', item.get('order', order)),
+        )
+    return cast
+
+
+def parse_seasons(values):
+    """``{número: (campos, {número do episódio: campos})}``."""
+    seasons = {}
+    for season in ensure_list(values, 'seasons'):
+        ensure_object(season, 'seasons')
+        number = clean_value(Season, 'season_number', season.get('season_number'))
+        episodes = {}
+        for episode in ensure_list(season.get('episodes') or [], 'episodes'):
+            ensure_object(episode, 'episodes')
+            episodes[clean_value(Episode, 'episode_number', episode.get('episode_number'))] = clean_fields(
+                Episode, episode, EPISODE_FIELDS
+            )
+        data = dict(season)
+        data['title'] = data.get('title') or f'Temporada {number}'
+        if not data.get('release_date') and episodes:
+            # Sem data própria, a temporada estreia com o primeiro episódio
+            data['release_date'] = min(episode['release_date'] for episode in episodes.values())
+        seasons[number] = (clean_fields(Season, data, SEASON_FIELDS), episodes)
+    return seasons
+
+
+def parse_record(data):
+    """Valida um título; levanta ``ValidationError`` com o campo inválido."""
+    ensure_object(data, 'registro')
+    external_id = str(data.get('external_id') or '').strip()
+    if not external_id:
+        raise ValidationError('external_id: campo obrigatório')
+    record = {
+        'external_id': clean_value(Content, 'external_id', external_id),
+        'content': clean_fields(Content, data, CONTENT_FIELDS),
+    }
+    for name in ('genres', 'directors'):
+        if data.get(name) is not None:
+            record[name] = clean_names(data[name], name)
+    if data.get('cast') is not None:
+        record['cast'] = parse_cast(data['cast'])
+    if data.get('seasons') is not None:
+        record['seasons'] = parse_seasons(data['seasons'])
+    return record
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line
+
+
+def read_csv(stream):
+    """Agrupa as linhas consecutivas de cada ``external_id``."""
+    reader = csv.DictReader(stream)
+    rows = ((reader.line_num, row) for row in reader)
+    for _, group in itertools.groupby(rows, key=lambda item: item[1].get('external_id')):
+        group = list(group)
+        yield group[0][0], [row for _, row in group]
+
+
+def csv_record(rows):
+    """Registro no formato do JSON Lines a partir das linhas de um título."""
+    first = rows[0]
+    data = {name: first.get(name) for name in ['external_id'] + CONTENT_FIELDS}
+    for name in ('genres', 'directors', 'cast'):
+        if first.get(name):
+            data[name] = first[name].split(LIST_SEPARATOR)
+
+    seasons = {}
+    for row in rows:
+        if not row.get('season_number'):
+            continue
+        season = seasons.setdefault(row['season_number'], {
+            'season_number': row['season_number'],
+            'title': row.get('season_title'),
+            'episodes': [],
+        })
+        if row.get('episode_number'):
+            season['episodes'].append({
+                field: row.get(column) for column, field in CSV_EPISODE_COLUMNS.items()
+            })
+    if seasons:
+        data['seasons'] = list(seasons.values())
+    return data
+
+
+def json_record(line):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        raise ValidationError(f'JSON inválido: {exc}')
+
+
+FORMATS = {
+    'jsonl': (read_jsonl, json_record),
+    'csv': (read_csv, csv_record),
+}
+
+
+def sync_pairs(model, field, content_ids, wanted):
+    """
+    Remove as linhas dos títulos ``content_ids`` cujo par (título, ``field``)
+    não está em ``wanted``; retorna os pares que já existiam.
+    """
+    existing, stale = set(), []
+    rows = model.objects.filter(content_id__in=content_ids).values_list('pk', 'content_id', field)
+    for pk, content_id, target in rows:
+        if (content_id, target) in wanted:
+            existing.add((content_id, target))
+        else:
+            stale.append(pk)
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+    return existing
+
+
+class CatalogImporter:
+    def __init__(self):
+        self.genres = dict(Genre.objects.values_list('name', 'pk'))
+        # Nomes repetidos no banco: vale a pessoa mais antiga
+        self.people = dict(Person.objects.order_by('-pk').values_list('name', 'pk').iterator())
+        self.counts = Counter()
+
+    def create_names(self, model, mapping, names, label, **fields):
+        names = [name for name in names if name not in mapping]
+        if not names:
+            return
+        model.objects.bulk_create([model(name=name, **fields) for name in names], ignore_conflicts=True)
+        mapping.update(model.objects.filter(name__in=names).order_by('-pk').values_list('name', 'pk'))
+        self.counts[label] += len(names)
+
+    def resolve_names(self, records):
+        genres, actors, directors = {}, {}, {}
+        for record in records:
+            genres.update(dict.fromkeys(record.get('genres', ())))
+            actors.update(dict.fromkeys(record.get('cast', ())))
+            directors.update(dict.fromkeys(record.get('directors', ())))
+        self.create_names(Genre, self.genres, genres, 'genres')
+        self.create_names(Person, self.people, actors, 'people')
+        self.create_names(Person, self.people, directors, 'people', roles='director')
+
+    def upsert_contents(self, records):
+        Content.objects.bulk_create(
+            [Content(external_id=record['external_id'], **record['content']) for record in records],
+            update_conflicts=True,
+            unique_fields=['external_id'],
+            update_fields=CONTENT_FIELDS + ['updated_at'],
+        )
+        self.counts['titles'] += len(records)
+        return dict(Content.objects.filter(
+            external_id__in=[record['external_id'] for record in records]
+        ).values_list('external_id', 'pk'))
+
+    def replace_links(self, through, field, key, mapping, records, content_ids):
+        """Substitui as ligações M2M dos títulos que trazem ``key``."""
+        titles, wanted = [], set()
+        for record in records:
+            if key not in record:
+                continue
+            content_id = content_ids[record['external_id']]
+            titles.append(content_id)
+            wanted.update((content_id, mapping[name]) for name in record[key])
+        if not titles:
+            return
+        existing = sync_pairs(through, field, titles, wanted)
+        rows = [through(content_id=content_id, **{field: pk}) for content_id, pk in wanted - existing]
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+        self.counts['links'] += len(rows)
+
+    def upsert_cast(self, records, content_ids):
+        titles, rows = [], []
+        for record in records:
+            if 'cast' not in record:
+                continue
+            content_id = content_ids[record['external_id']]
+            titles.append(content_id)
+            rows.extend(
+                Cast(content_id=content_id, person_id=self.people[name], character_name=character_name, order=order)
+                for name, (character_name, order) in record['cast'].items()
+            )
+        if not titles:
+            return
+        sync_pairs(Cast, 'person_id', titles, {(row.content_id, row.person_id) for row in rows})
+        Cast.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['content', 'person'],
+            update_fields=['character_name', 'order'],
+        )
+        self.counts['cast'] += len(rows)
+
+    def upsert_seasons(self, records, content_ids):
+        """Retorna os IDs das temporadas gravadas."""
+        seasons, titles = [], []
+        for record in records:
+            if 'seasons' not in record:
+                continue
+            content_id = content_ids[record['external_id']]
+            titles.append(content_id)
+            for number, (fields, _) in record['seasons'].items():
+                seasons.append(Season(content_id=content_id, season_number=number, **fields))
+        if not seasons:
+            return []
+        Season.objects.bulk_create(
+            seasons,
+            update_conflicts=True,
+            unique_fields=['content', 'season_number'],
+            update_fields=SEASON_FIELDS,
+        )
+        season_ids = {
+            (content_id, number): pk
+            for pk, content_id, number in Season.objects.filter(
+                content_id__in=titles
+            ).values_list('pk', 'content_id', 'season_number')
+        }
+
+        episodes = []
+        for record in records:
+            if 'seasons' not in record:
+                continue
+            content_id = content_ids[record['external_id']]
+            for number, (_, season_episodes) in record['seasons'].items():
+                season_id = season_ids[(content_id, number)]
+                episodes.extend(
+                    Episode(season_id=season_id, episode_number=episode_number, **fields)
+                    for episode_number, fields in season_episodes.items()
+                )
+        Episode.objects.bulk_create(
+            episodes,
+            update_conflicts=True,
+            unique_fields=['season', 'episode_number'],
+            update_fields=EPISODE_FIELDS,
+        )
+        self.counts['seasons'] += len(seasons)
+        self.counts['episodes'] += len(episodes)
+        return [season_ids[(season.content_id, season.season_number)] for season in seasons]
+
+    def write(self, records):
+        # Um título repetido no bloco: vale a última ocorrência
+        records = list({record['external_id']: record for record in records}.values())
+        with transaction.atomic():
+            self.resolve_names(records)
+            content_ids = self.upsert_contents(records)
+            self.replace_links(Content.genres.through, 'genre_id', 'genres', self.genres, records, content_ids)
+            self.replace_links(
+                Content.directors.through, 'person_id', 'directors', self.people, records, content_ids
+            )
+            self.upsert_cast(records, content_ids)
+            season_ids = self.upsert_seasons(records, content_ids)
+
+            refresh_season_summaries(Season.objects.filter(pk__in=season_ids))
+            ids = list(content_ids.values())
+            search.refresh_search_vectors(Content.objects.filter(pk__in=ids))
+            episode_ids = list(Episode.objects.filter(season__content_id__in=ids).values_list('pk', flat=True))
+            transaction.on_commit(lambda: manifests.invalidate_manifests('content', ids))
+            transaction.on_commit(lambda: manifests.invalidate_manifests('episode', episode_ids))
+            transaction.on_commit(lambda: response_cache.invalidate(*response_cache.CATALOG_MODELS))
+
+    def finish(self):
+        search.invalidate(Person)
+        rails.rebuild_rails()
+
+
+def import_catalog(stream, file_format, chunk_size=500, on_error=None):
+    """
+    Importa o catálogo de ``stream`` em blocos de ``chunk_size`` títulos.
+    Registros inválidos são pulados e passados a ``on_error(linha, mensagem)``.
+    Retorna as contagens de linhas gravadas por tipo.
+    """
+    read, load = FORMATS[file_format]
+    importer = CatalogImporter()
+    chunk = []
+    for number, raw in read(stream):
+        try:
+            chunk.append(parse_record(load(raw)))
+        except ValidationError as exc:
+            importer.counts['skipped'] += 1
+            if on_error is not None:
+                on_error(number, '; '.join(exc.messages))
+            continue
+        if len(chunk) >= chunk_size:
+            importer.write(chunk)
+            chunk = []
+    if chunk:
+        importer.write(chunk)
+    importer.finish()
+    return importer.counts
@@ -0,0 +1,115 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import Genre, Person, Content, Cast, Season, Episode, WatchHistory
+
+
+# Maximum number of queries per endpoint. Budgets do not depend on the amount
+# of data, so any N+1 regression pushes the endpoint over its limit. List and
+# detail include the ETag validator query (the only one on a 304).
+QUERY_BUDGETS = {
+    'content-list': 3,
+    'content-detail': 7,
+    'content-detail-summary': 6,
+    'content-featured': 2,
+    'content-trending': 2,
+    'content-recommendations': 4,
+    'episode-list-by-season': 1,
+    'history-continue-watching': 1,
+}
+
+# Endpoints measured under a label other than their URL name
+VARIANTS = {
+    'content-detail-summary': ('content-detail', {'seasons': 'summary'}),
+    'episode-list-by-season': ('episode-list', {'season': None}),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_catalog(size):
+    """Create a catalog of series with ``size`` rows per relation."""
+    today = datetime.date.today()
+    genres = [Genre.objects.create(name=f'Budget genre {i}') for i in range(size)]
+    people = [Person.objects.create(name=f'Budget person {i}') for i in range(size)]
+    user = User.objects.create_user(username='query-budget-user')
+
+    series = None
+    for i in range(size):
+        content = Content.objects.create(
+            title=f'Budget title {i}',
+            description='Query budget',
+            content_type='series',
+            release_date=today,
+            duration=45,
+            rating='G',
+            is_featured=True,
+            is_trending=True,
+        )
+        content.genres.set(genres)
+        content.directors.set(people)
+        for order, person in enumerate(people):
+            Cast.objects.create(content=content, person=person, order=order)
+        for season_number in range(1, size + 1):
+            season = Season.objects.create(
+                content=content, season_number=season_number,
+                title=f'Temporada {season_number}', release_date=today,
+            )
+            for episode_number in range(1, size + 1):
+                Episode.objects.create(
+                    season=season, episode_number=episode_number,
+                    title=f'Episódio {episode_number}', description='Query budget',
+                    duration=45, release_date=today,
+                )
+        series = series or content
+
+    WatchHistory.objects.create(user=user, content=series)
+    return series, user
+
+
+class Command(BaseCommand):
+    """Django command to assert the maximum query count of each catalog endpoint"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5, help='Rows created per relation')
+
+    def measure(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}')
+        return len(queries)
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            with transaction.atomic():
+                series, user = build_catalog(options['size'])
+                client = APIClient()
+                client.force_authenticate(user=user)
+
+                season = series.seasons.first()
+                for label, budget in QUERY_BUDGETS.items():
+                    name, params = VARIANTS.get(label, (label, {}))
+                    params = {key: value or season.pk for key, value in params.items()}
+                    kwargs = {'pk': series.pk} if name == 'content-detail' else {}
+                    count = self.measure(client, reverse(name, kwargs=kwargs), params)
+                    line = f'{label}: {count} queries (budget {budget})'
+                    if count > budget:
+                        failures.append(line)
+                        self.stdout.write(self.style.ERROR(line))
+                    else:
+                        self.stdout.write(line)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError('Query budget exceeded: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All query budgets respected!'))
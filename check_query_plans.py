@@ -0,0 +1,173 @@
+import json
+import re
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .check_query_budgets import Rollback, build_catalog
+from .heartbeats import resolve_keys, write_progress
+from .models import Genre, Content, Episode, WatchHistory, ContinueWatching, Favorite, Rating
+from .rails import render_rail
+
+
+# Hot paths checked, as (label, url name, url kwargs, query params)
+ENDPOINTS = [
+    ('list', 'content-list', {}, {}),
+    ('list by type', 'content-list', {}, {'type': 'series'}),
+    ('list by rating', 'content-list', {}, {'rating': 'G'}),
+    ('list by year', 'content-list', {}, {'year': '2024'}),
+    ('list by genre', 'content-list', {}, {'genre': 'budget'}),
+    ('list by popularity', 'content-list', {}, {'sort_by': 'popularity'}),
+    ('list by release date', 'content-list', {}, {'sort_by': 'release_date'}),
+    ('list by imdb rating', 'content-list', {}, {'sort_by': 'rating'}),
+    ('list by user rating', 'content-list', {}, {'sort_by': 'user_rating'}),
+    ('detail', 'content-detail', {'pk': None}, {}),
+    ('detail with season summaries', 'content-detail', {'pk': None}, {'seasons': 'summary'}),
+    ('recommendations', 'content-recommendations', {}, {}),
+    ('seasons by content', 'season-list', {}, {'content': None}),
+    ('episodes by season', 'episode-list', {}, {'season': None}),
+    ('history', 'history-list', {}, {}),
+    ('continue watching', 'history-continue-watching', {}, {}),
+    ('favorites', 'favorites-list', {}, {}),
+    ('ratings by user', 'ratings-list', {}, {}),
+    ('ratings by content', 'ratings-list', {}, {'content': None}),
+]
+
+# Sequential scans that are expected per database. SQLite cannot index an
+# infix LIKE, so the genre name filter always scans the (small) genre table;
+# PostgreSQL serves it from the UPPER(name) trigram index in indexes.py.
+ALLOWED_SEQ_SCANS = {
+    'sqlite': {Genre._meta.db_table},
+    'postgresql': set(),
+}
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)')
+SQL_ALIAS_RE = re.compile(r'"(\w+)" (U\d+)\b')
+
+
+def sequential_scans(sql):
+    """Tables read with a sequential scan in the plan of ``sql``."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            tables = set()
+            nodes = [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    tables.add(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return tables
+
+        # SQLite reports subquery aliases (U0, U1...) instead of table names
+        aliases = {alias: table for table, alias in SQL_ALIAS_RE.findall(sql)}
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        tables = set()
+        for row in cursor.fetchall():
+            match = SQLITE_SCAN_RE.match(row[-1])
+            if match and 'USING' not in row[-1]:
+                tables.add(aliases.get(match.group(1), match.group(1)))
+        return tables
+
+
+class Command(BaseCommand):
+    """Django command to fail when a hot path query plan falls back to a sequential scan"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5, help='Rows created per relation')
+        parser.add_argument('--users', type=int, default=200, help='Background users with history')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every checked query')
+
+    def seed(self, size, users):
+        series, user = build_catalog(size)
+        contents = list(Content.objects.all()[:size])
+        for content in contents:
+            Favorite.objects.create(user=user, content=content)
+            Rating.objects.create(user=user, content=content, rating=4)
+
+        # Other viewers, so that table statistics resemble production and a
+        # per-user lookup is selective
+        others = User.objects.bulk_create(
+            User(username=f'query-plan-user-{i}') for i in range(users)
+        )
+        WatchHistory.objects.bulk_create(
+            WatchHistory(user=other, content=content, completed=True)
+            for other in others for content in contents
+        )
+        ContinueWatching.objects.bulk_create(
+            ContinueWatching(user=other, content=content, updated_at=timezone.now())
+            for other in others for content in contents
+        )
+        Rating.objects.bulk_create(
+            Rating(user=other, content=content, rating=3)
+            for other in others for content in contents
+        )
+        return series, user
+
+    def capture(self, label, run):
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        return [(label, query['sql']) for query in queries]
+
+    def collect(self, client, series, user):
+        season = series.seasons.first()
+        ids = {'pk': series.pk, 'content': series.pk, 'season': season.pk}
+        captured = []
+        for label, name, kwargs, params in ENDPOINTS:
+            kwargs = {key: ids[key] for key in kwargs}
+            params = {key: value if value is not None else ids[key] for key, value in params.items()}
+            url = reverse(name, kwargs=kwargs)
+            captured += self.capture(label, lambda: client.get(url, params))
+
+        for rail in ('featured', 'trending'):
+            captured += self.capture(f'{rail} rail', lambda: render_rail(rail))
+
+        episode = Episode.objects.filter(season=season).first()
+        batch = {
+            (user.pk, series.pk, None): (120, False),
+            (user.pk, None, episode.pk): (60, False),
+        }
+        captured += self.capture('heartbeat flush', lambda: write_progress(resolve_keys(batch)))
+        return captured
+
+    def handle(self, *args, **options):
+        allowed = ALLOWED_SEQ_SCANS.get(connection.vendor, set())
+        failures = []
+        try:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # Makes the planner pick any usable index even on a small
+                    # seed, so a remaining Seq Scan means a missing index
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+
+                series, user = self.seed(options['size'], options['users'])
+                # Fresh statistics, as in production, instead of planner defaults
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                client = APIClient()
+                client.force_authenticate(user=user)
+
+                for label, sql in self.collect(client, series, user):
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    scans = sequential_scans(sql) - allowed
+                    if options['verbose_plans']:
+                        self.stdout.write(f'{label}: {sql}')
+                    if scans:
+                        line = f'{label}: sequential scan on {", ".join(sorted(scans))}'
+                        failures.append(line)
+                        self.stdout.write(self.style.ERROR(f'{line}\n  {sql}'))
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f'{len(failures)} queries fall back to sequential scans')
+        self.stdout.write(self.style.SUCCESS('All hot path queries use indexes!'))
@@ -0,0 +1,89 @@
+import time
+from contextlib import ExitStack
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import Content, Favorite, WatchHistory
+from .replicas import REPLICAS, use_replica
+
+CHECK_USERNAME = 'replica-check-user'
+
+
+class Command(BaseCommand):
+    """Django command to assert which database serves each kind of read when replicas are configured"""
+
+    def capture(self, action):
+        """Runs ``action`` and returns the SQL sent to the primary and the query count on the replicas."""
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in [DEFAULT_DB_ALIAS] + REPLICAS
+            }
+            action()
+        primary = [query['sql'] for query in captured[DEFAULT_DB_ALIAS]]
+        return primary, sum(len(captured[alias]) for alias in REPLICAS)
+
+    def get(self, client, name):
+        # Unique query string: anonymous responses would come from the response cache
+        response = client.get(reverse(name), {'check': time.time_ns()})
+        if response.status_code != 200:
+            raise CommandError(f'{name} returned {response.status_code}')
+
+    def handle(self, *args, **options):
+        if not REPLICAS:
+            raise CommandError('No read replica configured; set DATABASE_REPLICA_URLS')
+        content_id = Content.objects.values_list('pk', flat=True).first()
+        if content_id is None:
+            raise CommandError('The catalog is empty; load some content before checking')
+
+        # Writes cannot be rolled back here: reads inside a transaction stay on
+        # the primary, which is exactly what is being checked
+        user = User.objects.create_user(CHECK_USERNAME)
+        try:
+            token = Token.objects.create(user=user)
+            anonymous = APIClient()
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+            # (label, action, catalog reads expected on a replica)
+            checks = [
+                ('anonymous catalog read', lambda: self.get(anonymous, 'content-list'), True),
+                ('authenticated catalog read', lambda: self.get(client, 'content-list'), True),
+                ('user data read', lambda: self.get(client, 'favorites-list'), False),
+                ('write', lambda: Favorite.objects.create(user=user, content_id=content_id), False),
+                ('catalog read after a write', lambda: self.get(client, 'content-list'), False),
+                ('anonymous read after a write', lambda: self.get(anonymous, 'content-list'), True),
+            ]
+            failures = []
+            for label, action, on_replica in checks:
+                primary, replica = self.capture(action)
+                catalog_on_primary = any('movies_content' in sql for sql in primary)
+                ok = (replica and not catalog_on_primary) if on_replica else not replica
+                line = f'{label}: {len(primary)} queries on the primary, {replica} on replicas'
+                if not ok:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+
+            def report():
+                with use_replica(user_data=True):
+                    list(WatchHistory.objects.values_list('pk')[:1])
+
+            primary, replica = self.capture(report)
+            line = f'reporting read: {len(primary)} queries on the primary, {replica} on replicas'
+            if primary or not replica:
+                failures.append('reporting read')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        finally:
+            user.delete()
+
+        if failures:
+            raise CommandError('Wrong database for: ' + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Reads are routed as expected!'))
@@ -0,0 +1,111 @@
+"""
+GET condicional (ETag / Last-Modified) para os recursos do catálogo.
+
+Os validadores são calculados antes de serializar a resposta, a partir de
+``updated_at`` e ``view_count`` do registro (detalhe) ou das linhas da página
+(listagem), de modo que uma requisição com ``If-None-Match`` ou
+``If-Modified-Since`` válido recebe 304 sem passar pelo serializer. A
+listagem só tem ETag: o maior ``updated_at`` da página não muda quando uma
+linha sai dela (removida, filtrada ou empurrada pela seguinte). Para que
+``updated_at`` represente também as relações aninhadas (temporadas,
+episódios, elenco, gêneros), as alterações nessas tabelas atualizam o
+``updated_at`` dos títulos afetados (ver signals.py).
+"""
+import hashlib
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .models import Content
+
+
+def touch_contents(queryset):
+    """Marca os títulos como alterados sem disparar post_save."""
+    return Content.objects.filter(pk__in=queryset.values('pk')).update(updated_at=timezone.now())
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def detail_validators(request, row):
+    """Validadores do detalhe a partir de ``(updated_at, view_count)``."""
+    if row is None:
+        return None
+    updated_at, view_count = row
+    # A query string escolhe a representação (ex.: ?seasons=summary)
+    return make_etag(request.get_full_path(), updated_at.isoformat(), view_count), updated_at
+
+
+def page_validators(request, page, paginator):
+    """Validadores da listagem a partir de ``(pk, updated_at, view_count)`` da página; sem Last-Modified."""
+    if not page:
+        return None
+    return make_etag(
+        request.get_full_path(),
+        [(pk, updated_at.isoformat(), view_count) for pk, updated_at, view_count in page],
+        paginator.get_next_link(),
+        paginator.get_previous_link(),
+    ), None
+
+
+def evaluate_conditional(request, validators, format):
+    """
+    ``(etag, timestamp, resposta 304/412 ou None)``; ``format`` é o do
+    renderer negociado, que muda o corpo (JSON ou API navegável).
+    """
+    etag, last_modified = validators
+    etag = make_etag(etag, format)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def add_validators(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Responde 304 a GETs condicionais em ``list`` e ``retrieve``. A listagem
+    usa o ``FastListMixin``: os validadores saem das próprias linhas da
+    página, lidas uma única vez.
+    """
+
+    def get_detail_validators(self, request, pk):
+        try:
+            row = Content.objects.filter(pk=pk).values_list('updated_at', 'view_count').first()
+        except (TypeError, ValueError):
+            return None
+        return detail_validators(request, row)
+
+    def conditional(self, request, validators, render):
+        if validators is None:
+            return render()
+
+        etag, timestamp, response = evaluate_conditional(request, validators, request.accepted_renderer.format)
+        if response is None:
+            response = render()
+        return add_validators(response, etag, timestamp)
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            return super().list(request, *args, **kwargs)
+        # Como em async_views.content_list: a página serve aos validadores e,
+        # sem 304, à resposta
+        rows = self.paginate_queryset(self.fast_queryset('updated_at', 'view_count'))
+        page = [(row['id'], row['updated_at'], row['view_count']) for row in rows]
+        return self.conditional(
+            request, page_validators(request, page, self.paginator),
+            lambda: self.fast_page_response(rows),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.conditional(
+            request, self.get_detail_validators(request, pk),
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
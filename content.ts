@@ -25,9 +25,13 @@ export interface Content {
   imdb_rating?: number;
   poster?: string;
   backdrop?: string;
+  // srcset por campo e formato, ex.: images.poster.webp
+  images?: Record<string, Record<string, string>>;
   trailer_url?: string;
   is_featured: boolean;
   is_trending: boolean;
+  user_rating?: number | null;
+  rating_count?: number;
   view_count: number;
   genres: Genre[];
 }
@@ -51,7 +55,10 @@ export interface Season {
   description?: string;
   release_date: string;
   poster?: string;
-  episodes: Episode[];
+  // Ausente com ?seasons=summary: episódios via /movies/episodes/?season=
+  episodes?: Episode[];
+  episode_count: number;
+  total_runtime: number;
 }
 
 export interface Episode {
@@ -67,25 +74,26 @@ export interface Episode {
 }
 
 export interface ContentResponse {
-  count: number;
   next: string | null;
   previous: string | null;
   results: Content[];
 }
 
-// Obter lista de conteúdos com paginação e filtros
+// Obter lista de conteúdos com paginação por cursor e filtros.
+// Para as próximas páginas, passe a URL recebida em `next`.
 export const getContents = async (
-  page = 1,
   filters?: {
     type?: string;
     genre?: string;
     rating?: string;
     year?: number;
     sort_by?: string;
-  }
+  },
+  next?: string | null
 ): Promise<ContentResponse> => {
-  const params = { page, ...filters };
-  const response = await api.get<ContentResponse>('/movies/contents/', { params });
+  const response = next
+    ? await api.get<ContentResponse>(next)
+    : await api.get<ContentResponse>('/movies/contents/', { params: filters });
   return response.data;
 };
 
@@ -170,3 +178,21 @@ export const getWatchHistory = async (): Promise<{
   return response.data;
 };
 
+
+// Trilha "continuar assistindo": um item por título, com o próximo episódio
+// já resolvido nas séries (up_next quando o anterior foi concluído)
+export interface ContinueWatchingItem {
+  content: Pick<Content, 'id' | 'title' | 'content_type' | 'duration' | 'poster' | 'backdrop' | 'images'>;
+  episode: (Pick<Episode, 'id' | 'season' | 'episode_number' | 'title' | 'duration' | 'thumbnail'> & {
+    season_number: number;
+    images?: Content['images'];
+  }) | null;
+  progress: number;
+  up_next: boolean;
+  updated_at: string;
+}
+
+export const getContinueWatching = async (): Promise<ContinueWatchingItem[]> => {
+  const response = await api.get<ContinueWatchingItem[]>('/movies/history/continue/');
+  return response.data;
+};
@@ -0,0 +1,211 @@
+"""
+Trilha "continuar assistindo" materializada por usuário.
+
+Cada escrita de progresso (lote de heartbeats ou ``WatchHistory`` salvo pela
+API) atualiza ``ContinueWatching``, que guarda uma linha por (usuário,
+título) com o que reproduzir a seguir:
+
+* filme ou episódio em andamento: o próprio item e o progresso;
+* episódio concluído: o episódio seguinte pela ordem
+  (``Season.season_number``, ``Episode.episode_number``), com ``up_next``;
+* filme concluído ou último episódio concluído: o título sai da trilha.
+
+A leitura da trilha é uma única consulta pelo índice (usuário, -updated_at).
+Remover histórico remove a entrada correspondente; ``rebuild`` recalcula
+tudo a partir do histórico.
+"""
+import bisect
+import functools
+import operator
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Episode, WatchHistory, ContinueWatching
+
+CONTINUE_WATCHING_LIMIT = getattr(settings, 'CONTINUE_WATCHING_LIMIT', 20)
+
+UPDATE_FIELDS = ['episode', 'progress', 'up_next', 'updated_at']
+
+
+def episode_positions(episode_ids):
+    """``{episode_id: (content_id, season_number, episode_number)}``."""
+    if not episode_ids:
+        return {}
+    rows = Episode.objects.filter(pk__in=episode_ids).values_list(
+        'pk', 'season__content_id', 'season__season_number', 'episode_number'
+    )
+    return {pk: (content_id, season, number) for pk, content_id, season, number in rows}
+
+
+def next_episodes(positions):
+    """
+    ``{(content_id, season_number, episode_number): ID do episódio seguinte}``
+    em uma única consulta: os episódios de cada série a partir da posição
+    mais antiga pedida, pelos índices únicos de temporada e episódio.
+    """
+    earliest = {}
+    for content_id, *position in positions:
+        if content_id not in earliest or tuple(position) < earliest[content_id]:
+            earliest[content_id] = tuple(position)
+    if not earliest:
+        return {}
+
+    rows = Episode.objects.filter(functools.reduce(operator.or_, (
+        Q(season__content_id=content_id)
+        & (Q(season__season_number=season, episode_number__gt=number) | Q(season__season_number__gt=season))
+        for content_id, (season, number) in earliest.items()
+    ))).order_by('season__content_id', 'season__season_number', 'episode_number').values_list(
+        'season__content_id', 'season__season_number', 'episode_number', 'pk'
+    )
+    series = defaultdict(lambda: ([], []))
+    for content_id, season, number, pk in rows:
+        keys, pks = series[content_id]
+        keys.append((season, number))
+        pks.append(pk)
+
+    following = {}
+    for content_id, *position in positions:
+        keys, pks = series.get(content_id, ([], []))
+        index = bisect.bisect_right(keys, tuple(position))
+        following[(content_id, *position)] = pks[index] if index < len(pks) else None
+    return following
+
+
+def completed_positions(latest):
+    """Posições dos episódios concluídos em ``{chave: (episode_id, posição, progresso, concluído)}``."""
+    return {
+        (key[1], *position)
+        for key, (episode_id, position, _, completed) in latest.items()
+        if completed and episode_id is not None
+    }
+
+
+def resolve_entry(content_id, episode_id, position, progress, completed, following):
+    """
+    ``(episode_id, progress, up_next)`` da trilha, ou ``None`` se o título sai
+    dela; ``following`` é o resultado de ``next_episodes``.
+    """
+    if not completed:
+        return episode_id, progress, False
+    if episode_id is None:
+        return None
+    following = following.get((content_id, *position))
+    if following is None:
+        return None
+    return following, 0, True
+
+
+def latest_per_title(rows, positions):
+    """
+    Reduz ``{(user_id, content_id, episode_id): (progress, completed)}`` a uma
+    entrada por (usuário, título). Dentro de um mesmo lote vale o episódio
+    mais adiante na série.
+    """
+    latest = {}
+    for (user_id, content_id, episode_id), (progress, completed) in rows.items():
+        position = ()
+        if episode_id:
+            if episode_id not in positions:
+                continue
+            content_id, *position = positions[episode_id]
+        if not content_id:
+            continue
+        key = (user_id, content_id)
+        if key not in latest or tuple(position) > latest[key][1]:
+            latest[key] = (episode_id, tuple(position), progress, completed)
+    return latest
+
+
+def save_entries(latest, updated_at):
+    following = next_episodes(completed_positions(latest))
+    upserts, removals = [], []
+    for (user_id, content_id), (episode_id, position, progress, completed) in latest.items():
+        entry = resolve_entry(content_id, episode_id, position, progress, completed, following)
+        if entry is None:
+            removals.append(Q(user_id=user_id, content_id=content_id))
+            continue
+        upserts.append(ContinueWatching(
+            user_id=user_id, content_id=content_id, episode_id=entry[0],
+            progress=entry[1], up_next=entry[2], updated_at=updated_at,
+        ))
+
+    with transaction.atomic():
+        if removals:
+            ContinueWatching.objects.filter(functools.reduce(operator.or_, removals)).delete()
+        if upserts:
+            ContinueWatching.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=['user', 'content'],
+                update_fields=UPDATE_FIELDS,
+            )
+    return len(upserts)
+
+
+def record_progress(rows, updated_at=None):
+    """
+    Aplica escritas de progresso à trilha. ``rows`` tem o formato do buffer
+    de heartbeats; o título dos episódios é resolvido aqui.
+    """
+    positions = episode_positions({episode_id for _, _, episode_id in rows if episode_id})
+    latest = latest_per_title(rows, positions)
+    if not latest:
+        return 0
+    return save_entries(latest, updated_at or timezone.now())
+
+
+def forget(user_id, content_id, episode_id):
+    """
+    Histórico removido: tira da trilha a entrada derivada dele (o próprio item
+    em andamento ou o próximo episódio de uma série).
+    """
+    entries = ContinueWatching.objects.filter(user_id=user_id)
+    if content_id:
+        entries = entries.filter(content_id=content_id).filter(Q(episode_id=episode_id) | Q(up_next=True))
+    else:
+        entries = entries.filter(episode_id=episode_id)
+    return entries.delete()[0]
+
+
+def rebuild(user_ids=None, chunk_size=500):
+    """
+    Recalcula a trilha a partir do histórico (todos os usuários ou apenas
+    ``user_ids``), em blocos de usuários. Retorna o número de entradas.
+    """
+    if user_ids is None:
+        user_ids = WatchHistory.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    user_ids = list(user_ids)
+
+    total = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        history = WatchHistory.objects.filter(user_id__in=chunk).order_by('-watched_at', '-id').values_list(
+            'user_id', 'content_id', 'episode_id', 'episode__season__content_id',
+            'episode__season__season_number', 'episode__episode_number',
+            'progress', 'completed', 'watched_at',
+        )
+        latest, updated = {}, {}
+        for user_id, content_id, episode_id, episode_content, season, number, progress, completed, watched_at in history:
+            key = (user_id, episode_content or content_id)
+            if key[1] is None or key in latest:
+                continue
+            position = (season, number) if episode_id else ()
+            latest[key] = (episode_id, position, progress, completed)
+            updated[key] = watched_at
+
+        following = next_episodes(completed_positions(latest))
+        with transaction.atomic():
+            ContinueWatching.objects.filter(user_id__in=chunk).delete()
+            entries = []
+            for (user_id, content_id), (episode_id, position, progress, completed) in latest.items():
+                entry = resolve_entry(content_id, episode_id, position, progress, completed, following)
+                if entry is not None:
+                    entries.append(ContinueWatching(
+                        user_id=user_id, content_id=content_id, episode_id=entry[0],
+                        progress=entry[1], up_next=entry[2], updated_at=updated[(user_id, content_id)],
+                    ))
+            ContinueWatching.objects.bulk_create(entries)
+        total += len(entries)
+    return total
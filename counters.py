@@ -0,0 +1,110 @@
+"""
+Contadores de visualização sem contenção.
+
+Cada reprodução incrementa um contador em memória, distribuído em shards com
+locks independentes, em vez de atualizar a linha de ``Content``/``Episode``
+(que vira um ponto quente nos títulos de sucesso). Periodicamente os deltas
+acumulados são somados às colunas ``view_count`` com um UPDATE por grupo, de
+modo que ``sort_by=popularity`` fica no máximo ``VIEW_COUNT_FLUSH_INTERVAL``
+segundos atrasado. As trilhas, que guardam ``view_count`` no JSON, são
+reconstruídas quando o flush altera um título que está nelas.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from .models import Content, Episode
+from . import rails
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+SHARDS = getattr(settings, 'VIEW_COUNT_SHARDS', 16)
+
+MODELS = {
+    'content': Content,
+    'episode': Episode,
+}
+
+
+class ViewCounters:
+    def __init__(self, shards=SHARDS, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.shards = [(threading.Lock(), Counter()) for _ in range(shards)]
+        self.flush_lock = threading.Lock()
+        self.worker_lock = threading.Lock()
+        self.worker = None
+
+    def add(self, key, amount):
+        lock, counts = self.shards[hash(key) % len(self.shards)]
+        with lock:
+            counts[key] += amount
+
+    def increment(self, kind, pk, amount=1):
+        self.add((kind, int(pk)), amount)
+        self.ensure_worker()
+
+    def drain(self):
+        drained = Counter()
+        for lock, counts in self.shards:
+            with lock:
+                drained.update(counts)
+                counts.clear()
+        return drained
+
+    def flush(self):
+        """
+        Soma os deltas às colunas canônicas. IDs com o mesmo delta são
+        agrupados em um único UPDATE, sempre em ordem de ID para que dois
+        workers nunca bloqueiem linhas em ordem inversa.
+        """
+        with self.flush_lock:
+            drained = self.drain()
+            if not drained:
+                return 0
+
+            groups = defaultdict(list)
+            for (kind, pk), amount in drained.items():
+                groups[(kind, amount)].append(pk)
+
+            try:
+                with transaction.atomic():
+                    for (kind, amount), pks in sorted(groups.items()):
+                        MODELS[kind].objects.filter(pk__in=sorted(pks)).update(
+                            view_count=F('view_count') + amount
+                        )
+                    content_ids = [pk for kind, pk in drained if kind == 'content']
+                    if content_ids and rails.in_rails(Content.objects.filter(pk__in=content_ids)):
+                        transaction.on_commit(rails.rebuild_rails)
+            except Exception:
+                # Devolve os deltas para a próxima tentativa
+                for key, amount in drained.items():
+                    self.add(key, amount)
+                raise
+            return len(drained)
+
+    def ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.worker_lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name='view-count-flush', daemon=True)
+                self.worker.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar os contadores de visualização')
+            finally:
+                connection.close()
+
+
+view_counters = ViewCounters()
+atexit.register(view_counters.flush)
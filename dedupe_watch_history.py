@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from .heartbeats import deduplicate_history
+
+
+class Command(BaseCommand):
+    """Django command to merge duplicate watch history rows before the unique_watch_progress constraint is applied"""
+
+    def handle(self, *args, **options):
+        count = deduplicate_history()
+        self.stdout.write(self.style.SUCCESS(f'{count} duplicate watch history rows removed'))
@@ -0,0 +1,236 @@
+"""
+Derivados responsivos das imagens do catálogo.
+
+Ao salvar um pôster, fundo, miniatura ou foto, versões em larguras fixas
+(JPEG e WebP) são geradas em segundo plano e gravadas no storage sob o
+prefixo ``derivatives/``. Nos processos web o trabalho fica em um pool de
+threads do próprio processo (o Pillow libera o GIL ao redimensionar e
+codificar): criar processos a partir de um worker com threads ou de um event
+loop não é seguro. Só o comando ``build_image_derivatives`` usa um pool de
+processos. As chaves geradas ficam no campo ``images`` do
+próprio registro, no formato::
+
+    {'poster': {'source': 'posters/a.jpg',
+                'jpeg': {'200': 'derivatives/posters/a_200w.jpg', ...},
+                'webp': {'200': 'derivatives/posters/a_200w.webp', ...}}}
+
+e os serializers expõem esse mapa como atributos ``srcset`` prontos.
+"""
+import io
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from .conditional import touch_contents
+from .models import Person, Content, Season, Episode
+from . import response_cache
+from .storage_urls import media_url
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DERIVATIVE_WORKERS = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+
+# Larguras geradas para cada campo de imagem
+WIDTHS = {
+    'poster': [200, 400, 800],
+    'backdrop': [640, 1280, 1920],
+    'thumbnail': [320, 640],
+    'photo': [200, 400],
+}
+
+IMAGE_FIELDS = {
+    Content: ['poster', 'backdrop'],
+    Season: ['poster'],
+    Episode: ['thumbnail'],
+    Person: ['photo'],
+}
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+def derivative_name(source, width, extension):
+    root, _ = posixpath.splitext(source)
+    return f'derivatives/{root}_{width}w.{extension}'
+
+
+def render_variants(data, widths):
+    """
+    Recebe os bytes do original e devolve ``{(formato, largura): bytes}``;
+    executável em um pool de processos. Não amplia imagens menores que as
+    larguras pedidas; nesse caso gera apenas a largura original.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    targets = [width for width in widths if width < image.width] or [image.width]
+    rendered = {}
+    for width in targets:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for fmt, (pil_format, _, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            rendered[(fmt, width)] = buffer.getvalue()
+    return rendered
+
+
+def touch_related_contents(model, pk):
+    """Mantém os ETags do catálogo coerentes (ver conditional.py)."""
+    if model is Content:
+        return
+    if model is Season:
+        touch_contents(Content.objects.filter(seasons=pk))
+    elif model is Episode:
+        touch_contents(Content.objects.filter(seasons__episodes=pk))
+    elif model is Person:
+        touch_contents(Content.objects.filter(cast=pk))
+        touch_contents(Content.objects.filter(directors=pk))
+
+
+def store_variants(model, pk, field, source, variants):
+    """
+    Grava o mapa de derivados de ``field``, a menos que a imagem tenha sido
+    trocada enquanto os derivados eram gerados.
+    """
+    with transaction.atomic():
+        row = model.objects.select_for_update().filter(pk=pk).values(field, 'images').first()
+        if row is None or (row[field] or '') != (source or ''):
+            return False
+        images = dict(row['images'] or {})
+        if variants is None:
+            images.pop(field, None)
+        else:
+            images[field] = variants
+        changes = {'images': images}
+        if model is Content:
+            changes['updated_at'] = timezone.now()
+        model.objects.filter(pk=pk).update(**changes)
+        touch_related_contents(model, pk)
+        # Gravado sem signals: as respostas anônimas em cache mostram ``images``
+        transaction.on_commit(lambda: response_cache.invalidate(model, Content))
+        if model is Content:
+            # As trilhas guardam o JSON pronto, que inclui ``images``
+            from .rails import rebuild_rails
+            transaction.on_commit(rebuild_rails)
+    return True
+
+
+class DerivativePipeline:
+    """
+    As threads leem o original e gravam os derivados (E/S). Com
+    ``use_processes`` o redimensionamento (CPU) vai para um pool de
+    processos; sem ele, roda nas próprias threads.
+    """
+
+    def __init__(self, workers=IMAGE_DERIVATIVE_WORKERS, use_processes=False):
+        self.workers = workers
+        self.use_processes = use_processes
+        self.processes = None
+        self.threads = None
+
+    def start(self):
+        if self.threads is None:
+            if self.use_processes:
+                self.processes = ProcessPoolExecutor(max_workers=self.workers)
+            self.threads = ThreadPoolExecutor(max_workers=self.workers * 2, thread_name_prefix='image-derivatives')
+
+    def generate(self, model, pk, field):
+        """Gera e registra os derivados de um campo. Bloqueia até terminar."""
+        self.start()
+        try:
+            file = getattr(model.objects.only(field).get(pk=pk), field)
+            source = file.name
+            if not source:
+                return store_variants(model, pk, field, source, None)
+
+            with file.storage.open(source, 'rb') as original:
+                data = original.read()
+            if self.processes is not None:
+                rendered = self.processes.submit(render_variants, data, WIDTHS[field]).result()
+            else:
+                rendered = render_variants(data, WIDTHS[field])
+
+            variants = {'source': source}
+            for (fmt, width), content in sorted(rendered.items()):
+                extension = FORMATS[fmt][1]
+                name = derivative_name(source, width, extension)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                saved = default_storage.save(name, ContentFile(content))
+                variants.setdefault(fmt, {})[str(width)] = saved
+            return store_variants(model, pk, field, source, variants)
+        finally:
+            connection.close()
+
+    def submit(self, model, pk, field):
+        self.start()
+        future = self.threads.submit(self.generate, model, pk, field)
+        future.add_done_callback(self.log_failure)
+        return future
+
+    def log_failure(self, future):
+        if future.exception() is not None:
+            logger.error('Falha ao gerar derivados de imagem', exc_info=future.exception())
+
+
+pipeline = DerivativePipeline()
+
+
+def stale_fields(instance):
+    """Campos de imagem cujo mapa de derivados não corresponde ao arquivo atual."""
+    images = instance.images or {}
+    stale = []
+    for field in IMAGE_FIELDS[type(instance)]:
+        name = getattr(instance, field).name or ''
+        entry = images.get(field)
+        if name and (entry is None or entry.get('source') != name):
+            stale.append(field)
+        elif not name and entry is not None:
+            stale.append(field)
+    return stale
+
+
+def srcset(storage, variants, request):
+    urls = []
+    for width, name in sorted(variants.items(), key=lambda item: int(item[0])):
+        url = media_url(storage, name)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls.append(f'{url} {width}w')
+    return ', '.join(urls)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Representa o campo ``images`` como ``{campo: {formato: srcset}}``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def make_converter(self, request):
+        # Usado também pelo fastpath, que não tem contexto de serializer
+        def convert(images):
+            return {
+                field: {
+                    fmt: srcset(default_storage, variants, request)
+                    for fmt, variants in entry.items() if fmt != 'source'
+                }
+                for field, entry in images.items()
+            }
+        return convert
+
+    def to_representation(self, value):
+        return self.make_converter(self.context.get('request'))(value or {})
+
@@ -0,0 +1,216 @@
+"""
+Serialização rápida (somente leitura) das listagens de conteúdo.
+
+``ContentListSerializer`` instancia um modelo por linha e percorre a
+maquinaria de campos do DRF para cada atributo. Aqui a mesma saída é montada
+a partir de linhas ``.values()`` e de um mapa de gêneros obtido em uma única
+consulta, reaproveitando as conversões dos próprios campos do serializer
+(datas, URLs de arquivo) para que o JSON final seja idêntico byte a byte.
+``?fields=`` e ``?expand=`` são respeitados como no serializer (ver
+fieldsets.py): só as colunas pedidas são lidas e o mapa de gêneros só é
+consultado quando ``genres`` sai na resposta.
+"""
+import functools
+import operator
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.relations import ManyRelatedField
+from .fieldsets import prune_fields
+from .metrics import timed
+from .models import Genre, Content
+from .serializers import ContentListSerializer, GenreSerializer
+from .storage_urls import media_url
+
+# Campos cujo valor vindo do banco já é a representação final
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+)
+
+
+def file_converter(model_field, request):
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        url = media_url(storage, name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return convert
+
+
+@functools.cache
+def declared_fields(serializer_class):
+    """Campos do serializer, instanciados uma única vez por processo."""
+    return tuple(serializer_class().fields.items())
+
+
+def selected_fields(serializer_class, request, path=()):
+    """Campos do serializer após ``?fields=``/``?expand=``, como dicionário."""
+    return prune_fields(dict(declared_fields(serializer_class)), request, path)
+
+
+def compile_fields(fields, model, context, nested=None):
+    """
+    Lista de ``(coluna, nome, conversor)`` na ordem de ``fields``, onde o
+    conversor é ``None`` quando o valor do banco pode ser copiado
+    diretamente. Relações só entram se informadas em ``nested`` como
+    ``nome: (coluna, conversor)``.
+    """
+    request = context.get('request')
+    nested = nested or {}
+    compiled = []
+    for name, field in fields.items():
+        if isinstance(field, (serializers.BaseSerializer, ManyRelatedField)):
+            if name in nested:
+                compiled.append((nested[name][0], name, nested[name][1]))
+            continue
+        if hasattr(field, 'make_converter'):
+            converter = field.make_converter(request)
+        elif isinstance(field, serializers.FileField):
+            converter = file_converter(model._meta.get_field(field.source), request)
+        elif isinstance(field, PASSTHROUGH_FIELDS):
+            converter = None
+        else:
+            converter = field.to_representation
+        compiled.append((field.source, name, converter))
+    return compiled
+
+
+def convert_row(row, compiled, prefix=''):
+    data = {}
+    for source, name, converter in compiled:
+        value = row[prefix + source]
+        if value is not None and converter is not None:
+            value = converter(value)
+        data[name] = value
+    return data
+
+
+class ContentListFastSerializer:
+    """
+    Mesma saída de ``ContentListSerializer(many=True)`` para linhas
+    ``.values()`` de ``Content``.
+    """
+    serializer_class = ContentListSerializer
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def value_fields(cls, request=None):
+        """Colunas lidas; a chave primária entra sempre (gêneros e cursor)."""
+        fields = selected_fields(cls.serializer_class, request)
+        return list(dict.fromkeys(['id'] + [
+            field.source for field in fields.values()
+            if not isinstance(field, (serializers.BaseSerializer, ManyRelatedField))
+        ]))
+
+    def genre_query(self, content_ids, expanded):
+        """
+        Consulta dos gêneros das linhas e a função que monta, a partir do
+        resultado, ``{content_id: [gênero, ...]}``; com ``expanded`` falso os
+        gêneros são apenas as chaves primárias.
+        """
+        ordering = ['genre__' + name for name in Genre._meta.ordering]
+        rows = Content.genres.through.objects.filter(
+            content_id__in=content_ids
+        ).order_by(*ordering)
+
+        if expanded:
+            fields = selected_fields(GenreSerializer, self.context.get('request'), ['genres'])
+            compiled = compile_fields(fields, Genre, self.context)
+            rows = rows.values('content_id', *['genre__' + source for source, _, _ in compiled])
+            convert = functools.partial(convert_row, compiled=compiled, prefix='genre__')
+        else:
+            rows = rows.values('content_id', 'genre_id')
+            convert = operator.itemgetter('genre_id')
+
+        def collect(result):
+            genres = {content_id: [] for content_id in content_ids}
+            for row in result:
+                genres[row['content_id']].append(convert(row))
+            return genres
+        return rows, collect
+
+    def genre_map(self, content_ids, expanded=True):
+        if not content_ids:
+            return {}
+        query, collect = self.genre_query(content_ids, expanded)
+        return collect(query)
+
+    async def agenre_map(self, content_ids, expanded=True):
+        if not content_ids:
+            return {}
+        query, collect = self.genre_query(content_ids, expanded)
+        return collect([row async for row in query])
+
+    def render(self, fields, genres):
+        nested = {} if genres is None else {'genres': ('id', genres.__getitem__)}
+        with timed('serialize'):
+            compiled = compile_fields(fields, Content, self.context, nested=nested)
+            return [convert_row(row, compiled) for row in self.rows]
+
+    def genres_requested(self, fields):
+        """``None`` sem gêneros na resposta; senão se vêm expandidos."""
+        if 'genres' not in fields:
+            return None
+        return isinstance(fields['genres'], serializers.BaseSerializer)
+
+    @property
+    def data(self):
+        fields = selected_fields(self.serializer_class, self.context.get('request'))
+        expanded = self.genres_requested(fields)
+        genres = None
+        if expanded is not None:
+            genres = self.genre_map([row['id'] for row in self.rows], expanded)
+        return self.render(fields, genres)
+
+    async def adata(self):
+        """``data`` para views assíncronas (ver async_views.py)."""
+        fields = selected_fields(self.serializer_class, self.context.get('request'))
+        expanded = self.genres_requested(fields)
+        genres = None
+        if expanded is not None:
+            genres = await self.agenre_map([row['id'] for row in self.rows], expanded)
+        return self.render(fields, genres)
+
+
+class FastListMixin:
+    """
+    Atende ``list`` com ``fast_serializer_class`` a partir de ``.values()``,
+    sem instanciar modelos. O campo de ordenação entra nas colunas lidas para
+    que o paginador por cursor consiga montar os links.
+    """
+    fast_serializer_class = None
+
+    def fast_queryset(self, *extra):
+        """Linhas ``.values()`` da listagem; ``extra`` são colunas adicionais."""
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        ordering = [
+            name.lstrip('-') for name in queryset.query.order_by
+            if isinstance(name, str)
+        ]
+        fields = self.fast_serializer_class.value_fields(self.request) + ordering + list(extra)
+        return queryset.values(*dict.fromkeys(fields))
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.fast_serializer_class
+        if serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.fast_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.fast_page_response(page)
+        return Response(serializer_class(list(queryset), context=self.get_serializer_context()).data)
+
+    def fast_page_response(self, rows):
+        """Resposta paginada a partir das linhas ``.values()`` da página."""
+        data = self.fast_serializer_class(rows, context=self.get_serializer_context()).data
+        return self.get_paginated_response(data)
@@ -0,0 +1,207 @@
+"""
+Sparse fieldsets (``?fields=``) e expansões explícitas (``?expand=``).
+
+``fields`` lista os campos desejados, com caminhos pontuados para os
+aninhados (``?fields=id,title,content.title``). ``expand`` lista as relações
+que devem vir aninhadas; as demais saem apenas como chave primária
+(``?expand=content,content.genres``). Sem os parâmetros a resposta é a
+completa de sempre. Só se aplicam a leituras (GET/HEAD).
+
+O plano de consulta (``select_related``/``prefetch_related``) é derivado da
+árvore de serializers já podada, de modo que relações que não serão
+renderizadas nunca entram em JOINs nem em prefetches.
+"""
+from django.db.models import Prefetch
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor, ManyToManyDescriptor,
+    ReverseManyToOneDescriptor, ReverseOneToOneDescriptor,
+)
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def parse_paths(value):
+    """``'a,b.c'`` -> ``{'a': {}, 'b': {'c': {}}}``."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def get_fieldset(request):
+    """Árvores ``(fields, expand)`` da requisição; ``None`` sem restrição."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    fieldset = getattr(request, '_sparse_fieldset', None)
+    if fieldset is None:
+        params = getattr(request, 'query_params', request.GET)
+        fields = parse_paths(params['fields']) if params.get('fields') else None
+        expand = parse_paths(params['expand']) if 'expand' in params else None
+        fieldset = request._sparse_fieldset = (fields, expand)
+    return fieldset
+
+
+def subtree(tree, path, leaf_default):
+    """
+    Nó de ``tree`` em ``path``. Um nó folha no caminho vale
+    ``leaf_default`` para tudo abaixo dele.
+    """
+    if tree is None:
+        return None
+    node = tree
+    for part in path:
+        node = node.get(part)
+        if node is None:
+            return {}
+        if not node:
+            return leaf_default
+    return node
+
+
+def serializer_path(serializer):
+    """Nomes dos campos da raiz até ``serializer``."""
+    path = []
+    node = serializer
+    while node.parent is not None:
+        if not isinstance(node.parent, serializers.ListSerializer):
+            path.append(node.field_name)
+        node = node.parent
+    return path[::-1]
+
+
+def collapse(field):
+    """Relação não expandida: apenas a(s) chave(s) primária(s)."""
+    if isinstance(field, serializers.ListSerializer):
+        return serializers.PrimaryKeyRelatedField(source=field.source, many=True, read_only=True)
+    return serializers.PrimaryKeyRelatedField(source=field.source, read_only=True)
+
+
+def prune_fields(fields, request, path=()):
+    """
+    Aplica ``?fields=`` e ``?expand=`` a ``fields`` (nome -> campo) do
+    serializer que está em ``path`` a partir da raiz.
+    """
+    requested, expand = get_fieldset(request)
+    if requested is None and expand is None:
+        return fields
+
+    # Um campo folha em ``fields`` traz o objeto inteiro
+    wanted = subtree(requested, path, None)
+    # Uma relação folha em ``expand`` não expande as relações internas
+    expanded = subtree(expand, path, {})
+
+    pruned = {}
+    for name, field in fields.items():
+        if wanted is not None and name not in wanted:
+            continue
+        if expanded is not None and isinstance(field, serializers.BaseSerializer) and name not in expanded:
+            field = collapse(field)
+        pruned[name] = field
+    return pruned
+
+
+class SparseFieldsetSerializerMixin:
+    def get_fields(self):
+        fields = super().get_fields()
+        return prune_fields(fields, self.context.get('request'), serializer_path(self))
+
+
+def related_model(model, source):
+    descriptor = getattr(model, source, None)
+    if isinstance(descriptor, ForwardManyToOneDescriptor):
+        return descriptor.field.related_model
+    if isinstance(descriptor, ManyToManyDescriptor):
+        return descriptor.rel.related_model if descriptor.reverse else descriptor.rel.model
+    if isinstance(descriptor, ReverseManyToOneDescriptor):
+        return descriptor.rel.related_model
+    if isinstance(descriptor, ReverseOneToOneDescriptor):
+        return descriptor.related.related_model
+    return None
+
+
+def key_only_queryset(model, source, target):
+    """
+    Linhas de ``target`` só com o necessário para listar as chaves: em FK
+    reversa o prefetch agrupa pela própria FK, que não pode ficar adiada.
+    """
+    descriptor = getattr(model, source)
+    fields = ['pk']
+    if isinstance(descriptor, ReverseManyToOneDescriptor) and not isinstance(descriptor, ManyToManyDescriptor):
+        fields.append(descriptor.field.attname)
+    return target._default_manager.only(*fields)
+
+
+def prefixed(prefix, lookups):
+    result = []
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            result.append(Prefetch(f'{prefix}__{lookup.prefetch_through}', queryset=lookup.queryset))
+        else:
+            result.append(f'{prefix}__{lookup}')
+    return result
+
+
+def query_plan(serializer, model):
+    """
+    ``(select_related, prefetch_related)`` que cobrem exatamente as relações
+    percorridas por ``serializer`` (já podado) a partir de ``model``.
+    """
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        source = field.source_attrs[0] if field.source_attrs else field.source
+        target = related_model(model, source)
+
+        if isinstance(field, serializers.ListSerializer):
+            if target is None:
+                continue
+            child_select, child_prefetch = query_plan(field.child, target)
+            queryset = target._default_manager.all()
+            if child_select:
+                queryset = queryset.select_related(*child_select)
+            if child_prefetch:
+                queryset = queryset.prefetch_related(*child_prefetch)
+            prefetch.append(Prefetch(source, queryset=queryset))
+        elif isinstance(field, serializers.BaseSerializer):
+            if target is None:
+                continue
+            child_select, child_prefetch = query_plan(field, target)
+            select.append(source)
+            select.extend(prefixed(source, child_select))
+            prefetch.extend(prefixed(source, child_prefetch))
+        elif isinstance(field, ManyRelatedField):
+            if target is not None:
+                prefetch.append(Prefetch(source, queryset=key_only_queryset(model, source, target)))
+        elif len(field.source_attrs) > 1 and target is not None:
+            # Ex.: source='content.title'
+            select.append(source)
+    return list(dict.fromkeys(select)), prefetch
+
+
+class SparseFieldsetViewMixin:
+    """
+    Carrega as relações de acordo com o serializer podado da requisição,
+    aplicado em ``filter_queryset`` (listagem e ``get_object``).
+    """
+
+    def get_query_plan(self, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        serializer = serializer_class(context=self.get_serializer_context())
+        return query_plan(serializer, serializer_class.Meta.model)
+
+    def apply_query_plan(self, queryset, serializer_class=None):
+        select, prefetch = self.get_query_plan(serializer_class)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        return self.apply_query_plan(super().filter_queryset(queryset))
@@ -0,0 +1,206 @@
+"""
+Ingestão em lote do progresso de reprodução.
+
+Os heartbeats do player são acumulados em um buffer por processo que mantém
+apenas o progresso mais recente de cada (usuário, conteúdo, episódio). O
+buffer é gravado em lote (write-behind) pela thread de flush quando atinge o
+tamanho máximo ou quando o intervalo de flush expira, nunca na requisição; no
+pior caso uma queda do processo perde os últimos segundos de progresso, nunca
+o histórico já gravado.
+
+A restrição única ``unique_watch_progress`` exige que o histórico não tenha
+linhas repetidas por (usuário, conteúdo, episódio), que o ``create`` antigo
+produzia: ``deduplicate_history`` (comando ``dedupe_watch_history``) as
+funde antes de a restrição ser aplicada.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .continue_watching import record_progress
+from .models import Content, Episode, WatchHistory
+from .replicas import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'WATCH_PROGRESS_FLUSH_INTERVAL', 5)
+BUFFER_SIZE = getattr(settings, 'WATCH_PROGRESS_BUFFER_SIZE', 1000)
+
+UNIQUE_FIELDS = ['user', 'content', 'episode']
+UPDATE_FIELDS = ['progress', 'completed', 'watched_at']
+
+
+def merge(pending, key, progress, completed):
+    previous = pending.get(key)
+    if previous:
+        # "Concluído" não volta atrás com heartbeats atrasados
+        completed = completed or previous[1]
+    pending[key] = (progress, completed)
+
+
+def resolve_keys(batch):
+    """
+    Converte as chaves do buffer na chave canônica (usuário, conteúdo,
+    episódio), preenchendo o conteúdo dos episódios e descartando IDs
+    inexistentes. Custa duas consultas por flush, não por heartbeat.
+    """
+    episode_ids = {episode_id for _, _, episode_id in batch if episode_id}
+    content_ids = {content_id for _, content_id, episode_id in batch if content_id and not episode_id}
+    episode_contents = dict(
+        Episode.objects.filter(pk__in=episode_ids).values_list('pk', 'season__content_id')
+    )
+    existing_contents = set(
+        Content.objects.filter(pk__in=content_ids).values_list('pk', flat=True)
+    )
+
+    resolved = {}
+    for (user_id, content_id, episode_id), (progress, completed) in batch.items():
+        if episode_id:
+            if episode_id not in episode_contents:
+                continue
+            content_id = episode_contents[episode_id]
+        elif content_id not in existing_contents:
+            continue
+        merge(resolved, (user_id, content_id, episode_id), progress, completed)
+    return resolved
+
+
+def write_progress(rows):
+    # Read-your-writes com réplicas (ver replicas.py)
+    pin_to_primary({user_id for user_id, _, _ in rows})
+    now = timezone.now()
+    objects = [
+        WatchHistory(
+            user_id=user_id, content_id=content_id, episode_id=episode_id,
+            progress=progress, completed=completed, watched_at=now,
+        )
+        for (user_id, content_id, episode_id), (progress, completed) in rows.items()
+    ]
+    if connection.features.supports_nulls_distinct_unique_constraints:
+        with transaction.atomic():
+            WatchHistory.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPDATE_FIELDS,
+            )
+            # Escritas em lote não disparam signals
+            record_progress(rows, now)
+        return
+
+    # Bancos sem UNIQUE NULLS NOT DISTINCT (ex.: SQLite): os filmes têm
+    # episode nulo e não disparam conflito, então o upsert é feito à mão.
+    existing = {
+        (row.user_id, row.content_id, row.episode_id): row
+        for row in WatchHistory.objects.filter(
+            user_id__in={obj.user_id for obj in objects},
+            content_id__in={obj.content_id for obj in objects},
+        )
+    }
+    to_update, to_create = [], []
+    for obj in objects:
+        row = existing.get((obj.user_id, obj.content_id, obj.episode_id))
+        if row is None:
+            to_create.append(obj)
+        else:
+            row.progress, row.completed, row.watched_at = obj.progress, obj.completed, now
+            to_update.append(row)
+    with transaction.atomic():
+        WatchHistory.objects.bulk_update(to_update, UPDATE_FIELDS)
+        WatchHistory.objects.bulk_create(to_create)
+        record_progress(rows, now)
+
+
+def deduplicate_history():
+    """
+    Funde as linhas repetidas do histórico: fica a mais recente, concluída
+    se alguma das repetidas foi. Retorna o número de linhas removidas.
+    """
+    groups = WatchHistory.objects.values(*UNIQUE_FIELDS).annotate(rows=Count('pk')).filter(rows__gt=1).order_by()
+    removed = 0
+    for group in groups.iterator():
+        key = {field: group[field] for field in UNIQUE_FIELDS}
+        with transaction.atomic():
+            rows = list(
+                WatchHistory.objects.select_for_update().filter(**key)
+                .order_by('-watched_at', '-pk').values_list('pk', 'completed')
+            )
+            keep, completed = rows[0]
+            if not completed and any(done for _, done in rows):
+                WatchHistory.objects.filter(pk=keep).update(completed=True)
+            removed += WatchHistory.objects.filter(pk__in=[pk for pk, _ in rows[1:]]).delete()[0]
+    return removed
+
+
+class ProgressBuffer:
+    def __init__(self, max_size=BUFFER_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flush_due = threading.Event()
+        self.last_flush = time.monotonic()
+        self.worker = None
+
+    def add(self, user_id, events):
+        with self.lock:
+            for event in events:
+                key = (user_id, event.get('content'), event.get('episode'))
+                merge(self.pending, key, event['progress'], event.get('completed', False))
+            due = (
+                len(self.pending) >= self.max_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            )
+        self.ensure_worker()
+        if due:
+            # Erros do banco ficam com a thread de flush, não com o heartbeat
+            # já aceito
+            self.flush_due.set()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.last_flush = time.monotonic()
+            if not batch:
+                return 0
+
+            try:
+                rows = resolve_keys(batch)
+                write_progress(rows)
+            except Exception:
+                # Devolve o lote ao buffer sem sobrescrever heartbeats mais novos
+                with self.lock:
+                    for key, (progress, completed) in batch.items():
+                        if key not in self.pending:
+                            self.pending[key] = (progress, completed)
+                raise
+            return len(rows)
+
+    def ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name='progress-flush', daemon=True)
+                self.worker.start()
+
+    def run(self):
+        while True:
+            self.flush_due.wait(self.flush_interval)
+            self.flush_due.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar o progresso de reprodução')
+            finally:
+                connection.close()
+
+
+progress_buffer = ProgressBuffer()
+atexit.register(progress_buffer.flush)
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from .catalog_import import FORMATS, import_catalog
+
+
+class Command(BaseCommand):
+    """Django command to stream a partner catalog file (JSON Lines or CSV) into the library"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file')
+        parser.add_argument('--format', choices=sorted(FORMATS), help='File format (default: from the extension)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Titles written per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+
+        def report(line, message):
+            self.stderr.write(f'Skipped line {line}: {message}')
+
+        start = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                counts = import_catalog(stream, file_format, chunk_size=options['chunk_size'], on_error=report)
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        elapsed = time.perf_counter() - start
+
+        skipped = counts.pop('skipped', 0)
+        rows = sum(counts.values())
+        details = ', '.join(f'{count} {name}' for name, count in sorted(counts.items()) if count)
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} rows written in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s): {details or "nothing"}'
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} records skipped'))
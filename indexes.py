@@ -0,0 +1,32 @@
+"""
+Índices exclusivos do PostgreSQL, que não podem ser declarados em
+``Meta.indexes`` sem quebrar o SQLite (que não aceita ``NULLS LAST`` nem
+classes de operadores de trigramas). Criados de forma idempotente no
+post_migrate, como os índices de busca em search.py.
+"""
+from django.db import connections
+from .models import Genre, Content
+
+
+def install_postgres_indexes(sender=None, using='default', **kwargs):
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+
+    content_table = Content._meta.db_table
+    genre_table = Genre._meta.db_table
+    statements = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        # sort_by=rating e user_rating paginam com NULLS LAST; um índice DESC comum
+        # guarda os nulos no início e não serve para essa ordenação
+        f'CREATE INDEX IF NOT EXISTS {content_table}_imdb_nulls_last_idx '
+        f'ON {content_table} (imdb_rating DESC NULLS LAST, id DESC)',
+        f'CREATE INDEX IF NOT EXISTS {content_table}_user_rating_nulls_last_idx '
+        f'ON {content_table} (user_rating DESC NULLS LAST, id DESC)',
+        # genres__name__icontains compila para UPPER(name) LIKE '%...%'
+        f'CREATE INDEX IF NOT EXISTS {genre_table}_name_upper_trgm '
+        f'ON {genre_table} USING gin (UPPER(name) gin_trgm_ops)',
+    ]
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,149 @@
+"""
+Manifestos de reprodução pré-calculados.
+
+O manifesto de cada título (escada de qualidades, legendas e faixas de
+áudio) é montado quando a mídia muda e guardado no cache, de modo que o
+início da reprodução custa uma leitura de cache e um INSERT da sessão em vez
+das junções com as tabelas de mídia. O cache guarda as chaves dos arquivos
+no storage, e não as URLs, para que URLs assinadas nunca expirem dentro dele
+(a assinatura por requisição passa pelo cache de storage_urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .models import Content, Episode, VideoQuality, Subtitle, AudioTrack
+from .storage_urls import media_url
+
+MANIFEST_CACHE_TIMEOUT = getattr(settings, 'MANIFEST_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Campo de arquivo de cada faixa no manifesto: (modelo, campo, chave da URL)
+TRACKS = {
+    'video_qualities': (VideoQuality, 'video_file', 'video_url'),
+    'subtitles': (Subtitle, 'subtitle_file', 'subtitle_url'),
+    'audio_tracks': (AudioTrack, 'audio_file', 'audio_url'),
+}
+
+LANGUAGES = dict(settings.LANGUAGES)
+
+
+def manifest_cache_key(kind, pk):
+    return f'manifest:{kind}:{pk}'
+
+
+def load_title(kind, pk):
+    if kind == 'episode':
+        row = Episode.objects.filter(pk=pk).values(
+            'title', 'description', 'duration', 'video_file', 'thumbnail',
+            'season__content_id', 'season__content__poster',
+        ).first()
+        if row is None:
+            return None
+        row['content_id'] = row.pop('season__content_id')
+        row['poster'] = row.pop('thumbnail') or row.pop('season__content__poster')
+        return row
+
+    row = Content.objects.filter(pk=pk).values(
+        'title', 'description', 'duration', 'video_file', 'poster',
+    ).first()
+    if row is not None:
+        row['content_id'] = pk
+    return row
+
+
+def build_manifest(kind, pk):
+    """
+    Manifesto de ``kind`` ('content' ou 'episode') sem o ID de sessão, ou
+    ``None`` se o título não existe. Sem versões transcodificadas, o arquivo
+    original é a única qualidade.
+    """
+    title = load_title(kind, pk)
+    if title is None:
+        return None
+
+    owner = {kind: pk}
+    manifest = {
+        'content_id': title['content_id'],
+        'episode_id': pk if kind == 'episode' else None,
+        'title': title['title'],
+        'description': title['description'],
+        'duration': title['duration'],
+        'poster': title['poster'] or None,
+        'video_qualities': list(VideoQuality.objects.filter(**owner).values(
+            'id', 'resolution', 'video_file', 'bitrate', 'file_size',
+        )),
+        'subtitles': list(Subtitle.objects.filter(**owner).values(
+            'id', 'language', 'subtitle_file', 'is_default',
+        )),
+        'audio_tracks': list(AudioTrack.objects.filter(**owner).values(
+            'id', 'language', 'audio_file', 'is_default',
+        )),
+    }
+    if not manifest['video_qualities'] and title['video_file']:
+        manifest['video_qualities'] = [{
+            'id': 0, 'resolution': 'original', 'video_file': title['video_file'],
+            'bitrate': 0, 'file_size': 0,
+        }]
+    for track in manifest['subtitles'] + manifest['audio_tracks']:
+        track['language_display'] = str(LANGUAGES.get(track['language'], track['language']))
+    return manifest
+
+
+def rebuild_manifest(kind, pk):
+    manifest = build_manifest(kind, pk)
+    if manifest is None:
+        cache.delete(manifest_cache_key(kind, pk))
+    else:
+        cache.set(manifest_cache_key(kind, pk), manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def invalidate_manifests(kind, pks):
+    cache.delete_many([manifest_cache_key(kind, pk) for pk in pks])
+
+
+def get_manifest(kind, pk):
+    manifest = cache.get(manifest_cache_key(kind, pk))
+    if manifest is None:
+        manifest = rebuild_manifest(kind, pk)
+    return manifest
+
+
+async def aget_manifest(kind, pk):
+    """``get_manifest`` para views assíncronas."""
+    manifest = await cache.aget(manifest_cache_key(kind, pk))
+    if manifest is None:
+        manifest = await sync_to_async(rebuild_manifest)(kind, pk)
+    return manifest
+
+
+def resolve_urls(manifest):
+    """Troca as chaves do storage pelas URLs públicas (ou assinadas)."""
+    resolved = dict(manifest)
+    poster = manifest['poster']
+    resolved['poster_url'] = media_url(Content._meta.get_field('poster').storage, poster)
+    del resolved['poster']
+
+    for name, (model, field_name, url_key) in TRACKS.items():
+        storage = model._meta.get_field(field_name).storage
+        tracks = []
+        for track in manifest[name]:
+            track = dict(track)
+            track[url_key] = media_url(storage, track.pop(field_name))
+            tracks.append(track)
+        resolved[name] = tracks
+    return resolved
+
+
+def playback_response(session_id, manifest):
+    """Corpo da resposta de início de reprodução."""
+    manifest = resolve_urls(manifest)
+    return {
+        'session_id': session_id,
+        'title': manifest['title'],
+        'description': manifest['description'],
+        'duration': manifest['duration'],
+        'poster_url': manifest['poster_url'],
+        'video_qualities': manifest['video_qualities'],
+        'subtitles': manifest['subtitles'],
+        'audio_tracks': manifest['audio_tracks'],
+    }
@@ -0,0 +1,7 @@
+from django.urls import path
+from .byteserving import serve_media
+
+# Montado pelo projeto em MEDIA_URL quando o S3 não está configurado
+urlpatterns = [
+    path('<path:path>', serve_media, name='media'),
+]
@@ -0,0 +1,380 @@
+"""
+Instrumentação por requisição.
+
+``PerformanceMiddleware`` mede, em cada requisição, o número de consultas,
+o tempo de banco, o tempo de serialização e o tempo de renderização. Com
+``SERVER_TIMING`` ligado (desligado por padrão, pois expõe detalhes internos
+a qualquer cliente) elas voltam no cabeçalho ``Server-Timing``, visível na
+aba Network do navegador. As mesmas medidas alimentam histogramas por rota, acumulados em
+memória e somados periodicamente ao cache compartilhado, de onde a view
+``metrics`` os expõe no formato texto do Prometheus somando todos os workers.
+
+As fases são medidas por ``timed``: o serializer e o renderer abrem uma fase
+e o tempo das consultas feitas dentro dela é descontado, de modo que cada
+milissegundo conta uma vez só. O estado da requisição vive em uma
+``ContextVar``, que o ``sync_to_async`` propaga para as threads do ORM nas
+views assíncronas.
+
+Com ``SLOW_REQUEST_PROFILE_MS`` as requisições síncronas são amostradas por
+um profiler de pilhas e as que passam do limite são gravadas em
+``SLOW_REQUEST_PROFILE_DIR`` no formato "folded" (uma pilha por linha com a
+contagem de amostras), pronto para flamegraph.pl ou speedscope.
+"""
+import atexit
+import bisect
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = getattr(settings, 'SERVER_TIMING', False)
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 15)
+PROFILE_THRESHOLD = getattr(settings, 'SLOW_REQUEST_PROFILE_MS', 0) / 1000
+PROFILE_INTERVAL = getattr(settings, 'SLOW_REQUEST_PROFILE_INTERVAL_MS', 5) / 1000
+PROFILE_DIR = getattr(settings, 'SLOW_REQUEST_PROFILE_DIR', 'profiles')
+
+PHASES = ('db', 'serialize', 'render')
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Histogramas por rota e método: (descrição, limites, escala da soma).
+# As somas são inteiras no cache (incr), em microssegundos para tempos.
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Tempo total da requisição', SECONDS_BUCKETS, 1_000_000),
+    'http_request_db_seconds': ('Tempo em consultas ao banco', SECONDS_BUCKETS, 1_000_000),
+    'http_request_serialize_seconds': ('Tempo nos serializers', SECONDS_BUCKETS, 1_000_000),
+    'http_request_render_seconds': ('Tempo renderizando a resposta', SECONDS_BUCKETS, 1_000_000),
+    'http_request_queries': ('Consultas por requisição', QUERY_BUCKETS, 1),
+}
+RESPONSES = 'http_responses_total'
+
+SERIES_KEY = 'metrics:series'
+
+current_request = contextvars.ContextVar('current_request', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.open = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        other = total - sum(self.durations.values())
+        parts = [f'db;dur={self.durations["db"] * 1000:.1f};desc="{self.queries} queries"']
+        parts += [f'{phase};dur={self.durations[phase] * 1000:.1f}' for phase in PHASES[1:]]
+        parts += [f'app;dur={max(other, 0) * 1000:.1f}', f'total;dur={total * 1000:.1f}']
+        return ', '.join(parts)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """
+    Soma o tempo do bloco à fase ``phase`` da requisição atual, descontando
+    as consultas feitas dentro dele. Reentrante: serializers aninhados (e os
+    itens de uma lista) não contam duas vezes.
+    """
+    metrics = current_request.get()
+    if metrics is None or phase in metrics.open:
+        yield
+        return
+
+    metrics.open.add(phase)
+    db = metrics.durations['db']
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (metrics.durations['db'] - db)
+        metrics.durations[phase] += elapsed
+        metrics.open.discard(phase)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.durations['db'] += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_recorder():
+    """Registra ``record_query`` em todas as conexões, inclusive as futuras."""
+    # connection_created dispara a cada reconexão do mesmo wrapper
+    def install(sender, connection, **kwargs):
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+    connection_created.connect(install, weak=False, dispatch_uid='metrics.record_query')
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+
+
+def series_key(series, field):
+    return 'metrics:' + '|'.join(series + (str(field),))
+
+
+class MetricsRegistry:
+    """
+    Histogramas acumulados em memória. ``flush`` soma os deltas ao cache com
+    ``incr`` (atômico no Redis/Memcached), de modo que vários workers e
+    processos escrevem nas mesmas séries sem se sobrescrever.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.pending = Counter()
+        self.series = set()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.worker_lock = threading.Lock()
+        self.worker = None
+
+    def observe(self, route, method, status, total, metrics):
+        values = {
+            'http_request_duration_seconds': total,
+            'http_request_db_seconds': metrics.durations['db'],
+            'http_request_serialize_seconds': metrics.durations['serialize'],
+            'http_request_render_seconds': metrics.durations['render'],
+            'http_request_queries': metrics.queries,
+        }
+        with self.lock:
+            for name, value in values.items():
+                description, buckets, scale = HISTOGRAMS[name]
+                series = (name, route, method)
+                self.series.add(series)
+                self.pending[series_key(series, bisect.bisect_left(buckets, value))] += 1
+                self.pending[series_key(series, 'sum')] += round(value * scale)
+                self.pending[series_key(series, 'count')] += 1
+            series = (RESPONSES, route, method, str(status))
+            self.series.add(series)
+            self.pending[series_key(series, 'count')] += 1
+        self.ensure_worker()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, Counter()
+                series = set(self.series)
+            while pending:
+                key, delta = pending.popitem()
+                try:
+                    try:
+                        cache.incr(key, delta)
+                    except ValueError:
+                        if not cache.add(key, delta, None):
+                            cache.incr(key, delta)
+                except Exception:
+                    # Devolve os deltas ainda não gravados para a próxima tentativa
+                    pending[key] = delta
+                    with self.lock:
+                        self.pending.update(pending)
+                    raise
+
+            # Outro worker pode ter sobrescrito o índice ao mesmo tempo: cada
+            # flush confere e regrava as séries que faltarem
+            known = {tuple(item) for item in cache.get(SERIES_KEY) or ()}
+            if not series <= known:
+                cache.set(SERIES_KEY, sorted(known | series), None)
+
+    def ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.worker_lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name='metrics-flush', daemon=True)
+                self.worker.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar as métricas por rota')
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + '}'
+
+
+def render_metrics():
+    """Todas as séries no formato texto do Prometheus (versão 0.0.4)."""
+    registry.flush()
+    series = sorted(tuple(item) for item in cache.get(SERIES_KEY) or ())
+    keys = []
+    for item in series:
+        if item[0] == RESPONSES:
+            keys.append(series_key(item, 'count'))
+        else:
+            buckets = HISTOGRAMS[item[0]][1]
+            keys += [series_key(item, field) for field in range(len(buckets) + 1)]
+            keys += [series_key(item, 'sum'), series_key(item, 'count')]
+    values = cache.get_many(keys)
+
+    lines = []
+    for name, (description, buckets, scale) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for item in series:
+            if item[0] != name:
+                continue
+            route, method = item[1:]
+            cumulative = 0
+            for field, bound in enumerate(buckets + ('+Inf',)):
+                cumulative += values.get(series_key(item, field), 0)
+                lines.append(f'{name}_bucket{labels(route=route, method=method, le=str(bound))} {cumulative}')
+            total = values.get(series_key(item, 'sum'), 0)
+            total = total / scale if scale != 1 else total
+            lines.append(f'{name}_sum{labels(route=route, method=method)} {total}')
+            lines.append(f'{name}_count{labels(route=route, method=method)} {values.get(series_key(item, "count"), 0)}')
+
+    lines += [f'# HELP {RESPONSES} Respostas por rota e status', f'# TYPE {RESPONSES} counter']
+    for item in series:
+        if item[0] == RESPONSES:
+            route, method, status = item[1:]
+            count = values.get(series_key(item, 'count'), 0)
+            lines.append(f'{RESPONSES}{labels(route=route, method=method, status=status)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def fold(frame):
+    """Pilha de ``frame`` no formato folded, da raiz para a folha."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{frame.f_globals.get("__name__", "?")}.{getattr(code, "co_qualname", code.co_name)}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Uma única thread amostra, a cada ``interval``, a pilha de todas as
+    threads com requisição em andamento. O custo é proporcional ao número de
+    requisições simultâneas, não ao tamanho das pilhas de cada chamada.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.stacks[thread_id] = Counter()
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+                self.worker.start()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.stacks.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, counts in self.stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counts[fold(frame)] += 1
+
+
+profiler = SamplingProfiler()
+
+
+def dump_profile(route, total, stacks):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = re.sub(r'[^\w.-]+', '_', route)
+    path = os.path.join(PROFILE_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{total * 1000:.0f}ms.folded')
+    with open(path, 'w') as output:
+        for stack, count in stacks.most_common():
+            output.write(f'{stack} {count}\n')
+    logger.warning('Requisição lenta em %s (%.0f ms): perfil em %s', route, total * 1000, path)
+
+
+def route_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name
+
+
+class PerformanceMiddleware:
+    """Server-Timing, histogramas por rota e profiler de requisições lentas."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        install_query_recorder()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        thread_id = threading.get_ident()
+        if PROFILE_THRESHOLD:
+            profiler.start(thread_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+            stacks = profiler.stop(thread_id) if PROFILE_THRESHOLD else None
+
+        total = metrics.elapsed()
+        if stacks and total >= PROFILE_THRESHOLD:
+            dump_profile(route_name(request), total, stacks)
+        return self.finish(request, response, metrics, total)
+
+    async def __acall__(self, request):
+        # No caminho assíncrono o trabalho está espalhado entre o event loop
+        # e as threads do sync_to_async: só as medidas, sem o profiler
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, metrics, metrics.elapsed())
+
+    def finish(self, request, response, metrics, total):
+        registry.observe(route_name(request), request.method, response.status_code, total, metrics)
+        if SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total)
+        return response
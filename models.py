@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.search import SearchVectorField
 
 class Genre(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -27,6 +29,8 @@ class Person(models.Model):
     photo = models.ImageField(upload_to='people/', null=True, blank=True)
     roles = models.CharField(max_length=20, choices=ROLE_CHOICES, default='actor')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Derivados responsivos das imagens (ver derivatives.py)
+    images = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -69,6 +73,8 @@ class Content(models.Model):
     # Mídia
     poster = models.ImageField(upload_to='posters/', null=True, blank=True)
     backdrop = models.ImageField(upload_to='backdrops/', null=True, blank=True)
+    # Derivados responsivos de poster e backdrop (ver derivatives.py)
+    images = models.JSONField(default=dict, blank=True, editable=False)
     trailer_url = models.URLField(blank=True)
     video_file = models.FileField(upload_to='videos/', null=True, blank=True)
     
@@ -78,12 +84,41 @@ class Content(models.Model):
     view_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Chave do título no catálogo do parceiro (ver catalog_import.py)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    # Agregados das avaliações dos usuários (ver rating_aggregates.py)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    user_rating = models.FloatField(null=True, blank=True, editable=False, help_text="Média das avaliações")
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Busca (mantido por signals, ver search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Um índice por modo de sort_by, com id como desempate do cursor
+            models.Index(fields=['-created_at', '-id'], name='content_created_idx'),
+            models.Index(fields=['-view_count', '-id'], name='content_popularity_idx'),
+            models.Index(fields=['-release_date', '-id'], name='content_release_idx'),
+            models.Index(fields=['-imdb_rating', '-id'], name='content_imdb_rating_idx'),
+            models.Index(fields=['-user_rating', '-id'], name='content_user_rating_idx'),
+            # Filtros da listagem
+            models.Index(fields=['content_type', '-created_at'], name='content_type_created_idx'),
+            models.Index(fields=['rating', '-created_at'], name='content_rating_created_idx'),
+            # Trilhas da página inicial: só as linhas marcadas entram no índice
+            models.Index(fields=['-created_at'], condition=models.Q(is_featured=True), name='content_featured_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_trending=True), name='content_trending_idx'),
+        ]
 
 class Cast(models.Model):
     content = models.ForeignKey(Content, on_delete=models.CASCADE)
@@ -102,6 +137,11 @@ class Season(models.Model):
     description = models.TextField(blank=True)
     release_date = models.DateField()
     poster = models.ImageField(upload_to='seasons/', null=True, blank=True)
+    # Derivados responsivos das imagens (ver derivatives.py)
+    images = models.JSONField(default=dict, blank=True, editable=False)
+    # Resumo mantido a cada alteração de episódio (ver season_summaries.py)
+    episode_count = models.PositiveIntegerField(default=0, editable=False)
+    total_runtime = models.PositiveIntegerField(default=0, editable=False, help_text="Soma das durações em minutos")
 
     def __str__(self):
         return f"{self.content.title} - Temporada {self.season_number}"
@@ -119,6 +159,8 @@ class Episode(models.Model):
     release_date = models.DateField()
     video_file = models.FileField(upload_to='episodes/', null=True, blank=True)
     thumbnail = models.ImageField(upload_to='episode_thumbs/', null=True, blank=True)
+    # Derivados responsivos das imagens (ver derivatives.py)
+    images = models.JSONField(default=dict, blank=True, editable=False)
     view_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
@@ -148,6 +190,41 @@ class WatchHistory(models.Model):
 
     class Meta:
         ordering = ['-watched_at']
+        indexes = [
+            models.Index(fields=['user', '-watched_at', '-id'], name='history_user_recent_idx'),
+            models.Index(fields=['user', 'episode'], name='history_user_episode_idx'),
+        ]
+        constraints = [
+            # Chave do upsert em lote dos heartbeats (ver heartbeats.py). Em
+            # bancos com histórico anterior, rodar dedupe_watch_history antes
+            # de aplicar a restrição
+            models.UniqueConstraint(
+                fields=['user', 'content', 'episode'],
+                nulls_distinct=False,
+                name='unique_watch_progress',
+            ),
+        ]
+
+class ContinueWatching(models.Model):
+    """
+    Trilha "continuar assistindo" materializada: uma linha por usuário e
+    título com o que reproduzir a seguir (ver continue_watching.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='continue_watching')
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    episode = models.ForeignKey(Episode, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    progress = models.PositiveIntegerField(default=0, help_text="Progresso em segundos")
+    up_next = models.BooleanField(default=False, help_text="Próximo episódio após um episódio concluído")
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['user', '-updated_at', '-id'], name='continue_user_recent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content'], name='unique_continue_watching'),
+        ]
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -157,6 +234,9 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ['user', 'content']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='favorite_user_recent_idx'),
+        ]
 
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -170,4 +250,85 @@ class Rating(models.Model):
     class Meta:
         unique_together = ['user', 'content']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='rating_user_recent_idx'),
+            models.Index(fields=['content', '-created_at', '-id'], name='rating_content_recent_idx'),
+        ]
+
+
+class ContentNeighbor(models.Model):
+    """
+    Vizinhos mais próximos de cada título na matriz de similaridade
+    item-item (ver recommender.py).
+    """
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
 
+    class Meta:
+        unique_together = ['content', 'neighbor']
+        ordering = ['content', '-score']
+
+
+# Mídia de reprodução (ver manifests.py). Cada faixa pertence a um filme
+# (content) ou a um episódio (episode), como em WatchHistory.
+
+class VideoQuality(models.Model):
+    RESOLUTION_CHOICES = [
+        ('240p', '240p'),
+        ('360p', '360p'),
+        ('480p', '480p'),
+        ('720p', 'HD'),
+        ('1080p', 'Full HD'),
+        ('2160p', '4K'),
+    ]
+
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True, related_name='video_qualities')
+    episode = models.ForeignKey(Episode, on_delete=models.CASCADE, null=True, blank=True, related_name='video_qualities')
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    video_file = models.FileField(upload_to='renditions/')
+    bitrate = models.PositiveIntegerField(help_text="Taxa de bits em kbps")
+    file_size = models.PositiveBigIntegerField(default=0, help_text="Tamanho em bytes")
+
+    class Meta:
+        ordering = ['-bitrate']
+
+
+class Subtitle(models.Model):
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True, related_name='subtitles')
+    episode = models.ForeignKey(Episode, on_delete=models.CASCADE, null=True, blank=True, related_name='subtitles')
+    language = models.CharField(max_length=10, choices=settings.LANGUAGES)
+    subtitle_file = models.FileField(upload_to='subtitles/')
+    is_default = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-is_default', 'language']
+
+
+class AudioTrack(models.Model):
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True, related_name='audio_tracks')
+    episode = models.ForeignKey(Episode, on_delete=models.CASCADE, null=True, blank=True, related_name='audio_tracks')
+    language = models.CharField(max_length=10, choices=settings.LANGUAGES)
+    audio_file = models.FileField(upload_to='audio/')
+    is_default = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-is_default', 'language']
+
+
+class StreamingSession(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True)
+    episode = models.ForeignKey(Episode, on_delete=models.CASCADE, null=True, blank=True)
+    quality = models.CharField(max_length=10, blank=True)
+    buffering_count = models.PositiveIntegerField(default=0)
+    buffering_duration = models.PositiveIntegerField(default=0, help_text="Tempo em buffering em segundos")
+    start_time = models.DateTimeField(auto_now_add=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    duration = models.PositiveIntegerField(default=0, help_text="Duração da sessão em segundos")
+
+    class Meta:
+        ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['user', '-start_time'], name='session_user_recent_idx'),
+        ]
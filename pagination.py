@@ -0,0 +1,205 @@
+"""
+Paginação por cursor (keyset).
+
+A posição é codificada como o valor do campo de ordenação mais o ``pk`` do
+último registro da página, usado como desempate. A próxima página é obtida
+com ``WHERE (campo, pk) < (valor, pk)`` em vez de ``OFFSET``, sem ``COUNT(*)``
+e sem deslocamento quando novos registros chegam. Ordenações que não são um
+campo simples (ex.: relevância da busca) usam um cursor de deslocamento.
+"""
+import base64
+import binascii
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_sort_field(self, queryset):
+        """
+        Retorna ``(campo, descendente)`` quando a ordenação é um único campo
+        do modelo, ou ``None`` para usar o cursor de deslocamento.
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if len(ordering) != 1 or not isinstance(ordering[0], str):
+            return None
+
+        name = ordering[0].lstrip('-')
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation:
+            return None
+        return field, ordering[0].startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def keyset_filter(self, field, descending, value, pk, reverse):
+        after = 'lt' if descending != reverse else 'gt'
+        name = field.name
+        if value is None:
+            # Nulos ficam sempre no fim da ordenação
+            condition = Q(**{f'{name}__isnull': True, f'pk__{after}': pk})
+            if reverse:
+                condition |= Q(**{f'{name}__isnull': False})
+            return condition
+
+        condition = Q(**{f'{name}__{after}': value}) | Q(**{name: value, f'pk__{after}': pk})
+        if field.null and not reverse:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` para views assíncronas (ver async_views.py)."""
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """Consulta da página, com uma linha a mais para saber se há próxima."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request) or {}
+        self.reverse = bool(cursor.get('r'))
+        self.has_cursor = 'pk' in cursor
+
+        sort = self.get_sort_field(queryset)
+        if sort is None:
+            return self.offset_queryset(queryset, cursor)
+
+        field, descending = sort
+        self.sort_field = field
+        self.pk_name = queryset.model._meta.pk.attname
+        # NULLS LAST só quando a coluna aceita nulos, para que as demais
+        # ordenações casem com os índices btree comuns
+        nulls = {'nulls_first': True} if self.reverse else {'nulls_last': True}
+        if not field.null:
+            nulls = {}
+        if descending != self.reverse:
+            order = F(field.name).desc(**nulls)
+        else:
+            order = F(field.name).asc(**nulls)
+        queryset = queryset.order_by(order, '-pk' if descending != self.reverse else 'pk')
+        if 'pk' in cursor:
+            try:
+                value = None if cursor.get('v') is None else field.to_python(cursor['v'])
+                pk = queryset.model._meta.pk.to_python(cursor['pk'])
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if pk is None:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                self.keyset_filter(field, descending, value, pk, self.reverse)
+            )
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        if self.sort_field is None:
+            self.has_next = len(rows) > self.page_size
+            self.has_previous = self.offset > 0
+            return rows[:self.page_size]
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not self.reverse else self.has_cursor
+        self.has_previous = self.has_cursor if not self.reverse else has_more
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def offset_queryset(self, queryset, cursor):
+        self.sort_field = None
+        try:
+            self.offset = max(int(cursor.get('o', 0)), 0)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return queryset[self.offset:self.offset + self.page_size + 1]
+
+    def position(self, row, reverse):
+        # Linhas podem ser instâncias ou dicionários de .values()
+        if isinstance(row, dict):
+            value, pk = row[self.sort_field.attname], row[self.pk_name]
+        else:
+            value, pk = getattr(row, self.sort_field.attname), row.pk
+        if value is not None and not isinstance(value, (int, float, str)):
+            value = value.isoformat()
+        cursor = {'v': value, 'pk': pk}
+        if reverse:
+            cursor['r'] = 1
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.sort_field is None:
+            return self.encode_cursor({'o': self.offset + self.page_size})
+        if self.last is None:
+            return None
+        return self.encode_cursor(self.position(self.last, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.sort_field is None:
+            offset = self.offset - self.page_size
+            if offset <= 0:
+                return remove_query_param(self.base_url, self.cursor_query_param)
+            return self.encode_cursor({'o': offset})
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position(self.first, reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,89 @@
+"""
+Cache das trilhas da página inicial (destaques e em alta).
+
+Cada trilha é guardada já renderizada em JSON, pronta para ser devolvida
+sem passar pelo ORM nem pelo serializer. O JSON inclui contadores gravados
+sem signals (``view_count``, agregados de avaliação): quem os grava
+reconstrói as trilhas quando altera um título que está nelas (``in_rails``).
+"""
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .models import Content
+from .fastpath import ContentListFastSerializer
+from .renderers import FastJSONRenderer
+
+RAILS = {
+    'featured': {'is_featured': True},
+    'trending': {'is_trending': True},
+}
+
+RAIL_CACHE_TIMEOUT = getattr(settings, 'RAIL_CACHE_TIMEOUT', 60 * 60 * 24)
+RAIL_LOCK_TIMEOUT = getattr(settings, 'RAIL_LOCK_TIMEOUT', 10)
+RAIL_LOCK_RETRIES = 20
+RAIL_LOCK_WAIT = 0.05
+
+
+def rail_cache_key(name):
+    return f'rails:{name}'
+
+
+def in_rails(queryset):
+    """Se algum título de ``queryset`` está em alguma trilha."""
+    rail_filter = Q()
+    for filters in RAILS.values():
+        rail_filter |= Q(**filters)
+    return queryset.filter(rail_filter).exists()
+
+
+def render_rail(name):
+    rows = Content.objects.filter(**RAILS[name]).values(*ContentListFastSerializer.value_fields())
+    return FastJSONRenderer().render(ContentListFastSerializer(list(rows)).data)
+
+
+def rebuild_rail(name):
+    body = render_rail(name)
+    cache.set(rail_cache_key(name), body, RAIL_CACHE_TIMEOUT)
+    return body
+
+
+def rebuild_rails():
+    for name in RAILS:
+        rebuild_rail(name)
+
+
+def get_rail(name):
+    """
+    Retorna o JSON da trilha. Em caso de falta no cache apenas o worker que
+    obtém o lock reconstrói a trilha; os demais aguardam o resultado.
+    """
+    key = rail_cache_key(name)
+    body = cache.get(key)
+    if body is not None:
+        return body
+
+    lock_key = f'{key}:lock'
+    for _ in range(RAIL_LOCK_RETRIES):
+        if cache.add(lock_key, 1, RAIL_LOCK_TIMEOUT):
+            try:
+                return rebuild_rail(name)
+            finally:
+                cache.delete(lock_key)
+
+        time.sleep(RAIL_LOCK_WAIT)
+        body = cache.get(key)
+        if body is not None:
+            return body
+
+    # O worker que detém o lock demorou demais: renderiza sem gravar
+    return render_rail(name)
+
+
+async def aget_rail(name):
+    """``get_rail`` para views assíncronas: o acerto no cache não ocupa thread."""
+    body = await cache.aget(rail_cache_key(name))
+    if body is None:
+        body = await sync_to_async(get_rail)(name)
+    return body
@@ -0,0 +1,134 @@
+"""
+Agregados de avaliação mantidos em ``Content``.
+
+Cada inserção, alteração ou remoção de ``Rating`` aplica o delta em
+``rating_count``, ``rating_sum``, no histograma ``stars_1``..``stars_5`` e na
+média ``user_rating`` com um único UPDATE de expressões ``F()``, na mesma
+transação da escrita da avaliação (ver signals.py e ``RatingViewSet``). A
+média é gravada para que ``sort_by=user_rating`` use um índice. As trilhas
+guardam o JSON com os agregados: alterar um título que está em alguma delas
+reconstrói as trilhas após o commit.
+``reconcile`` recalcula tudo a partir das avaliações, corrigindo também
+escritas que não disparam signals (``bulk_create``, ``update``).
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+from .models import Content, Rating
+from . import rails, response_cache
+
+STARS = range(1, 6)
+AGGREGATE_FIELDS = ['rating_count', 'rating_sum', 'user_rating'] + [f'stars_{star}' for star in STARS]
+
+
+def apply_delta(content_id, count, total, stars):
+    """
+    Soma ``count`` avaliações com soma ``total`` ao título; ``stars`` mapeia
+    estrela -> delta do histograma. A média usa os valores anteriores das
+    colunas, como todas as expressões do mesmo SET.
+    """
+    new_count = F('rating_count') + count
+    new_sum = F('rating_sum') + total
+    changes = {
+        'rating_count': new_count,
+        'rating_sum': new_sum,
+        'user_rating': Cast(new_sum, FloatField()) / NullIf(new_count, 0),
+        # Os agregados aparecem nas respostas: invalida os ETags
+        'updated_at': timezone.now(),
+    }
+    for star, delta in stars.items():
+        if delta:
+            changes[f'stars_{star}'] = F(f'stars_{star}') + delta
+    Content.objects.filter(pk=content_id).update(**changes)
+    if rails.in_rails(Content.objects.filter(pk=content_id)):
+        transaction.on_commit(rails.rebuild_rails)
+
+
+def rating_added(content_id, rating):
+    apply_delta(content_id, 1, rating, {rating: 1})
+
+
+def rating_removed(content_id, rating):
+    apply_delta(content_id, -1, -rating, {rating: -1})
+
+
+def rating_changed(previous, current):
+    """``previous`` e ``current`` são pares (content_id, nota)."""
+    if previous == current:
+        return
+    if previous[0] != current[0]:
+        rating_removed(*previous)
+        rating_added(*current)
+        return
+    content_id, old = previous
+    new = current[1]
+    apply_delta(content_id, 0, new - old, {old: -1, new: 1})
+
+
+def aggregate_ratings(content_ids=None):
+    """Agregados calculados a partir de ``Rating``, por título."""
+    ratings = Rating.objects.all()
+    if content_ids is not None:
+        ratings = ratings.filter(content_id__in=content_ids)
+    rows = ratings.values('content_id').annotate(
+        rating_count=Count('pk'),
+        rating_sum=Sum('rating'),
+        **{f'stars_{star}': Count('pk', filter=Q(rating=star)) for star in STARS},
+    ).order_by()
+
+    aggregates = {}
+    for row in rows:
+        content_id = row.pop('content_id')
+        row['user_rating'] = row['rating_sum'] / row['rating_count']
+        aggregates[content_id] = row
+    return aggregates
+
+
+def reconcile(chunk_size=1000):
+    """
+    Recalcula os agregados de todos os títulos em blocos e corrige os que
+    divergem. Retorna ``(títulos verificados, títulos corrigidos)``.
+    """
+    empty = {field: 0 for field in AGGREGATE_FIELDS}
+    empty['user_rating'] = None
+
+    checked = fixed = 0
+    content_ids = Content.objects.order_by('pk').values_list('pk', flat=True)
+    chunk = []
+    for content_id in content_ids.iterator(chunk_size=chunk_size):
+        chunk.append(content_id)
+        if len(chunk) >= chunk_size:
+            fixed += reconcile_chunk(chunk, empty)
+            checked += len(chunk)
+            chunk = []
+    if chunk:
+        fixed += reconcile_chunk(chunk, empty)
+        checked += len(chunk)
+    return checked, fixed
+
+
+def differs(current, expected):
+    if isinstance(expected, float) and current is not None:
+        # A média do banco e a do Python podem diferir no último dígito
+        return abs(current - expected) > 1e-9
+    return current != expected
+
+
+def reconcile_chunk(content_ids, empty):
+    expected = aggregate_ratings(content_ids)
+    now = timezone.now()
+    stale = []
+    for content in Content.objects.filter(pk__in=content_ids).only('pk', *AGGREGATE_FIELDS):
+        values = expected.get(content.pk, empty)
+        if any(differs(getattr(content, field), values[field]) for field in AGGREGATE_FIELDS):
+            for field in AGGREGATE_FIELDS:
+                setattr(content, field, values[field])
+            content.updated_at = now
+            stale.append(content)
+    Content.objects.bulk_update(stale, AGGREGATE_FIELDS + ['updated_at'])
+    if stale:
+        transaction.on_commit(lambda: response_cache.invalidate(Content))
+    if stale and rails.in_rails(Content.objects.filter(pk__in=[content.pk for content in stale])):
+        transaction.on_commit(rails.rebuild_rails)
+    return len(stale)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from .continue_watching import rebuild
+
+
+class Command(BaseCommand):
+    """Django command to rebuild every user's continue watching rail from the watch history"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        count = rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} continue watching entries rebuilt'))
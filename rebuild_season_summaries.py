@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from .season_summaries import refresh_all
+
+
+class Command(BaseCommand):
+    """Django command to recompute the episode count and runtime of every season"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Seasons updated per statement')
+
+    def handle(self, *args, **options):
+        count = refresh_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} season summaries rebuilt'))
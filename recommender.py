@@ -0,0 +1,228 @@
+"""
+Recomendações item-item.
+
+Um job offline monta a matriz esparsa usuário x título a partir das
+conclusões em ``WatchHistory`` e das notas em ``Rating``, calcula a
+similaridade de cosseno entre títulos e grava os K vizinhos mais próximos de
+cada um em ``ContentNeighbor``. Em tempo de requisição as recomendações são
+apenas a soma das listas de vizinhos dos títulos que o usuário assistiu.
+
+No modo incremental só as colunas necessárias são lidas: as interações dos
+usuários que interagiram com os títulos alterados (numeradores) e as colunas
+completas dos títulos com que eles coocorrem (normas). O resultado para os
+títulos alterados é o mesmo de uma reconstrução completa.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Genre, Content, ContentNeighbor, WatchHistory, Rating
+from .replicas import use_replica
+
+TOP_K = 50
+CHUNK_SIZE = 1000
+COMPLETION_WEIGHT = 1.0
+RATING_WEIGHT = 1.0
+MAX_SEEDS = 50
+
+
+def watched_content_ids(user):
+    """IDs dos títulos com histórico do usuário, mais recentes primeiro."""
+    rows = WatchHistory.objects.filter(user=user).annotate(
+        title_id=Coalesce('content_id', 'episode__season__content_id')
+    ).values_list('title_id', flat=True)
+    return [title_id for title_id in dict.fromkeys(rows) if title_id is not None]
+
+
+def interactions(users=Q(), content_ids=None):
+    """Conclusões e notas dos usuários ``users`` (um ``Q``), opcionalmente só de ``content_ids``."""
+    history = WatchHistory.objects.filter(users, completed=True).annotate(
+        title_id=Coalesce('content_id', 'episode__season__content_id')
+    )
+    ratings = Rating.objects.filter(users)
+    if content_ids is not None:
+        # Sem passar pelo Coalesce, para usar os índices das chaves estrangeiras
+        history = history.filter(
+            Q(content_id__in=content_ids)
+            | Q(content__isnull=True, episode__season__content_id__in=content_ids)
+        )
+        ratings = ratings.filter(content_id__in=content_ids)
+    return history, ratings
+
+
+def interacting_users(content_ids):
+    """Filtro dos usuários com conclusões ou notas em ``content_ids``, por subconsulta."""
+    history, ratings = interactions(content_ids=content_ids)
+    return Q(user_id__in=history.values('user_id')) | Q(user_id__in=ratings.values('user_id'))
+
+
+def load_interactions(users=Q(), content_ids=None):
+    """
+    Força da interação de cada par (usuário, título): conclusões valem
+    ``COMPLETION_WEIGHT`` e notas somam de -1 (1 estrela) a +1 (5 estrelas).
+    Pares sem força positiva ficam com 0: o título ainda ganha uma coluna,
+    e a lista de vizinhos antiga dele é substituída por uma vazia.
+    """
+    strengths = defaultdict(float)
+    history, ratings = interactions(users, content_ids)
+
+    for user_id, title_id in history.values_list('user_id', 'title_id').distinct().iterator():
+        if title_id is not None:
+            strengths[(user_id, title_id)] = COMPLETION_WEIGHT
+
+    for user_id, content_id, rating in ratings.values_list('user_id', 'content_id', 'rating').iterator():
+        strengths[(user_id, content_id)] += RATING_WEIGHT * (rating - 3) / 2
+
+    return {key: max(value, 0.0) for key, value in strengths.items()}
+
+
+def build_similarity(strengths):
+    """
+    Retorna a matriz usuário x título normalizada por coluna (CSC) e a lista
+    de IDs de título correspondente a cada coluna.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    user_index = {}
+    item_ids = []
+    item_index = {}
+    rows, cols, data = [], [], []
+    for (user_id, content_id), value in strengths.items():
+        if content_id not in item_index:
+            item_index[content_id] = len(item_ids)
+            item_ids.append(content_id)
+        if value > 0:
+            rows.append(user_index.setdefault(user_id, len(user_index)))
+            cols.append(item_index[content_id])
+            data.append(value)
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), (rows, cols)),
+        shape=(len(user_index), len(item_ids)),
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsc()
+    return normalized, item_ids
+
+
+def top_neighbors(normalized, item_ids, columns, top_k=TOP_K):
+    """Calcula os ``top_k`` vizinhos das colunas informadas."""
+    import numpy as np
+
+    similarity = (normalized[:, columns].T @ normalized).tocsr()
+    ids = np.asarray(item_ids)
+    for row, column in enumerate(columns):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        indices = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+
+        keep = (indices != column) & (scores > 0)
+        indices, scores = indices[keep], scores[keep]
+        if len(scores) > top_k:
+            # Empates desfeitos pelo ID do título: o modo incremental, que
+            # monta as colunas em outra ordem, escolhe os mesmos vizinhos
+            best = np.lexsort((ids[indices], -scores))[:top_k]
+            indices, scores = indices[best], scores[best]
+
+        yield item_ids[column], [
+            (item_ids[index], float(score)) for index, score in zip(indices, scores)
+        ]
+
+
+def write_neighbors(normalized, item_ids, columns, top_k, chunk_size):
+    """Substitui os vizinhos das colunas, um bloco por transação."""
+    for start in range(0, len(columns), chunk_size):
+        chunk = columns[start:start + chunk_size]
+        objects = []
+        chunk_ids = []
+        for content_id, neighbors in top_neighbors(normalized, item_ids, chunk, top_k):
+            chunk_ids.append(content_id)
+            objects.extend(
+                ContentNeighbor(content_id=content_id, neighbor_id=neighbor_id, score=score)
+                for neighbor_id, score in neighbors
+            )
+        with transaction.atomic():
+            ContentNeighbor.objects.filter(content_id__in=chunk_ids).delete()
+            ContentNeighbor.objects.bulk_create(objects, batch_size=chunk_size)
+
+
+def stale_neighbors():
+    """Vizinhos de títulos sem nenhuma conclusão ou nota, que não ganham coluna."""
+    history, ratings = interactions()
+    return ContentNeighbor.objects.filter(
+        ~Exists(history.filter(title_id=OuterRef('content_id'))),
+        ~Exists(ratings.filter(content_id=OuterRef('content_id'))),
+    )
+
+
+def rebuild_neighbors(content_ids=None, top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """
+    Recalcula os vizinhos de todos os títulos, ou apenas de ``content_ids``
+    no modo incremental, que lê só as interações que afetam esses títulos.
+    Cada bloco é substituído em uma transação própria. Retorna o número de
+    títulos processados.
+    """
+    if content_ids is None:
+        # Leitura de todo o histórico: tolera o atraso de uma réplica
+        with use_replica(user_data=True):
+            normalized, item_ids = build_similarity(load_interactions())
+        stale_neighbors().delete()
+        write_neighbors(normalized, item_ids, list(range(len(item_ids))), top_k, chunk_size)
+        return len(item_ids)
+
+    content_ids = sorted(content_ids)
+    total = 0
+    for start in range(0, len(content_ids), chunk_size):
+        chunk = content_ids[start:start + chunk_size]
+        with use_replica(user_data=True):
+            # Numeradores: tudo o que os usuários dos títulos alterados viram
+            related = {title_id for _, title_id in load_interactions(interacting_users(chunk))}
+            # Normas: as colunas completas desses títulos
+            candidates = sorted(related)
+            strengths = {}
+            for offset in range(0, len(candidates), chunk_size):
+                strengths.update(load_interactions(content_ids=candidates[offset:offset + chunk_size]))
+        normalized, item_ids = build_similarity(strengths)
+        positions = {content_id: column for column, content_id in enumerate(item_ids)}
+        stale_neighbors().filter(content_id__in=chunk).delete()
+        columns = [positions[content_id] for content_id in chunk if content_id in positions]
+        write_neighbors(normalized, item_ids, columns, top_k, chunk_size)
+        total += len(columns)
+    return total
+
+
+def recommended_content_ids(user, limit=20):
+    """
+    Mescla as listas de vizinhos dos títulos vistos mais recentemente,
+    excluindo tudo o que o usuário já assistiu.
+    """
+    watched = watched_content_ids(user)
+    if not watched:
+        return []
+
+    rows = ContentNeighbor.objects.filter(
+        content_id__in=watched[:MAX_SEEDS]
+    ).exclude(
+        neighbor_id__in=watched
+    ).values('neighbor_id').annotate(
+        total=Sum('score')
+    ).order_by('-total', 'neighbor_id')[:limit]
+    return [row['neighbor_id'] for row in rows]
+
+
+def genre_recommendations(user):
+    """
+    Recomendação por gêneros assistidos, usada quando ainda não há vizinhos
+    calculados para o usuário (e como referência nos benchmarks).
+    """
+    watched_genres = Genre.objects.filter(
+        contents__watchhistory__user=user
+    ).distinct()
+
+    return Content.objects.filter(
+        genres__in=watched_genres
+    ).exclude(
+        watchhistory__user=user
+    ).distinct().order_by('-imdb_rating')
@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from .rating_aggregates import reconcile
+
+
+class Command(BaseCommand):
+    """Django command to recompute the rating aggregates stored on Content"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Titles recomputed per batch')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        checked, fixed = reconcile(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{checked} titles checked, {fixed} corrected in {elapsed:.1f}s'
+        ))
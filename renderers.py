@@ -0,0 +1,47 @@
+"""
+Renderer JSON baseado em orjson.
+
+Produz os mesmos bytes que o ``JSONRenderer`` do DRF com as configurações
+padrão (compacto, UTF-8), mas com a codificação feita em C. Tipos que o DRF
+converte de forma própria (datas com ``Z``, Decimal, strings preguiçosas)
+passam pelo ``encoder_class`` do DRF. Sem orjson instalado, ou quando a
+resposta pede indentação/ASCII, cai no renderer original.
+"""
+from rest_framework.renderers import JSONRenderer
+from .metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_PASSTHROUGH_DATETIME
+                    | orjson.OPT_PASSTHROUGH_DATACLASS
+                ),
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            # Ex.: inteiros acima de 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Mesmo escape do DRF para manter o JSON válido dentro de <script>
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,113 @@
+"""
+Leituras em réplicas do banco.
+
+Cada URL de ``DATABASE_REPLICA_URLS`` vira um alias em ``DATABASE_REPLICAS``.
+Por padrão tudo continua no primário; as leituras vão para uma réplica só
+dentro de ``use_replica``, usado pelos viewsets somente leitura do catálogo
+(``ReplicaReadMixin`` e as views assíncronas equivalentes) e pelos relatórios
+offline (recomendações). Mesmo ali ficam no primário:
+
+- os dados do usuário (histórico, favoritos, avaliações, sessões, tokens),
+  exceto nos relatórios (``user_data=True``);
+- as leituras dentro de uma transação do primário;
+- por ``READ_YOUR_WRITES_WINDOW`` segundos depois de o usuário gravar
+  histórico, favoritos ou avaliações, todas as suas leituras, para que ele
+  veja o efeito da própria escrita (ex.: ``user_rating``) mesmo com a
+  réplica atrasada.
+"""
+import contextlib
+import contextvars
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICAS = list(getattr(settings, 'DATABASE_REPLICAS', []))
+READ_YOUR_WRITES_WINDOW = getattr(settings, 'READ_YOUR_WRITES_WINDOW', 10)
+
+# Tabelas lidas pelo próprio usuário logo após escrever
+USER_DATA = {
+    'auth.user', 'authtoken.token', 'sessions.session',
+    'movies.userprofile', 'movies.watchhistory', 'movies.continuewatching',
+    'movies.favorite', 'movies.rating', 'movies.streamingsession',
+}
+
+# ``(alias, user_data)`` da réplica em uso no contexto atual
+replica_reads = contextvars.ContextVar('replica_reads', default=None)
+
+
+@contextlib.contextmanager
+def use_replica(user_data=False):
+    """Leituras do bloco em uma réplica; com ``user_data`` também as do usuário."""
+    if not REPLICAS:
+        yield
+        return
+    token = replica_reads.set((random.choice(REPLICAS), user_data))
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def pin_key(user_id):
+    return f'replicas:pin:{user_id}'
+
+
+def pin_to_primary(user_ids):
+    """Mantém as leituras dos usuários no primário pela janela de read-your-writes."""
+    if REPLICAS and user_ids:
+        cache.set_many({pin_key(user_id): 1 for user_id in user_ids}, READ_YOUR_WRITES_WINDOW)
+
+
+def reads_from_replica(request):
+    """Se as leituras de ``request`` (já autenticado) podem ir para uma réplica."""
+    if not REPLICAS or request.method not in SAFE_METHODS:
+        return False
+    user = request.user
+    return not (user and user.is_authenticated and cache.get(pin_key(user.pk)) is not None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        current = replica_reads.get()
+        if current is None:
+            return None
+        alias, user_data = current
+        if model._meta.label_lower in USER_DATA and not user_data:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema chega às réplicas pela replicação
+        if db in REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Leituras do viewset em uma réplica. A decisão é tomada depois da
+    autenticação, que precisa do usuário para a janela de read-your-writes.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_reads.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if reads_from_replica(request):
+            replica_reads.set((random.choice(REPLICAS), False))
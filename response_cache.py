@@ -0,0 +1,230 @@
+"""
+Cache de respostas anônimas do catálogo.
+
+A maior parte do tráfego de gêneros, pessoas, títulos, temporadas e
+episódios são GETs anônimos idênticos. A primeira resposta JSON de cada URL
+(caminho e query string normalizada) é guardada já comprimida em gzip e
+brotli; as seguintes saem do cache na codificação que o cliente aceita, sem
+ORM, serializer nem compressão. Requisições com credenciais (``Authorization``
+ou cookie de sessão) e a API navegável passam direto.
+
+A invalidação é por tags: cada viewset declara as tabelas de que suas
+respostas dependem e a chave do cache inclui a versão atual de cada tag.
+Alterar um modelo do catálogo gera uma nova versão após o commit (ver
+signals.py; as gravações em lote sem signals, como a importação do catálogo,
+chamam ``invalidate`` diretamente) e as entradas antigas deixam de ser lidas
+e expiram sozinhas.
+Contadores gravados sem signals (``view_count``, agregados de avaliação)
+aparecem em até ``ANONYMOUS_CACHE_TIMEOUT`` segundos.
+"""
+import functools
+import gzip
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe, urlencode
+from .models import Genre, Person, Content, Cast, Season, Episode
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ANONYMOUS_CACHE_TIMEOUT = getattr(settings, 'ANONYMOUS_CACHE_TIMEOUT', 60)
+
+# Compressão paga uma vez por entrada: níveis altos, mas sem o brotli 11,
+# várias vezes mais lento para poucos por cento
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# Abaixo disso a compressão não compensa (mesmo limite do GZipMiddleware)
+MIN_COMPRESS_SIZE = 200
+
+# Preferência quando o cliente aceita mais de uma
+ENCODINGS = ('br', 'gzip')
+
+# Tags de invalidação: o nome de cada modelo do catálogo
+CATALOG_MODELS = (Genre, Person, Content, Cast, Season, Episode)
+
+# A resposta muda com a codificação e com as credenciais
+VARY = ('Accept-Encoding', 'Authorization', 'Cookie')
+
+
+def model_tags(*models):
+    return tuple(model._meta.model_name for model in models)
+
+
+CATALOG_TAGS = model_tags(*CATALOG_MODELS)
+
+
+def tag_key(tag):
+    return f'anon:tag:{tag}'
+
+
+def invalidate(*models):
+    """Nova versão para as tags dos modelos: as entradas que dependem delas param de ser lidas."""
+    version = time.time_ns()
+    cache.set_many({tag_key(tag): version for tag in model_tags(*models)}, None)
+
+
+def resolve_versions(tags, versions):
+    # Tag sem versão (nunca alterada ou despejada do cache) ganha uma nova:
+    # nunca volta a um valor antigo, que poderia reabrir entradas velhas
+    for tag in tags:
+        if versions.get(tag_key(tag)) is None:
+            cache.add(tag_key(tag), time.time_ns(), None)
+            versions[tag_key(tag)] = cache.get(tag_key(tag))
+    return [versions[tag_key(tag)] for tag in tags]
+
+
+async def aresolve_versions(tags, versions):
+    for tag in tags:
+        if versions.get(tag_key(tag)) is None:
+            await cache.aadd(tag_key(tag), time.time_ns(), None)
+            versions[tag_key(tag)] = await cache.aget(tag_key(tag))
+    return [versions[tag_key(tag)] for tag in tags]
+
+
+def is_cacheable(request):
+    return (
+        request.method == 'GET'
+        and 'Authorization' not in request.headers
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'text/html' not in request.headers.get('Accept', '')
+    )
+
+
+def response_key(request, versions):
+    # Host e esquema entram na chave: os links de paginação são absolutos
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    digest = hashlib.sha1(f'{url}|{versions}'.encode('utf-8')).hexdigest()
+    return f'anon:response:{digest}'
+
+
+def accepted_encodings(header):
+    """Codificações de ``Accept-Encoding``, exceto as recusadas com ``q=0``."""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def make_entry(response):
+    """Corpo em todas as codificações, mais os cabeçalhos da resposta."""
+    body = response.content
+    entry = {
+        'headers': [(name, value) for name, value in response.items() if name != 'Content-Length'],
+        'bodies': {'identity': body},
+    }
+    if len(body) >= MIN_COMPRESS_SIZE:
+        compressed = {'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+        entry['bodies'].update(
+            (coding, data) for coding, data in compressed.items() if len(data) < len(body)
+        )
+    return entry
+
+
+def entry_response(request, entry):
+    """Resposta (ou 304) a partir da entrada, na melhor codificação aceita."""
+    headers = dict(entry['headers'])
+    last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+    response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+    if response is None:
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        coding = next((c for c in ENCODINGS if c in accepted and c in entry['bodies']), 'identity')
+        response = HttpResponse(entry['bodies'][coding])
+        for name, value in entry['headers']:
+            response[name] = value
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    else:
+        for name in ('ETag', 'Last-Modified'):
+            if name in headers:
+                response[name] = headers[name]
+    patch_vary_headers(response, VARY)
+    return response
+
+
+def is_storable(response):
+    return (
+        response.status_code == 200
+        and response.get('Content-Type', '').startswith('application/json')
+        and not response.has_header('Content-Encoding')
+        and not response.streaming
+    )
+
+
+def cached_view(request, tags, render):
+    """
+    Serve ``request`` do cache quando anônimo; ``render`` produz a resposta
+    numa falta, guardada se for um JSON 200.
+    """
+    if not is_cacheable(request):
+        return render()
+
+    versions = resolve_versions(tags, cache.get_many([tag_key(tag) for tag in tags]))
+    key = response_key(request, versions)
+    entry = cache.get(key)
+    if entry is None:
+        response = render()
+        if hasattr(response, 'render'):
+            response.render()
+        if not is_storable(response):
+            return response
+        entry = make_entry(response)
+        cache.set(key, entry, ANONYMOUS_CACHE_TIMEOUT)
+    return entry_response(request, entry)
+
+
+async def acached_view(request, tags, render):
+    """``cached_view`` para views assíncronas (ver async_views.py)."""
+    if not is_cacheable(request):
+        return await render()
+
+    versions = await aresolve_versions(tags, await cache.aget_many([tag_key(tag) for tag in tags]))
+    key = response_key(request, versions)
+    entry = await cache.aget(key)
+    if entry is None:
+        response = await render()
+        if not is_storable(response):
+            return response
+        entry = make_entry(response)
+        await cache.aset(key, entry, ANONYMOUS_CACHE_TIMEOUT)
+    return entry_response(request, entry)
+
+
+def cache_anonymous(tags):
+    """Decorator de views assíncronas com o cache anônimo de ``tags``."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            return await acached_view(request, tags, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class AnonymousCacheMixin:
+    """
+    Cacheia os GETs anônimos do viewset. ``anonymous_cache_tags`` são as
+    tabelas de que as respostas dependem.
+    """
+    anonymous_cache_tags = CATALOG_TAGS
+
+    def dispatch(self, request, *args, **kwargs):
+        parent = super(AnonymousCacheMixin, self).dispatch
+        return cached_view(request, self.anonymous_cache_tags, lambda: parent(request, *args, **kwargs))
@@ -0,0 +1,314 @@
+"""
+Motor de busca do catálogo.
+
+No PostgreSQL a busca usa full-text search em português sem acentos sobre a
+coluna ``Content.search_vector`` (índice GIN) combinada com similaridade por
+trigramas em ``Content.title`` e ``Person.name`` para tolerar erros de
+digitação. Nos demais bancos (SQLite em testes e benchmarks) a mesma API é
+atendida por um índice invertido em memória.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Case, Count, F, IntegerField, Max, Q, When
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from rest_framework import filters
+from .models import Content, Person
+
+SEARCH_CONFIG = 'portuguese_unaccent'
+
+# Campos pesquisáveis e seus pesos (mesma escala A-D do PostgreSQL)
+SEARCH_FIELDS = {
+    Content: {'title': 'A', 'original_title': 'A', 'description': 'B'},
+    Person: {'name': 'A'},
+}
+TRIGRAM_FIELDS = {
+    Content: 'title',
+    Person: 'name',
+}
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+TRIGRAM_THRESHOLD = 0.3
+MAX_FALLBACK_RESULTS = 500
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Redução simples de plurais e sufixos, aplicada após remover acentos
+SUFFIXES = (
+    ('coes', 'cao'), ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'),
+    ('eis', 'el'), ('ois', 'ol'), ('res', 'r'), ('ns', 'm'), ('s', ''),
+)
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def unaccent(text):
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def stem(word):
+    if len(word) > 3:
+        for suffix, replacement in SUFFIXES:
+            if word.endswith(suffix):
+                return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall(unaccent(text or '').lower())]
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def content_search_vector():
+    fields = SEARCH_FIELDS[Content]
+    vectors = [
+        SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        for field, weight in fields.items()
+    ]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector + other
+    return vector
+
+
+def refresh_search_vectors(queryset=None):
+    """
+    Recalcula ``search_vector`` das linhas informadas. Sem efeito fora do
+    PostgreSQL, onde o índice em memória é reconstruído sob demanda.
+    """
+    if not is_postgresql():
+        return 0
+    if queryset is None:
+        queryset = Content.objects.all()
+    return queryset.update(search_vector=content_search_vector())
+
+
+def install_search_indexes(sender=None, using='default', **kwargs):
+    """
+    Cria extensões, a configuração de texto sem acentos e os índices GIN.
+    Conectado ao post_migrate; os comandos são idempotentes.
+    """
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+
+    content_table = Content._meta.db_table
+    person_table = Person._meta.db_table
+    statements = [
+        'CREATE EXTENSION IF NOT EXISTS unaccent',
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$
+        """,
+        f'CREATE INDEX IF NOT EXISTS {content_table}_search_gin '
+        f'ON {content_table} USING gin (search_vector)',
+        f'CREATE INDEX IF NOT EXISTS {content_table}_title_trgm '
+        f'ON {content_table} USING gin (title gin_trgm_ops)',
+        f'CREATE INDEX IF NOT EXISTS {content_table}_original_title_trgm '
+        f'ON {content_table} USING gin (original_title gin_trgm_ops)',
+        f'CREATE INDEX IF NOT EXISTS {person_table}_name_trgm '
+        f'ON {person_table} USING gin (name gin_trgm_ops)',
+    ]
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class InvertedIndex:
+    """
+    Índice invertido em memória com ranking TF-IDF ponderado por campo,
+    busca por prefixo no último termo e correspondência aproximada por
+    trigramas quando um termo não existe no vocabulário.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.postings = defaultdict(dict)
+        self.trigram_terms = defaultdict(set)
+        self.documents = set()
+        self.vocabulary = []
+
+    def add(self, pk, values):
+        for field, weight in self.weights.items():
+            for term in tokenize(values.get(field)):
+                scores = self.postings[term]
+                scores[pk] = scores.get(pk, 0.0) + WEIGHTS[weight]
+        self.documents.add(pk)
+
+    def finalize(self):
+        self.vocabulary = sorted(self.postings)
+        for term in self.vocabulary:
+            for trigram in trigrams(term):
+                self.trigram_terms[trigram].add(term)
+
+    def prefix_terms(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def similar_terms(self, token):
+        token_trigrams = trigrams(token)
+        candidates = set()
+        for trigram in token_trigrams:
+            candidates |= self.trigram_terms.get(trigram, set())
+        matches = []
+        for term in candidates:
+            term_trigrams = trigrams(term)
+            similarity = len(token_trigrams & term_trigrams) / len(token_trigrams | term_trigrams)
+            if similarity >= TRIGRAM_THRESHOLD:
+                matches.append((term, similarity))
+        return matches
+
+    def expand(self, token, is_last):
+        if token in self.postings:
+            return [(token, 1.0)]
+        matches = []
+        if is_last:
+            matches = [(term, 0.8) for term in self.prefix_terms(token)]
+        return matches or [(term, similarity * 0.5) for term, similarity in self.similar_terms(token)]
+
+    def search(self, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        total = len(self.documents) or 1
+        scores = None
+        for position, token in enumerate(tokens):
+            token_scores = defaultdict(float)
+            for term, factor in self.expand(token, position == len(tokens) - 1):
+                postings = self.postings[term]
+                idf = math.log(1 + total / len(postings))
+                for pk, tf in postings.items():
+                    token_scores[pk] += tf * idf * factor
+            # Todos os termos precisam casar, como o operador & do tsquery
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                scores = {pk: score + token_scores[pk] for pk, score in scores.items() if pk in token_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [pk for pk, _ in ranked[:MAX_FALLBACK_RESULTS]]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def version_key(model):
+    return f'search:version:{model._meta.label_lower}'
+
+
+def watermark(model):
+    # Contagem e maior pk não enxergam edições em modelos sem updated_at
+    # (Person); a versão compartilhada no cache cobre renomeações feitas
+    # em outros workers.
+    aggregates = {'count': Count('pk'), 'last_pk': Max('pk')}
+    if any(field.name == 'updated_at' for field in model._meta.get_fields()):
+        aggregates['updated'] = Max('updated_at')
+    cache.add(version_key(model), time.time_ns(), None)
+    aggregates = model.objects.aggregate(**aggregates)
+    aggregates['version'] = cache.get(version_key(model))
+    return tuple(sorted(aggregates.items()))
+
+
+def invalidate(model):
+    cache.set(version_key(model), time.time_ns(), None)
+    with _lock:
+        _indexes.pop(model, None)
+
+
+def get_index(model):
+    """Retorna o índice em memória do modelo, reconstruindo-o se o catálogo mudou."""
+    mark = watermark(model)
+    with _lock:
+        cached = _indexes.get(model)
+        if cached and cached[0] == mark:
+            return cached[1]
+
+    fields = SEARCH_FIELDS[model]
+    index = InvertedIndex(fields)
+    for row in model.objects.values('pk', *fields).iterator():
+        index.add(row['pk'], row)
+    index.finalize()
+
+    with _lock:
+        _indexes[model] = (mark, index)
+    return index
+
+
+def prefix_query(text):
+    tokens = TOKEN_RE.findall(text)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search(queryset, text):
+    """Filtra ``queryset`` pelo texto informado e ordena por relevância."""
+    model = queryset.model
+    trigram_field = TRIGRAM_FIELDS[model]
+
+    if is_postgresql():
+        similarity = TrigramSimilarity(trigram_field, text)
+        matches = Q(**{f'{trigram_field}__trigram_similar': text})
+        if model is Content:
+            raw = prefix_query(text)
+            if not raw:
+                return queryset.none()
+            query = SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+            return queryset.annotate(
+                rank=SearchRank(F('search_vector'), query),
+                similarity=similarity,
+            ).filter(Q(search_vector=query) | matches).order_by('-rank', '-similarity', 'pk')
+        return queryset.annotate(similarity=similarity).filter(
+            Q(**{f'{trigram_field}__icontains': text}) | matches
+        ).order_by('-similarity', 'pk')
+
+    ranked = get_index(model).search(text)
+    if not ranked:
+        return queryset.none()
+    position = Case(
+        *[When(pk=pk, then=order) for order, pk in enumerate(ranked)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ranked).order_by(position)
+
+
+class RankedSearchFilter(filters.BaseFilterBackend):
+    """
+    Substitui o SearchFilter do DRF mantendo o parâmetro ``?search=``, mas
+    com resultados ordenados por relevância.
+    """
+    search_param = filters.SearchFilter.search_param
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search(queryset, text)
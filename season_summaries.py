@@ -0,0 +1,37 @@
+"""
+Resumo de cada temporada (número de episódios e duração total).
+
+O detalhe de um título pode trazer apenas esses resumos em vez de todos os
+episódios; os episódios são carregados por temporada, paginados, em
+``/episodes/?season=``. O resumo é recalculado com um único UPDATE a cada
+alteração de episódio (ver signals.py). ``refresh_all`` grava sem signals e
+invalida as respostas anônimas em cache.
+"""
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Content, Season, Episode
+from . import response_cache
+
+
+def refresh_season_summaries(seasons):
+    """Recalcula o resumo das temporadas do queryset ``seasons``."""
+    episodes = Episode.objects.filter(season=OuterRef('pk')).order_by().values('season')
+    return seasons.update(
+        episode_count=Coalesce(
+            Subquery(episodes.annotate(total=Count('pk')).values('total'), output_field=IntegerField()), 0
+        ),
+        total_runtime=Coalesce(
+            Subquery(episodes.annotate(total=Sum('duration')).values('total'), output_field=IntegerField()), 0
+        ),
+    )
+
+
+def refresh_all(chunk_size=1000):
+    """Recalcula todas as temporadas em blocos de IDs."""
+    season_ids = list(Season.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(season_ids), chunk_size):
+        refresh_season_summaries(Season.objects.filter(pk__in=season_ids[start:start + chunk_size]))
+    # O detalhe dos títulos traz os resumos
+    transaction.on_commit(lambda: response_cache.invalidate(Season, Content))
+    return len(season_ids)
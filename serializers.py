@@ -1,61 +1,104 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import models
 from .models import (
     Genre, Person, Content, Cast, Season, Episode, 
-    UserProfile, WatchHistory, Favorite, Rating
+    UserProfile, WatchHistory, ContinueWatching, Favorite, Rating, StreamingSession
 )
+from .storage_urls import MediaFileField, MediaImageField
+from .derivatives import ImageVariantsField
+from .fieldsets import SparseFieldsetSerializerMixin
+from .metrics import timed
 
-class GenreSerializer(serializers.ModelSerializer):
+class MediaModelSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    ModelSerializer cujos campos de arquivo usam o cache de URLs (ver
+    storage_urls.py) e que respeita ?fields= e ?expand= (ver fieldsets.py).
+    """
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: MediaFileField,
+        models.ImageField: MediaImageField,
+    }
+    
+    def to_representation(self, instance):
+        # Tempo de serialização no Server-Timing (ver metrics.py)
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+class GenreSerializer(MediaModelSerializer):
     class Meta:
         model = Genre
         fields = '__all__'
 
-class PersonSerializer(serializers.ModelSerializer):
+class PersonSerializer(MediaModelSerializer):
+    images = ImageVariantsField()
+    
     class Meta:
         model = Person
         fields = '__all__'
 
-class CastSerializer(serializers.ModelSerializer):
+class CastSerializer(MediaModelSerializer):
     person = PersonSerializer(read_only=True)
     
     class Meta:
         model = Cast
         fields = ['person', 'character_name', 'order']
 
-class EpisodeSerializer(serializers.ModelSerializer):
+class EpisodeSerializer(MediaModelSerializer):
+    images = ImageVariantsField()
+    
     class Meta:
         model = Episode
         fields = '__all__'
 
-class SeasonSerializer(serializers.ModelSerializer):
+class SeasonSerializer(MediaModelSerializer):
     episodes = EpisodeSerializer(many=True, read_only=True)
+    images = ImageVariantsField()
     
     class Meta:
         model = Season
         fields = '__all__'
 
-class ContentListSerializer(serializers.ModelSerializer):
+class SeasonSummarySerializer(MediaModelSerializer):
+    """Temporada sem os episódios, carregados à parte em /episodes/?season="""
+    images = ImageVariantsField()
+    
+    class Meta:
+        model = Season
+        fields = [
+            'id', 'season_number', 'title', 'description', 'release_date',
+            'poster', 'images', 'episode_count', 'total_runtime'
+        ]
+
+class ContentListSerializer(MediaModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
+    images = ImageVariantsField()
     
     class Meta:
         model = Content
         fields = [
             'id', 'title', 'description', 'content_type', 'release_date',
             'duration', 'rating', 'imdb_rating', 'poster', 'backdrop',
-            'is_featured', 'is_trending', 'view_count', 'genres'
+            'images', 'is_featured', 'is_trending', 'view_count',
+            'user_rating', 'rating_count', 'genres'
         ]
 
-class ContentDetailSerializer(serializers.ModelSerializer):
+class ContentDetailSerializer(MediaModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
-    cast = CastSerializer(many=True, read_only=True)
+    cast = CastSerializer(source='cast_set', many=True, read_only=True)
     directors = PersonSerializer(many=True, read_only=True)
     seasons = SeasonSerializer(many=True, read_only=True)
+    images = ImageVariantsField()
     
     class Meta:
         model = Content
-        fields = '__all__'
+        exclude = ['search_vector', 'external_id']
+
+class ContentSummaryDetailSerializer(ContentDetailSerializer):
+    seasons = SeasonSummarySerializer(many=True, read_only=True)
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(MediaModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.CharField(source='user.email', read_only=True)
     
@@ -63,7 +106,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields = ['username', 'email', 'avatar', 'date_of_birth', 'preferred_language']
 
-class WatchHistorySerializer(serializers.ModelSerializer):
+class WatchHistorySerializer(MediaModelSerializer):
     content = ContentListSerializer(read_only=True)
     episode = EpisodeSerializer(read_only=True)
     
@@ -71,14 +114,67 @@ class WatchHistorySerializer(serializers.ModelSerializer):
         model = WatchHistory
         fields = '__all__'
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class ContinueWatchingContentSerializer(MediaModelSerializer):
+    class Meta:
+        model = Content
+        fields = ['id', 'title', 'content_type', 'duration', 'poster', 'backdrop', 'images']
+
+class ContinueWatchingEpisodeSerializer(MediaModelSerializer):
+    season_number = serializers.IntegerField(source='season.season_number', read_only=True)
+    
+    class Meta:
+        model = Episode
+        fields = ['id', 'season', 'season_number', 'episode_number', 'title', 'duration', 'thumbnail', 'images']
+
+class ContinueWatchingSerializer(MediaModelSerializer):
+    """Entrada da trilha "continuar assistindo" (ver continue_watching.py)."""
+    content = ContinueWatchingContentSerializer(read_only=True)
+    episode = ContinueWatchingEpisodeSerializer(read_only=True)
+    
+    class Meta:
+        model = ContinueWatching
+        fields = ['content', 'episode', 'progress', 'up_next', 'updated_at']
+
+class HeartbeatSerializer(serializers.Serializer):
+    content = serializers.IntegerField(required=False, min_value=1)
+    episode = serializers.IntegerField(required=False, min_value=1)
+    progress = serializers.IntegerField(min_value=0)
+    completed = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, attrs):
+        if not attrs.get('content') and not attrs.get('episode'):
+            raise serializers.ValidationError("Conteúdo ou episódio é obrigatório.")
+        return attrs
+
+class ManifestRequestSerializer(serializers.Serializer):
+    content_id = serializers.IntegerField(required=False, min_value=1)
+    episode_id = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate(self, attrs):
+        if not attrs.get('content_id') and not attrs.get('episode_id'):
+            raise serializers.ValidationError("Conteúdo ou episódio é obrigatório.")
+        return attrs
+
+class StreamingSessionSerializer(MediaModelSerializer):
+    content_title = serializers.CharField(source='content.title', read_only=True, default=None)
+    episode_title = serializers.CharField(source='episode.title', read_only=True, default=None)
+    
+    class Meta:
+        model = StreamingSession
+        fields = [
+            'id', 'content_title', 'episode_title', 'quality', 'buffering_count',
+            'buffering_duration', 'start_time', 'end_time', 'duration'
+        ]
+        read_only_fields = ['start_time', 'end_time', 'duration']
+
+class FavoriteSerializer(MediaModelSerializer):
     content = ContentListSerializer(read_only=True)
     
     class Meta:
         model = Favorite
         fields = '__all__'
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(MediaModelSerializer):
     content = ContentListSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     
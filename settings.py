@@ -4,7 +4,7 @@ Django settings for netflix_backend project.
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,7 +25,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'storages',
     'accounts',
@@ -34,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para que o tempo total inclua os demais middlewares
+    'movies.metrics.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +66,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'netflix_backend.wsgi.application'
+ASGI_APPLICATION = 'netflix_backend.asgi.application'
+
+# Views assíncronas das leituras frequentes (ver async_views.py); ligado
+# por asgi.py, já que sob WSGI cada uma roda em um event loop próprio
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
 
 # Database
 DATABASE_URL = config('DATABASE_URL', default='')
@@ -82,6 +91,68 @@ else:
         }
     }
 
+# Réplicas de leitura (ver replicas.py): URLs separadas por vírgula, cada uma
+# com o alias replica_N. O catálogo é lido das réplicas; escritas e dados do
+# usuário ficam no primário, assim como as leituras de quem gravou histórico,
+# favoritos ou avaliações nos últimos READ_YOUR_WRITES_WINDOW segundos.
+DATABASE_REPLICAS = []
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    import dj_database_url
+    DATABASES[f'replica_{index}'] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_ROUTERS = ['movies.replicas.ReplicaRouter']
+READ_YOUR_WRITES_WINDOW = config('READ_YOUR_WRITES_WINDOW', default=10, cast=int)
+
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='netflix-clone'),
+    }
+}
+
+# Trilhas da página inicial (destaques e em alta), reconstruídas via signals
+RAIL_CACHE_TIMEOUT = config('RAIL_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# GETs anônimos do catálogo guardados já comprimidos (ver response_cache.py)
+ANONYMOUS_CACHE_TIMEOUT = config('ANONYMOUS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Manifestos de reprodução, reconstruídos via signals quando a mídia muda
+MANIFEST_CACHE_TIMEOUT = config('MANIFEST_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Heartbeats de progresso gravados em lote (ver heartbeats.py)
+WATCH_PROGRESS_FLUSH_INTERVAL = config('WATCH_PROGRESS_FLUSH_INTERVAL', default=5, cast=int)
+WATCH_PROGRESS_BUFFER_SIZE = config('WATCH_PROGRESS_BUFFER_SIZE', default=1000, cast=int)
+WATCH_PROGRESS_MAX_EVENTS = config('WATCH_PROGRESS_MAX_EVENTS', default=500, cast=int)
+
+# Cache da autenticação por token (ver authentication.py). Com um alias em
+# AUTH_TOKEN_SHARED_CACHE os processos compartilham os usuários em cache.
+AUTH_TOKEN_CACHE_SIZE = config('AUTH_TOKEN_CACHE_SIZE', default=10000, cast=int)
+AUTH_TOKEN_LOCAL_TIMEOUT = config('AUTH_TOKEN_LOCAL_TIMEOUT', default=30, cast=int)
+AUTH_TOKEN_CACHE_TIMEOUT = config('AUTH_TOKEN_CACHE_TIMEOUT', default=60 * 5, cast=int)
+AUTH_TOKEN_SHARED_CACHE = config('AUTH_TOKEN_SHARED_CACHE', default='')
+
+# Itens da trilha "continuar assistindo" (ver continue_watching.py)
+CONTINUE_WATCHING_LIMIT = config('CONTINUE_WATCHING_LIMIT', default=20, cast=int)
+
+# Contadores de visualização acumulados em memória (ver counters.py).
+# O intervalo de flush é o atraso máximo de sort_by=popularity.
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=int)
+VIEW_COUNT_SHARDS = config('VIEW_COUNT_SHARDS', default=16, cast=int)
+
+# Instrumentação por requisição (ver metrics.py). O endpoint de métricas
+# exige METRICS_TOKEN como Bearer (ou um usuário staff). Com
+# SLOW_REQUEST_PROFILE_MS > 0 as requisições mais lentas que o limite têm as
+# pilhas amostradas gravadas em SLOW_REQUEST_PROFILE_DIR. O cabeçalho
+# Server-Timing expõe a composição interna de cada resposta e só é enviado
+# com SERVER_TIMING=True (desenvolvimento e ambientes internos).
+SERVER_TIMING = config('SERVER_TIMING', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=15, cast=int)
+SLOW_REQUEST_PROFILE_MS = config('SLOW_REQUEST_PROFILE_MS', default=0, cast=int)
+SLOW_REQUEST_PROFILE_INTERVAL_MS = config('SLOW_REQUEST_PROFILE_INTERVAL_MS', default=5, cast=int)
+SLOW_REQUEST_PROFILE_DIR = config('SLOW_REQUEST_PROFILE_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,6 +194,16 @@ AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
 
+# URLs de mídia (ver storage_urls.py): assinaturas reaproveitadas dentro de
+# janelas de MEDIA_URL_EXPIRY segundos; com MEDIA_CDN_URL não há assinatura
+MEDIA_URL_EXPIRY = config('MEDIA_URL_EXPIRY', default=60 * 60, cast=int)
+MEDIA_URL_CACHE_SIZE = config('MEDIA_URL_CACHE_SIZE', default=10000, cast=int)
+MEDIA_CDN_URL = config('MEDIA_CDN_URL', default='')
+
+# Threads que geram os derivados responsivos das imagens em cada processo web
+# (ver derivatives.py); o build_image_derivatives usa processos
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+
 # Use S3 for media files if configured
 if AWS_STORAGE_BUCKET_NAME:
     DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
@@ -135,11 +216,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication com cache do usuário (ver authentication.py)
+        'movies.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'movies.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
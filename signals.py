@@ -0,0 +1,279 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    Genre, Person, Content, Cast, Season, Episode,
+    WatchHistory, Favorite, Rating, VideoQuality, Subtitle, AudioTrack
+)
+from rest_framework.authtoken.models import Token
+from . import (
+    authentication, continue_watching, derivatives, manifests, rails, rating_aggregates, replicas, response_cache, search,
+)
+from .season_summaries import refresh_season_summaries
+from .conditional import touch_contents
+
+
+def schedule_rail_rebuild():
+    # Reconstrói após o commit para que a trilha nunca reflita uma
+    # transação desfeita e o cache antigo siga servindo até lá.
+    transaction.on_commit(rails.rebuild_rails)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def rebuild_rails_on_catalog_change(sender, **kwargs):
+    schedule_rail_rebuild()
+
+
+@receiver(m2m_changed, sender=Content.genres.through)
+def rebuild_rails_on_genres_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_rail_rebuild()
+
+
+@receiver(pre_save, sender=Content)
+def remember_searchable_fields(sender, instance, update_fields=None, **kwargs):
+    fields = search.SEARCH_FIELDS[Content]
+    instance._previous_searchable = None
+    if instance.pk is None or not search.is_postgresql():
+        return
+    if update_fields is not None and not set(update_fields) & set(fields):
+        instance._previous_searchable = {}
+        return
+    instance._previous_searchable = Content.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(post_save, sender=Content)
+def refresh_content_search_vector(sender, instance, created, update_fields=None, **kwargs):
+    # Só recalcula o vetor quando um campo pesquisável mudou; salvar apenas
+    # contadores ou datas não precisa de outro UPDATE.
+    fields = search.SEARCH_FIELDS[Content]
+    previous = getattr(instance, '_previous_searchable', None)
+    if not created and previous is not None:
+        if update_fields is not None:
+            fields = [field for field in fields if field in update_fields]
+        if all(previous.get(field) == getattr(instance, field) for field in fields):
+            return
+    search.refresh_search_vectors(Content.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_people_search_index(sender, **kwargs):
+    search.invalidate(Person)
+
+
+# Mantém Content.updated_at como marca d'água das relações aninhadas no
+# detalhe, usada pelos ETags (ver conditional.py)
+
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+@receiver(post_save, sender=Cast)
+@receiver(post_delete, sender=Cast)
+def touch_content_of_child(sender, instance, **kwargs):
+    touch_contents(Content.objects.filter(pk=instance.content_id))
+
+
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def touch_content_of_episode(sender, instance, **kwargs):
+    touch_contents(Content.objects.filter(seasons=instance.season_id))
+
+
+@receiver(pre_save, sender=Episode)
+def remember_previous_season(sender, instance, **kwargs):
+    instance._previous_season_id = None
+    if instance.pk is not None:
+        instance._previous_season_id = Episode.objects.filter(
+            pk=instance.pk
+        ).values_list('season_id', flat=True).first()
+
+
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def refresh_season_summary(sender, instance, **kwargs):
+    # Um episódio pode ter mudado de temporada
+    season_ids = {instance.season_id, getattr(instance, '_previous_season_id', None)} - {None}
+    refresh_season_summaries(Season.objects.filter(pk__in=season_ids))
+
+
+@receiver(post_save, sender=Genre)
+def touch_contents_of_genre(sender, instance, created, **kwargs):
+    if not created:
+        touch_contents(Content.objects.filter(genres=instance))
+
+
+@receiver(post_save, sender=Person)
+def touch_contents_of_person(sender, instance, created, **kwargs):
+    if not created:
+        touch_contents(Content.objects.filter(cast=instance))
+        touch_contents(Content.objects.filter(directors=instance))
+
+
+@receiver(m2m_changed, sender=Content.genres.through)
+@receiver(m2m_changed, sender=Content.directors.through)
+def touch_contents_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_contents(Content.objects.filter(pk=instance.pk))
+    elif pk_set:
+        touch_contents(Content.objects.filter(pk__in=pk_set))
+
+
+# Manifestos de reprodução recalculados quando a mídia muda (ver manifests.py)
+
+def schedule_manifest_rebuild(kind, pk):
+    transaction.on_commit(lambda: manifests.rebuild_manifest(kind, pk))
+
+
+@receiver(post_save, sender=Content)
+def rebuild_content_manifest(sender, instance, **kwargs):
+    schedule_manifest_rebuild('content', instance.pk)
+    # Episódios sem miniatura usam o pôster do título
+    episode_ids = list(Episode.objects.filter(season__content=instance).values_list('pk', flat=True))
+    transaction.on_commit(lambda: manifests.invalidate_manifests('episode', episode_ids))
+
+
+@receiver(post_save, sender=Episode)
+def rebuild_episode_manifest(sender, instance, **kwargs):
+    schedule_manifest_rebuild('episode', instance.pk)
+
+
+@receiver(post_delete, sender=Content)
+@receiver(post_delete, sender=Episode)
+def invalidate_title_manifest(sender, instance, **kwargs):
+    kind = 'content' if sender is Content else 'episode'
+    transaction.on_commit(lambda: manifests.invalidate_manifests(kind, [instance.pk]))
+
+
+@receiver(post_save, sender=VideoQuality)
+@receiver(post_delete, sender=VideoQuality)
+@receiver(post_save, sender=Subtitle)
+@receiver(post_delete, sender=Subtitle)
+@receiver(post_save, sender=AudioTrack)
+@receiver(post_delete, sender=AudioTrack)
+def rebuild_track_owner_manifest(sender, instance, **kwargs):
+    if instance.episode_id:
+        schedule_manifest_rebuild('episode', instance.episode_id)
+    elif instance.content_id:
+        schedule_manifest_rebuild('content', instance.content_id)
+
+
+# Derivados responsivos gerados em segundo plano (ver derivatives.py)
+
+@receiver(post_save, sender=Content)
+@receiver(post_save, sender=Season)
+@receiver(post_save, sender=Episode)
+@receiver(post_save, sender=Person)
+def schedule_image_derivatives(sender, instance, **kwargs):
+    for field in derivatives.stale_fields(instance):
+        transaction.on_commit(
+            lambda field=field: derivatives.pipeline.submit(sender, instance.pk, field)
+        )
+
+
+# Agregados de avaliação em Content (ver rating_aggregates.py)
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is None:
+        return
+    previous = Rating.objects.filter(pk=instance.pk)
+    if connection.in_atomic_block:
+        # Serializa alterações concorrentes da mesma avaliação
+        previous = previous.select_for_update()
+    instance._previous_rating = previous.values_list('content_id', 'rating').first()
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_aggregates(sender, instance, created, **kwargs):
+    current = (instance.content_id, instance.rating)
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        rating_aggregates.rating_added(*current)
+    else:
+        rating_aggregates.rating_changed(previous, current)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    rating_aggregates.rating_removed(instance.content_id, instance.rating)
+
+
+# Trilha "continuar assistindo" (ver continue_watching.py). Os heartbeats
+# gravam em lote, sem signals, e atualizam a trilha em heartbeats.py.
+
+@receiver(post_save, sender=WatchHistory)
+def update_continue_watching(sender, instance, **kwargs):
+    continue_watching.record_progress(
+        {(instance.user_id, instance.content_id, instance.episode_id): (instance.progress, instance.completed)},
+        instance.watched_at,
+    )
+
+
+@receiver(post_delete, sender=WatchHistory)
+def forget_continue_watching(sender, instance, **kwargs):
+    continue_watching.forget(instance.user_id, instance.content_id, instance.episode_id)
+
+
+# Cache da autenticação por token (ver authentication.py). Invalida após o
+# commit para que uma requisição concorrente não volte a guardar o estado antigo.
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: authentication.token_cache.invalidate([key]))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    # Troca de senha, desativação ou qualquer campo do retrato em cache; o
+    # login por sessão só atualiza last_login
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: authentication.invalidate_user_tokens(user_id))
+
+
+# Cache de respostas anônimas do catálogo (ver response_cache.py). A nova
+# versão das tags vale após o commit, como as trilhas.
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+@receiver(post_save, sender=Cast)
+@receiver(post_delete, sender=Cast)
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def invalidate_anonymous_responses(sender, **kwargs):
+    transaction.on_commit(lambda: response_cache.invalidate(sender))
+
+
+@receiver(m2m_changed, sender=Content.genres.through)
+@receiver(m2m_changed, sender=Content.directors.through)
+def invalidate_anonymous_responses_on_m2m_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: response_cache.invalidate(Content))
+
+
+# Read-your-writes com réplicas (ver replicas.py): após gravar, as leituras
+# do usuário ficam no primário até a réplica alcançar a escrita
+
+@receiver(post_save, sender=WatchHistory)
+@receiver(post_delete, sender=WatchHistory)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def pin_writer_to_primary(sender, instance, **kwargs):
+    replicas.pin_to_primary([instance.user_id])
@@ -0,0 +1,114 @@
+"""
+Geração de URLs de mídia com cache.
+
+Com o S3 cada ``storage.url()`` calcula uma assinatura, e as listagens
+chamam isso para cada pôster e fundo de cada linha. Aqui as URLs ficam em um
+LRU limitado por processo, chaveado por (storage, chave do arquivo, janela
+de expiração): dentro de uma janela de ``MEDIA_URL_EXPIRY`` segundos o mesmo
+arquivo devolve a mesma URL, assinada para continuar válida por pelo menos
+mais uma janela. Com ``MEDIA_CDN_URL`` as URLs são o prefixo do CDN mais a
+chave, sem assinatura.
+"""
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+MEDIA_URL_EXPIRY = getattr(settings, 'MEDIA_URL_EXPIRY', 60 * 60)
+MEDIA_URL_CACHE_SIZE = getattr(settings, 'MEDIA_URL_CACHE_SIZE', 10000)
+MEDIA_CDN_URL = getattr(settings, 'MEDIA_CDN_URL', '')
+
+
+def accepts_expire(storage):
+    """Storages que assinam URLs (ex.: S3Boto3Storage) aceitam ``expire``."""
+    try:
+        return 'expire' in inspect.signature(storage.url).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class URLCache:
+    def __init__(self, max_size=MEDIA_URL_CACHE_SIZE, expiry=MEDIA_URL_EXPIRY, cdn_url=MEDIA_CDN_URL):
+        self.max_size = max_size
+        self.expiry = expiry
+        self.cdn_url = cdn_url.rstrip('/')
+        self.entries = OrderedDict()
+        self.signing = {}
+        self.lock = threading.Lock()
+
+    def is_signing(self, storage):
+        signing = self.signing.get(type(storage))
+        if signing is None:
+            signing = self.signing[type(storage)] = accepts_expire(storage)
+        return signing
+
+    def url(self, storage, name):
+        if not name:
+            return None
+        if self.cdn_url:
+            return f'{self.cdn_url}/{quote(name)}'
+
+        signing = self.is_signing(storage)
+        now = time.time()
+        # Storages sem assinatura geram sempre a mesma URL: janela única
+        window = int(now // self.expiry) if signing else 0
+        key = (id(storage), name, window)
+        with self.lock:
+            url = self.entries.get(key)
+            if url is not None:
+                self.entries.move_to_end(key)
+                return url
+
+        if signing:
+            # Válida até o fim da janela atual mais uma janela inteira
+            expire = int((window + 2) * self.expiry - now)
+            url = storage.url(name, expire=expire)
+        else:
+            url = storage.url(name)
+
+        with self.lock:
+            self.entries[key] = url
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+url_cache = URLCache()
+
+
+def media_url(storage, name):
+    return url_cache.url(storage, name)
+
+
+class MediaURLMixin:
+    """
+    ``to_representation`` dos campos de arquivo do DRF usando o cache de
+    URLs; como no DRF, a URL sai absoluta quando há requisição no contexto.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        url = media_url(value.storage, value.name)
+        request = self.context.get('request', None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class MediaFileField(MediaURLMixin, serializers.FileField):
+    pass
+
+
+class MediaImageField(MediaURLMixin, serializers.ImageField):
+    pass
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+# Montado pelo projeto em /api/streaming/, o prefixo usado por streaming.ts
+router = DefaultRouter()
+router.register(r'manifest', views.StreamingManifestViewSet, basename='streaming-manifest')
+router.register(r'sessions', views.StreamingSessionViewSet, basename='streaming-sessions')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+    urlpatterns = [
+        path('manifest/', async_views.start_playback),
+    ] + urlpatterns
@@ -0,0 +1,349 @@
+"""
+Gerador de dados sintéticos em escala de produção.
+
+Cria, a partir de uma semente, um catálogo e uma base de usuários com a
+assimetria de um serviço real: a popularidade dos títulos segue uma lei de
+Zipf (poucos títulos concentram a audiência), a atividade dos usuários segue
+uma distribuição de Pareto, as séries são maratonadas em ordem a partir do
+primeiro episódio e uma fração delas é de longa duração (dezenas de
+temporadas). As notas acompanham a nota IMDb do título.
+
+As linhas são gravadas com ``bulk_create`` em blocos, contando com as chaves
+primárias devolvidas pelo INSERT (SQLite e PostgreSQL). Como signals não
+disparam, ao final as tabelas derivadas são recalculadas: resumos de
+temporada, agregados de avaliação, "continuar assistindo", vetores de busca
+e trilhas. Os vizinhos de recomendação ficam a cargo de build_recommendations.
+"""
+import bisect
+import contextlib
+import datetime
+import itertools
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import (
+    Genre, Person, Content, Cast, Season, Episode,
+    UserProfile, WatchHistory, Favorite, Rating,
+)
+from . import continue_watching, rails, rating_aggregates, search
+from .season_summaries import refresh_all
+
+SYNTHETIC_PREFIX = 'synthetic-'
+
+GENRES = [
+    'Ação', 'Aventura', 'Animação', 'Comédia', 'Crime', 'Documentário', 'Drama',
+    'Família', 'Fantasia', 'Ficção científica', 'Guerra', 'História', 'Mistério',
+    'Musical', 'Policial', 'Reality', 'Romance', 'Suspense', 'Terror', 'Western',
+]
+FIRST_NAMES = [
+    'Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor',
+    'Isabela', 'João', 'Karina', 'Lucas', 'Marina', 'Nicolas', 'Olívia', 'Pedro',
+    'Rafaela', 'Sérgio', 'Tatiana', 'Vinícius',
+]
+LAST_NAMES = [
+    'Almeida', 'Barbosa', 'Cardoso', 'Duarte', 'Esteves', 'Ferreira', 'Gomes',
+    'Hoffmann', 'Igarashi', 'Lima', 'Moreira', 'Nogueira', 'Oliveira', 'Pereira',
+    'Queiroz', 'Ribeiro', 'Santos', 'Teixeira', 'Vasconcelos', 'Xavier',
+]
+WORDS = [
+    'sombra', 'cidade', 'noite', 'verão', 'segredo', 'mar', 'fronteira', 'fogo',
+    'silêncio', 'jardim', 'estrada', 'tempestade', 'espelho', 'herança', 'ilha',
+    'memória', 'lobo', 'vento', 'coroa', 'labirinto',
+]
+RATINGS = ['G', 'PG', 'PG-13', 'R', 'NC-17']
+CONTENT_TYPES = [('movie', 0.7), ('series', 0.25), ('documentary', 0.05)]
+
+ZIPF_EXPONENT = 1.1
+PARETO_ALPHA = 1.5
+COMPLETION_RATE = 0.7
+# Títulos marcados como destaque e como em alta
+RAIL_SIZE = 20
+
+
+@contextlib.contextmanager
+def manual_timestamps(*fields):
+    """Desliga ``auto_now``/``auto_now_add`` para gravar datas espalhadas."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def model_field(model, name):
+    return model._meta.get_field(name)
+
+
+class ZipfSampler:
+    """Sorteia itens com peso ``1 / posição ** s`` sobre uma ordem embaralhada."""
+
+    def __init__(self, rng, items, exponent=ZIPF_EXPONENT):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.weights = [1 / (rank ** exponent) for rank in range(1, len(self.items) + 1)]
+        self.cumulative = list(itertools.accumulate(self.weights))
+        self.rng = rng
+
+    def weight(self, position):
+        return self.weights[position] / self.cumulative[-1]
+
+    def sample(self):
+        position = bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+        return self.items[min(position, len(self.items) - 1)]
+
+    def distinct(self, count):
+        """Até ``count`` itens distintos (o sorteio desiste após muitas repetições)."""
+        chosen = {}
+        for _ in range(count * 4):
+            if len(chosen) >= count:
+                break
+            chosen[self.sample()] = None
+        return list(chosen)
+
+
+class SyntheticDataGenerator:
+    def __init__(self, seed=42, titles=5000, users=2000, history=200000, ratings=50000,
+                 favorites=20000, long_series=0.01, chunk_size=5000, now=None, log=None):
+        self.rng = random.Random(seed)
+        self.titles = titles
+        self.users = users
+        self.history = history
+        self.ratings = ratings
+        self.favorites = favorites
+        self.long_series = long_series
+        self.chunk_size = chunk_size
+        self.now = now or timezone.now()
+        self.log = log or (lambda message: None)
+        self.counts = {}
+
+    def past(self, max_days, skew=2.0):
+        """Instante até ``max_days`` atrás, concentrado no passado recente."""
+        days = max_days * self.rng.random() ** skew
+        return self.now - datetime.timedelta(days=days)
+
+    def bulk_create(self, model, objects):
+        objects = list(objects)
+        for start in range(0, len(objects), self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(objects[start:start + self.chunk_size])
+        label = model._meta.model_name
+        self.counts[label] = self.counts.get(label, 0) + len(objects)
+        return objects
+
+    def stream_create(self, model, objects):
+        """``bulk_create`` de um gerador, em blocos, sem materializar tudo."""
+        total = 0
+        iterator = iter(objects)
+        while True:
+            chunk = list(itertools.islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            total += len(chunk)
+        self.counts[model._meta.model_name] = total
+
+    def person_name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def title_name(self, number):
+        words = self.rng.sample(WORDS, self.rng.randint(1, 3))
+        return f'{" ".join(words).capitalize()} {number}'
+
+    def create_people(self):
+        genres = self.bulk_create(Genre, [Genre(name=name) for name in GENRES])
+        people = self.bulk_create(Person, [
+            Person(name=self.person_name(), roles=self.rng.choice(['actor', 'actor', 'actor', 'director']))
+            for _ in range(max(self.titles * 2, 10))
+        ])
+        self.genre_ids = [genre.pk for genre in genres]
+        self.person_ids = [person.pk for person in people]
+
+    def create_contents(self):
+        types, weights = zip(*CONTENT_TYPES)
+        contents = []
+        for number in range(self.titles):
+            content_type = self.rng.choices(types, weights)[0]
+            created_at = self.past(5 * 365, skew=1.0)
+            release = created_at.date() - datetime.timedelta(days=int(self.rng.expovariate(1 / 3000)))
+            contents.append(Content(
+                external_id=f'{SYNTHETIC_PREFIX}{number}',
+                title=self.title_name(number),
+                description=' '.join(self.rng.choices(WORDS, k=30)).capitalize() + '.',
+                content_type=content_type,
+                release_date=max(release, datetime.date(1920, 1, 1)),
+                duration=45 if content_type == 'series' else self.rng.randint(75, 180),
+                rating=self.rng.choice(RATINGS),
+                imdb_rating=round(min(max(self.rng.gauss(6.5, 1.2), 1.0), 10.0), 1),
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        with manual_timestamps(model_field(Content, 'created_at'), model_field(Content, 'updated_at')):
+            self.bulk_create(Content, contents)
+
+        self.popularity = ZipfSampler(self.rng, [content.pk for content in contents])
+        # Audiência acumulada proporcional à popularidade
+        views = {}
+        for position, pk in enumerate(self.popularity.items):
+            views[pk] = int(self.popularity.weight(position) * self.history * 10)
+        # Em alta: os mais vistos; destaques: escolha editorial, ao acaso
+        trending = set(self.popularity.items[:RAIL_SIZE])
+        featured = set(self.rng.sample(self.popularity.items, min(RAIL_SIZE, len(contents))))
+        for content in contents:
+            content.view_count = views[content.pk]
+            content.is_trending = content.pk in trending
+            content.is_featured = content.pk in featured
+        Content.objects.bulk_update(
+            contents, ['view_count', 'is_trending', 'is_featured'], batch_size=self.chunk_size
+        )
+        self.contents = {content.pk: (content.content_type, content.imdb_rating) for content in contents}
+
+    def create_credits(self):
+        actors = ZipfSampler(self.rng, self.person_ids, exponent=0.8)
+        genre_links, director_links, cast = [], [], []
+        for content_id in self.contents:
+            for genre_id in self.rng.sample(self.genre_ids, self.rng.randint(1, 3)):
+                genre_links.append(Content.genres.through(content_id=content_id, genre_id=genre_id))
+            director_links.append(Content.directors.through(
+                content_id=content_id, person_id=self.rng.choice(self.person_ids)
+            ))
+            for order, person_id in enumerate(actors.distinct(self.rng.randint(5, 12))):
+                cast.append(Cast(content_id=content_id, person_id=person_id, order=order,
+                                 character_name=self.rng.choice(FIRST_NAMES)))
+        self.bulk_create(Content.genres.through, genre_links)
+        self.bulk_create(Content.directors.through, director_links)
+        self.bulk_create(Cast, cast)
+
+    def create_episodes(self):
+        seasons = []
+        for content_id, (content_type, _) in self.contents.items():
+            if content_type != 'series':
+                continue
+            long_running = self.rng.random() < self.long_series
+            count = self.rng.randint(15, 30) if long_running else min(int(self.rng.expovariate(1 / 2)) + 1, 8)
+            for number in range(1, count + 1):
+                seasons.append(Season(
+                    content_id=content_id, season_number=number, title=f'Temporada {number}',
+                    release_date=datetime.date(2000, 1, 1) + datetime.timedelta(days=365 * number),
+                ))
+        self.bulk_create(Season, seasons)
+
+        episodes = []
+        for season in seasons:
+            for number in range(1, self.rng.randint(6, 24) + 1):
+                episodes.append(Episode(
+                    season_id=season.pk, episode_number=number, title=f'Episódio {number}',
+                    description=' '.join(self.rng.choices(WORDS, k=15)).capitalize() + '.',
+                    duration=self.rng.randint(22, 60),
+                    release_date=season.release_date + datetime.timedelta(days=7 * number),
+                ))
+        self.bulk_create(Episode, episodes)
+
+        # Episódios de cada série na ordem de exibição
+        self.episodes = {}
+        for season in seasons:
+            self.episodes.setdefault(season.content_id, [])
+        seasons_by_pk = {season.pk: season for season in seasons}
+        for episode in episodes:
+            season = seasons_by_pk[episode.season_id]
+            self.episodes[season.content_id].append((season.season_number, episode.episode_number, episode.pk))
+        for content_id, items in self.episodes.items():
+            self.episodes[content_id] = [pk for _, _, pk in sorted(items)]
+        self.episode_durations = {episode.pk: episode.duration for episode in episodes}
+
+    def create_users(self):
+        password = make_password(None)
+        users = [
+            User(username=f'{SYNTHETIC_PREFIX}{number}', password=password,
+                 email=f'{SYNTHETIC_PREFIX}{number}@example.com', date_joined=self.past(3 * 365, skew=1.0))
+            for number in range(self.users)
+        ]
+        self.bulk_create(User, users)
+        self.bulk_create(UserProfile, [UserProfile(user_id=user.pk) for user in users])
+        # Atividade por usuário: poucos usuários intensos, cauda longa de casuais
+        activity = [self.rng.paretovariate(PARETO_ALPHA) for _ in users]
+        total = sum(activity)
+        self.activity = [(user.pk, value / total) for user, value in zip(users, activity)]
+
+    def quota(self, share, total):
+        return max(int(round(share * total)), 1)
+
+    def history_rows(self):
+        for user_id, share in self.activity:
+            budget = self.quota(share, self.history)
+            for content_id in self.popularity.distinct(budget):
+                if budget <= 0:
+                    break
+                watched_at = self.past(365)
+                episodes = self.episodes.get(content_id)
+                if not episodes:
+                    completed = self.rng.random() < COMPLETION_RATE
+                    yield WatchHistory(
+                        user_id=user_id, content_id=content_id, watched_at=watched_at, completed=completed,
+                        progress=60 * 90 if completed else self.rng.randint(60, 60 * 80),
+                    )
+                    budget -= 1
+                    continue
+                # Maratona: do primeiro episódio em diante, em ordem
+                watched = min(int(self.rng.expovariate(1 / 6)) + 1, len(episodes), budget)
+                for position, episode_id in enumerate(episodes[:watched]):
+                    last = position == watched - 1
+                    completed = not last or self.rng.random() < COMPLETION_RATE
+                    duration = self.episode_durations[episode_id] * 60
+                    yield WatchHistory(
+                        user_id=user_id, content_id=content_id, episode_id=episode_id,
+                        watched_at=watched_at + datetime.timedelta(hours=position),
+                        completed=completed, progress=duration if completed else self.rng.randint(60, duration),
+                    )
+                budget -= watched
+
+    def rating_rows(self):
+        for user_id, share in self.activity:
+            for content_id in self.popularity.distinct(self.quota(share, self.ratings)):
+                quality = self.contents[content_id][1] / 2
+                stars = min(max(round(self.rng.gauss(quality, 1.0)), 1), 5)
+                yield Rating(user_id=user_id, content_id=content_id, rating=stars, created_at=self.past(365))
+
+    def favorite_rows(self):
+        for user_id, share in self.activity:
+            for content_id in self.popularity.distinct(self.quota(share, self.favorites)):
+                yield Favorite(user_id=user_id, content_id=content_id, created_at=self.past(365))
+
+    def create_activity(self):
+        with manual_timestamps(model_field(WatchHistory, 'watched_at')):
+            self.stream_create(WatchHistory, self.history_rows())
+        with manual_timestamps(model_field(Rating, 'created_at')):
+            self.stream_create(Rating, self.rating_rows())
+        with manual_timestamps(model_field(Favorite, 'created_at')):
+            self.stream_create(Favorite, self.favorite_rows())
+
+    def refresh_derived(self):
+        refresh_all()
+        rating_aggregates.reconcile()
+        continue_watching.rebuild()
+        search.refresh_search_vectors()
+        search.invalidate(Content)
+        search.invalidate(Person)
+        rails.rebuild_rails()
+
+    def generate(self):
+        steps = [
+            ('genres and people', self.create_people),
+            ('titles', self.create_contents),
+            ('credits', self.create_credits),
+            ('seasons and episodes', self.create_episodes),
+            ('users', self.create_users),
+            ('history, ratings and favorites', self.create_activity),
+            ('derived tables', self.refresh_derived),
+        ]
+        for label, step in steps:
+            start = time.perf_counter()
+            step()
+            self.log(f'Generated {label} in {time.perf_counter() - start:.1f}s')
+        return self.counts
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -15,6 +16,19 @@ router.register(r'ratings', views.RatingViewSet, basename='ratings')
 router.register(r'register', views.UserRegistrationViewSet, basename='register')
 
 urlpatterns = [
+    path('metrics/', views.metrics, name='metrics'),
     path('', include(router.urls)),
 ]
 
+if settings.ASYNC_READ_VIEWS:
+    # Antes das rotas do router: mesmas URLs e nomes (métricas por rota),
+    # views assíncronas
+    from . import async_views
+    urlpatterns = [
+        path('contents/', async_views.content_list, name='content-list'),
+        path('contents/featured/', async_views.content_rail, {'name': 'featured'}, name='content-featured'),
+        path('contents/trending/', async_views.content_rail, {'name': 'trending'}, name='content-trending'),
+        path('contents/<int:pk>/', async_views.content_detail, name='content-detail'),
+        path('history/continue/', async_views.continue_watching, name='history-continue-watching'),
+    ] + urlpatterns
+
@@ -1,44 +1,75 @@
+import hmac
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.utils import timezone
 from .models import (
     Genre, Person, Content, Cast, Season, Episode, 
-    UserProfile, WatchHistory, Favorite, Rating
+    UserProfile, WatchHistory, ContinueWatching, Favorite, Rating, StreamingSession
 )
 from .serializers import (
     GenreSerializer, PersonSerializer, ContentListSerializer, ContentDetailSerializer,
+    ContentSummaryDetailSerializer,
     SeasonSerializer, EpisodeSerializer, UserProfileSerializer, WatchHistorySerializer,
-    FavoriteSerializer, RatingSerializer, UserRegistrationSerializer
+    FavoriteSerializer, RatingSerializer, UserRegistrationSerializer, HeartbeatSerializer,
+    ManifestRequestSerializer, StreamingSessionSerializer, ContinueWatchingSerializer
 )
+from .heartbeats import progress_buffer
+from .continue_watching import CONTINUE_WATCHING_LIMIT
+from .manifests import get_manifest, playback_response
+from .counters import view_counters
+from .rails import get_rail
+from .recommender import recommended_content_ids, genre_recommendations
+from .search import RankedSearchFilter
+from .pagination import KeysetPagination
+from .conditional import ConditionalGetMixin
+from .fastpath import FastListMixin, ContentListFastSerializer
+from .fieldsets import SparseFieldsetViewMixin
+from .metrics import render_metrics
+from .response_cache import AnonymousCacheMixin, model_tags
+from .replicas import ReplicaReadMixin
 
-class GenreViewSet(viewsets.ReadOnlyModelViewSet):
+class GenreViewSet(AnonymousCacheMixin, ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    anonymous_cache_tags = model_tags(Genre)
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class PersonViewSet(viewsets.ReadOnlyModelViewSet):
+class PersonViewSet(AnonymousCacheMixin, ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    anonymous_cache_tags = model_tags(Person)
     queryset = Person.objects.all()
     serializer_class = PersonSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name']
+    filter_backends = [RankedSearchFilter]
 
-class ContentViewSet(viewsets.ReadOnlyModelViewSet):
+class ContentViewSet(AnonymousCacheMixin, ReplicaReadMixin, ConditionalGetMixin, FastListMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Content.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'original_title', 'description']
+    filter_backends = [RankedSearchFilter]
+    pagination_class = KeysetPagination
+    # A listagem é montada a partir de .values() (ver fastpath.py)
+    fast_serializer_class = ContentListFastSerializer
+    
+    def wants_season_summary(self):
+        # ?seasons=summary: temporadas resumidas, episódios via /episodes/?season=
+        return self.request.query_params.get('seasons') == 'summary'
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
+            if self.wants_season_summary():
+                return ContentSummaryDetailSerializer
             return ContentDetailSerializer
         return ContentListSerializer
     
     def get_queryset(self):
+        # As relações carregadas seguem o serializer podado (ver fieldsets.py)
         queryset = Content.objects.all()
         
         # Filtrar por tipo de conteúdo
@@ -69,6 +100,8 @@ class ContentViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.order_by('-release_date')
         elif sort_by == 'rating':
             queryset = queryset.order_by('-imdb_rating')
+        elif sort_by == 'user_rating':
+            queryset = queryset.order_by('-user_rating')
         else:
             queryset = queryset.order_by('-created_at')
         
@@ -76,15 +109,22 @@ class ContentViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        featured = Content.objects.filter(is_featured=True)
-        serializer = ContentListSerializer(featured, many=True)
-        return Response(serializer.data)
+        # Trilha servida do cache já renderizada (ver rails.py)
+        return HttpResponse(get_rail('featured'), content_type='application/json')
     
     @action(detail=False, methods=['get'])
     def trending(self, request):
-        trending = Content.objects.filter(is_trending=True)
-        serializer = ContentListSerializer(trending, many=True)
-        return Response(serializer.data)
+        return HttpResponse(get_rail('trending'), content_type='application/json')
+    
+    @action(detail=True, methods=['post'])
+    def view(self, request, pk=None):
+        """
+        Registra uma reprodução. O incremento é acumulado em memória e
+        somado a view_count periodicamente (ver counters.py).
+        """
+        obj = get_object_or_404(Content.objects.only('pk'), pk=pk)
+        view_counters.increment('content', obj.pk)
+        return Response(status=status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['get'])
     def recommendations(self, request):
@@ -94,22 +134,20 @@ class ContentViewSet(viewsets.ReadOnlyModelViewSet):
         if not request.user.is_authenticated:
             return Response({"detail": "Autenticação necessária"}, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Obter gêneros que o usuário assistiu recentemente
-        watched_genres = Genre.objects.filter(
-            contents__watchhistory__user=request.user
-        ).distinct()
-        
-        # Recomendar conteúdo com gêneros similares que o usuário não assistiu
-        recommendations = Content.objects.filter(
-            genres__in=watched_genres
-        ).exclude(
-            watchhistory__user=request.user
-        ).distinct().order_by('-imdb_rating')[:20]
+        # Vizinhos pré-calculados dos títulos assistidos (ver recommender.py)
+        content_ids = recommended_content_ids(request.user)
+        if content_ids:
+            contents = self.apply_query_plan(Content.objects.filter(pk__in=content_ids)).in_bulk()
+            recommendations = [contents[pk] for pk in content_ids if pk in contents]
+        else:
+            # Sem vizinhos calculados: recomenda por gêneros assistidos
+            recommendations = self.apply_query_plan(genre_recommendations(request.user))[:20]
         
-        serializer = ContentListSerializer(recommendations, many=True)
+        serializer = self.get_serializer(recommendations, many=True)
         return Response(serializer.data)
 
-class SeasonViewSet(viewsets.ReadOnlyModelViewSet):
+class SeasonViewSet(AnonymousCacheMixin, ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    anonymous_cache_tags = model_tags(Season, Episode)
     queryset = Season.objects.all()
     serializer_class = SeasonSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -120,18 +158,27 @@ class SeasonViewSet(viewsets.ReadOnlyModelViewSet):
             return Season.objects.filter(content_id=content_id)
         return Season.objects.all()
 
-class EpisodeViewSet(viewsets.ReadOnlyModelViewSet):
+class EpisodeViewSet(AnonymousCacheMixin, ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    anonymous_cache_tags = model_tags(Episode)
     queryset = Episode.objects.all()
     serializer_class = EpisodeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Cursor sobre (episode_number, id), servido pelo índice único (season, episode_number)
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         season_id = self.request.query_params.get('season')
         if season_id:
             return Episode.objects.filter(season_id=season_id)
         return Episode.objects.all()
+    
+    @action(detail=True, methods=['post'])
+    def view(self, request, pk=None):
+        obj = get_object_or_404(Episode.objects.only('pk'), pk=pk)
+        view_counters.increment('episode', obj.pk)
+        return Response(status=status.HTTP_202_ACCEPTED)
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -141,9 +188,15 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def get_object(self):
         return get_object_or_404(UserProfile, user=self.request.user)
 
-class WatchHistoryViewSet(viewsets.ModelViewSet):
+class WatchHistoryViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = WatchHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_serializer_class(self):
+        if self.action == 'continue_watching':
+            return ContinueWatchingSerializer
+        return WatchHistorySerializer
     
     def get_queryset(self):
         return WatchHistory.objects.filter(user=self.request.user)
@@ -176,17 +229,56 @@ class WatchHistoryViewSet(viewsets.ModelViewSet):
         # Atualizar registro existente ou criar novo
         if existing:
             serializer = self.get_serializer(existing, data=data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         else:
+            # content e episode são aninhados (somente leitura) no serializer;
+            # episódios guardam também o título, como nos heartbeats
+            if content_id:
+                content_id = get_object_or_404(Content.objects.only('pk'), pk=content_id).pk
+                episode_id = None
+            else:
+                episode = get_object_or_404(Episode.objects.values('pk', 'season__content_id'), pk=episode_id)
+                content_id, episode_id = episode['season__content_id'], episode['pk']
             serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(content_id=content_id, episode_id=episode_id)
         
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def heartbeat(self, request):
+        """
+        Recebe vários heartbeats de progresso por requisição e os grava em
+        lote (ver heartbeats.py). Responde apenas com uma confirmação.
+        """
+        events = request.data.get('events') if hasattr(request.data, 'get') else request.data
+        serializer = HeartbeatSerializer(
+            data=events, many=True,
+            max_length=settings.WATCH_PROGRESS_MAX_EVENTS,
+        )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        
+        progress_buffer.add(request.user.id, serializer.validated_data)
+        return Response(
+            {"accepted": len(serializer.validated_data)},
+            status=status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=False, methods=['get'], url_path='continue')
+    def continue_watching(self, request):
+        """
+        Títulos em andamento, com o próximo episódio já resolvido nas séries.
+        Uma única leitura da trilha materializada (ver continue_watching.py).
+        """
+        queryset = ContinueWatching.objects.filter(user=request.user)
+        queryset = self.apply_query_plan(queryset)[:CONTINUE_WATCHING_LIMIT]
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return Favorite.objects.filter(user=self.request.user)
@@ -220,9 +312,10 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = RatingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         content_id = self.request.query_params.get('content')
@@ -230,6 +323,8 @@ class RatingViewSet(viewsets.ModelViewSet):
             return Rating.objects.filter(content_id=content_id)
         return Rating.objects.filter(user=self.request.user)
     
+    # Escritas atômicas com a atualização dos agregados em Content (signals)
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         data['user'] = request.user.id
@@ -249,12 +344,69 @@ class RatingViewSet(viewsets.ModelViewSet):
         
         if existing:
             serializer = self.get_serializer(existing, data=data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         else:
+            # content é aninhado (somente leitura) no serializer
+            content = get_object_or_404(Content.objects.only('pk'), pk=content_id)
             serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(content=content)
         
-        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
         serializer.save()
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+class StreamingManifestViewSet(viewsets.GenericViewSet):
+    serializer_class = ManifestRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def create(self, request):
+        """
+        Inicia a reprodução: lê o manifesto pré-calculado do cache (ver
+        manifests.py) e registra a sessão com um único INSERT.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        episode_id = serializer.validated_data.get('episode_id')
+        if episode_id:
+            manifest = get_manifest('episode', episode_id)
+        else:
+            manifest = get_manifest('content', serializer.validated_data['content_id'])
+        if manifest is None:
+            return Response({"detail": "Conteúdo não encontrado"}, status=status.HTTP_404_NOT_FOUND)
         
+        session = StreamingSession.objects.create(
+            user=request.user,
+            content_id=manifest['content_id'],
+            episode_id=manifest['episode_id'],
+        )
+        return Response(playback_response(session.id, manifest))
+
+class StreamingSessionViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = StreamingSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        return StreamingSession.objects.filter(user=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def end_session(self, request, pk=None):
+        session = self.get_object()
+        serializer = self.get_serializer(session, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        end_time = timezone.now()
+        serializer.save(
+            end_time=end_time,
+            duration=int((end_time - session.start_time).total_seconds()),
+        )
         return Response(serializer.data)
 
 class UserRegistrationViewSet(viewsets.GenericViewSet):
@@ -270,3 +422,14 @@ class UserRegistrationViewSet(viewsets.GenericViewSet):
             status=status.HTTP_201_CREATED
         )
 
+
+def metrics(request):
+    """
+    Histogramas por rota no formato texto do Prometheus (ver metrics.py).
+    Acesso com ``Authorization: Bearer <METRICS_TOKEN>`` ou por usuário staff.
+    """
+    header = request.headers.get('Authorization', '')
+    token = settings.METRICS_TOKEN
+    if not (token and hmac.compare_digest(header, f'Bearer {token}')) and not request.user.is_staff:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')